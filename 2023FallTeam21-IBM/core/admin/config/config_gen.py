@@ -1,12 +1,27 @@
 import configparser
 import cv2
 
+# Helper method to make an empty ConfigParser object with the converters the project uses
+def makeConfigParser():
+    return configparser.ConfigParser(converters={'list': lambda x: [int(i.strip()) for i in x.split(',')]})
+
 # Helper method to read a config file and return a ConfigParser object
 def readConfigFile(path):
-    config = configparser.ConfigParser(converters={'list': lambda x: [int(i.strip()) for i in x.split(',')]})
+    config = makeConfigParser()
     config.read(path)
     return config
 
+# Helper method to read a config from a dictionary of sections and return a ConfigParser object
+# (ConfigParser objects can not be sent to other processes, their dictionaries can)
+def readConfigDict(dictionary):
+    config = makeConfigParser()
+    config.read_dict(dictionary)
+    return config
+
+# Helper method to convert a ConfigParser object into a dictionary of sections, for readConfigDict
+def configToDict(config):
+    return {section: dict(config.items(section, raw=True)) for section in config.sections()}
+
 def main():
     config = configparser.ConfigParser()
 
@@ -15,12 +30,27 @@ def main():
     config.add_section('ColoredObjectIdentifier')
     config.add_section('ContourMerger')
     config.add_section('CorrectiveTracker')
+    config.add_section('PredictiveTracker')
+    config.add_section('KeyframeProcessor')
+    config.add_section('RegionScheduler')
+    config.add_section('ParallelIdentifier')
+    config.add_section('SegmentProcessor')
+    config.add_section('IncrementalIdentifier')
+    config.add_section('ForegroundFilter')
+    config.add_section('DetectionStore')
+    config.add_section('ParameterSweep')
+    config.add_section('CachedObjectIdentifier')
+    config.add_section('Metrics')
+    config.add_section('FlightRecorder')
 
     # Add options to the TrashTrack2 section
     config.set('TrashTrack2', 'LABEL_DISPLAY_HEIGHT', '10')
     config.set('TrashTrack2', 'DISPLAY_WIDTH', '1280')
     config.set('TrashTrack2', 'DISPLAY_HEIGHT', '720')
     config.set('TrashTrack2', 'FLIP_CAMERA', 'False')
+    config.set('TrashTrack2', 'CAPTURE_MODE', 'serial')
+    config.set('TrashTrack2', 'PIPELINE_QUEUE_SIZE', '4')
+    config.set('TrashTrack2', 'TRACKER', 'corrective')
 
     # Add options to the ColoredObjectIdentifier section
     config.set('ColoredObjectIdentifier', 'CVT_COLOR_CODE', f"{cv2.COLOR_BGR2HSV}")
@@ -43,13 +73,90 @@ def main():
     config.set('ColoredObjectIdentifier', 'PURPLE_UPPER', '160, 255, 255')
     config.set('ColoredObjectIdentifier', 'ORANGE_LOWER', '6, 100, 125')
     config.set('ColoredObjectIdentifier', 'ORANGE_UPPER', '19, 255, 255')
+    config.set('ColoredObjectIdentifier', 'MASK_ENGINE', 'inrange')
+    config.set('ColoredObjectIdentifier', 'CONTOUR_ENGINE', 'contours')
+    config.set('ColoredObjectIdentifier', 'PYRAMID_SCALE', '1.0')
+    config.set('ColoredObjectIdentifier', 'PYRAMID_REFINE', 'True')
+    config.set('ColoredObjectIdentifier', 'PYRAMID_MARGIN', '20.0')
+    config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'False')
 
     # Add options to the ContourMerger section
     config.set('ContourMerger', 'DEFAULT_THRESHOLD_DISTANCE', '50.0')
     config.set('ContourMerger', 'SWALLOW_AREA_RATIO_THRESHOLD', '.5')
+    config.set('ContourMerger', 'CLUSTER_ENGINE', 'pairwise')
+    config.set('ContourMerger', 'SWALLOW_ENGINE', 'pairwise')
 
     # Add options to the CorrectiveTracker section
     config.set('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD', '150.0')
+    config.set('CorrectiveTracker', 'ASSIGNMENT_MODE', 'greedy')
+    config.set('CorrectiveTracker', 'MAX_THRESHOLD_SCALE', '3.0')
+
+    # Add options to the PredictiveTracker section
+    config.set('PredictiveTracker', 'DEFAULT_TRACKER_THRESHOLD', '150.0')
+    config.set('PredictiveTracker', 'MAX_MISSED_FRAMES', '5')
+    config.set('PredictiveTracker', 'PROCESS_NOISE', '1.0')
+    config.set('PredictiveTracker', 'MEASUREMENT_NOISE', '10.0')
+
+    # Add options to the KeyframeProcessor section
+    config.set('KeyframeProcessor', 'DETECTION_STRIDE', '1')
+    config.set('KeyframeProcessor', 'MAX_FEATURES', '20')
+    config.set('KeyframeProcessor', 'MIN_FEATURE_RATIO', '0.5')
+
+    # Add options to the RegionScheduler section
+    config.set('RegionScheduler', 'FULL_SCAN_INTERVAL', '1')
+    config.set('RegionScheduler', 'MOTION_MARGIN', '100.0')
+    config.set('RegionScheduler', 'EDGE_STRIP_WIDTH', '100.0')
+    config.set('RegionScheduler', 'ENTRY_EDGES', 'left, right, top, bottom')
+
+    # Add options to the ParallelIdentifier section
+    config.set('ParallelIdentifier', 'WORKERS', '0')
+    config.set('ParallelIdentifier', 'PENDING_FRAMES_PER_WORKER', '2')
+    config.set('ParallelIdentifier', 'SHARED_FRAMES', 'True')
+
+    # Add options to the SegmentProcessor section
+    config.set('SegmentProcessor', 'WORKERS', '0')
+    config.set('SegmentProcessor', 'SEGMENT_FRAMES', '9000')
+    config.set('SegmentProcessor', 'OVERLAP_FRAMES', '90')
+    config.set('SegmentProcessor', 'MIN_MATCH_OVERLAP', '0.5')
+
+    # Add options to the IncrementalIdentifier section
+    config.set('IncrementalIdentifier', 'FULL_RECOMPUTE_INTERVAL', '1')
+    config.set('IncrementalIdentifier', 'TILE_SIZE', '64')
+    config.set('IncrementalIdentifier', 'DIFF_THRESHOLD', '8')
+
+    # Add options to the ForegroundFilter section
+    config.set('ForegroundFilter', 'LEARNING_RATE', '-1.0')
+    config.set('ForegroundFilter', 'HISTORY', '500')
+    config.set('ForegroundFilter', 'VAR_THRESHOLD', '16.0')
+    config.set('ForegroundFilter', 'DETECT_SHADOWS', 'False')
+    config.set('ForegroundFilter', 'SCALE', '0.25')
+    config.set('ForegroundFilter', 'MARGIN', '30.0')
+    config.set('ForegroundFilter', 'MIN_FOREGROUND_RATIO', '0.25')
+
+    # Add options to the DetectionStore section
+    config.set('DetectionStore', 'DIRECTORY', './detections')
+    config.set('DetectionStore', 'STORE_CONTOURS', 'False')
+    config.set('DetectionStore', 'CONTOUR_EPSILON', '1.0')
+
+    # Add options to the ParameterSweep section
+    config.set('ParameterSweep', 'WORKERS', '0')
+
+    # Add options to the CachedObjectIdentifier section
+    config.set('CachedObjectIdentifier', 'MAX_MEMORY', '64.0')
+    config.set('CachedObjectIdentifier', 'SPILL_DIRECTORY', '')
+
+    # Add options to the Metrics section
+    config.set('Metrics', 'ENABLED', 'False')
+    config.set('Metrics', 'EXPORT_PATH', '')
+    config.set('Metrics', 'EXPORT_ADDRESS', '')
+    config.set('Metrics', 'PREFIX', 'trashtrack_')
+
+    # Add options to the FlightRecorder section
+    config.set('FlightRecorder', 'ENABLED', 'False')
+    config.set('FlightRecorder', 'LATENCY_BUDGET', '50.0')
+    config.set('FlightRecorder', 'RING_SIZE', '120')
+    config.set('FlightRecorder', 'DIRECTORY', './flightRecords')
+    config.set('FlightRecorder', 'MAX_DUMPS', '10')
 
     # Get a name for the config file from the user
     configFileName = input('Enter the name of the config file: ')
@@ -2,7 +2,10 @@
 #Path: core/admin/tracker/testing/colorIdentificationTest.py
 import unittest
 import cv2
+import glob
+import numpy as np
 import sys
+import tracemalloc
 
 sys.path.append('./core/admin/')
 sys.path.append('./core/admin/tracker/')
@@ -384,5 +387,183 @@ class colorIdentificationTest(unittest.TestCase):
         assert purple, "Purple object not identified"
 
 
+    # Test that the lookup table mask engine finds the same contours as the inRange mask engine
+    # on every still image in the testData folder
+    def testLookupEngineMatchesInRange(self):
+        for configFileName in ['default', 'defaultDark']:
+            config = readConfigFile(f'./core/admin/config/{configFileName}.ini')
+            lookupConfig = readConfigFile(f'./core/admin/config/{configFileName}.ini')
+            lookupConfig.set('ColoredObjectIdentifier', 'MASK_ENGINE', 'lookup')
+
+            for imagePath in sorted(glob.glob("./core/admin/testing/testData/*.jpg")):
+                # Read the frame
+                frame = cv2.imread(imagePath)
+
+                # Get the image resolution
+                height, width, _ = frame.shape
+                resolution = (width, height)
+
+                # Get the contours with both engines
+                identifiedObjects = coi(config, resolution).identifyObjects(frame)
+                lookupObjects = coi(lookupConfig, resolution).identifyObjects(frame)
+
+                assert len(lookupObjects) == len(identifiedObjects), f"Different amount of objects identified in {imagePath}"
+                for (contour, label), (lookupContour, lookupLabel) in zip(identifiedObjects, lookupObjects):
+                    assert label == lookupLabel, f"Different labels identified in {imagePath}"
+                    assert np.array_equal(contour, lookupContour), f"Different contours identified in {imagePath}"
+
+
+    # Test that the connected components contour engine finds the same contours as the findContours
+    # contour engine on every still image in the testData folder
+    def testComponentEngineMatchesContours(self):
+        for configFileName in ['default', 'defaultDark']:
+            config = readConfigFile(f'./core/admin/config/{configFileName}.ini')
+            componentConfig = readConfigFile(f'./core/admin/config/{configFileName}.ini')
+            componentConfig.set('ColoredObjectIdentifier', 'CONTOUR_ENGINE', 'components')
+
+            for imagePath in sorted(glob.glob("./core/admin/testing/testData/*.jpg")):
+                # Read the frame
+                frame = cv2.imread(imagePath)
+
+                # Get the image resolution
+                height, width, _ = frame.shape
+                resolution = (width, height)
+
+                # Get the contours with both engines
+                identifiedObjects = coi(config, resolution).identifyObjects(frame)
+                componentObjects = coi(componentConfig, resolution).identifyObjects(frame)
+
+                assert len(componentObjects) == len(identifiedObjects), f"Different amount of objects identified in {imagePath}"
+                for (contour, label), (componentContour, componentLabel) in zip(identifiedObjects, componentObjects):
+                    assert label == componentLabel, f"Different labels identified in {imagePath}"
+                    assert np.array_equal(contour, componentContour), f"Different contours identified in {imagePath}"
+
+    # Test that identifying objects in regions around the objects finds the same objects as the full frame
+    def testRegionsMatchFullFrame(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+
+        for imagePath in sorted(glob.glob("./core/admin/testing/testData/*.jpg")):
+            # Read the frame
+            frame = cv2.imread(imagePath)
+
+            # Get the image resolution
+            height, width, _ = frame.shape
+            resolution = (width, height)
+            objectIdentifier = coi(config, resolution)
+            identifiedObjects = objectIdentifier.identifyObjects(frame)
+
+            # A region covering the frame gives the same contours
+            regionObjects = objectIdentifier.identifyObjectsInRegions(frame, [(0, 0, width, height)])
+            assert len(regionObjects) == len(identifiedObjects), f"Different amount of objects identified in {imagePath}"
+            for (contour, label), (regionContour, regionLabel) in zip(identifiedObjects, regionObjects):
+                assert label == regionLabel, f"Different labels identified in {imagePath}"
+                assert np.array_equal(contour, regionContour), f"Different contours identified in {imagePath}"
+
+            # Regions around the objects give the same objects, in frame coordinates
+            margin = 100
+            regions = [(x - margin, y - margin, w + 2 * margin, h + 2 * margin) for x, y, w, h in (cv2.boundingRect(contour) for contour, _ in identifiedObjects)]
+            regionObjects = objectIdentifier.identifyObjectsInRegions(frame, regions)
+            expected = sorted((label, cv2.boundingRect(contour)) for contour, label in identifiedObjects)
+            actual = sorted((label, cv2.boundingRect(contour)) for contour, label in regionObjects)
+            assert actual == expected, f"Different objects identified in the regions of {imagePath}"
+
+    # Test that a region cutting through an object finds the same contour as the full frame
+    def testRegionCuttingObjectMatchesFullFrame(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+
+        for imagePath in sorted(glob.glob("./core/admin/testing/testData/*.jpg")):
+            frame = cv2.imread(imagePath)
+            height, width, _ = frame.shape
+            objectIdentifier = coi(config, (width, height))
+            for color, contours in enumerate(objectIdentifier.findObjectContours(frame)):
+                for contour in contours:
+                    # A region around a point of the edge of the object, half its size, the edges of the region cut through it
+                    _, _, w, h = cv2.boundingRect(contour)
+                    x, y = contour[0][0]
+                    regionContours = objectIdentifier.findContoursInRegions(frame, [(x - w // 4, y - h // 4, w // 2, h // 2)])
+                    assert any(np.array_equal(contour, regionContour) for regionContour in regionContours[color]), \
+                        f"A contour cut by the region is different from the full frame in {imagePath}"
+
+    # Test that the merged regions do not overlap and cover the same pixels as the regions
+    def testMergeRegionsCoversRegions(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        objectIdentifier = coi(config, (640, 480))
+
+        generator = np.random.default_rng(0)
+        for _ in range(200):
+            regions = [tuple(int(value) for value in region) for region in generator.integers(-50, [640, 480, 300, 300], (int(generator.integers(1, 10)), 4))]
+            expected = np.zeros((480, 640), dtype=np.uint8)
+            for x, y, w, h in regions:
+                expected[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = 1
+            coverage = np.zeros((480, 640), dtype=np.uint8)
+            for x, y, w, h in objectIdentifier.mergeRegions(regions, 640, 480):
+                coverage[y:y+h, x:x+w] += 1
+            assert coverage.max() <= 1, "the merged regions overlap"
+            assert np.all(coverage >= expected), "the merged regions do not cover the regions"
+
+    # Test that identifying frames after the first one reuses the buffers of the identifier (no full-frame
+    # images are allocated) and finds the same objects as a new identifier, with both mask engines
+    def testIdentifyObjectsReusesBuffers(self):
+        cap = cv2.VideoCapture("./core/admin/testing/testData/redGreenBlueOrangeObj.mp4")
+        frames = []
+        for _ in range(10):
+            _, frame = cap.read()
+            frames.append(frame)
+        height, width, _ = frames[0].shape
+        for engine in ['inrange', 'lookup']:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('ColoredObjectIdentifier', 'MASK_ENGINE', engine)
+            objectIdentifier = coi(config, (width, height))
+            objectIdentifier.identifyObjects(frames[0])
+
+            # The most memory allocated at once while identifying a frame
+            results = []
+            tracemalloc.start()
+            for frame in frames[1:]:
+                tracemalloc.reset_peak()
+                start, _ = tracemalloc.get_traced_memory()
+                results.append(objectIdentifier.identifyObjects(frame))
+                _, peak = tracemalloc.get_traced_memory()
+                assert peak - start < width * height / 10, f"{peak - start} bytes allocated while identifying a frame with the {engine} engine"
+            tracemalloc.stop()
+
+            for frame, identifiedObjects in zip(frames[1:], results):
+                expectedObjects = coi(config, (width, height)).identifyObjects(frame)
+                assert len(identifiedObjects) == len(expectedObjects), "Different amount of objects identified"
+                for (contour, label), (expectedContour, expectedLabel) in zip(identifiedObjects, expectedObjects):
+                    assert label == expectedLabel and np.array_equal(contour, expectedContour), "Different objects identified"
+
+    # Test that the pyramid mode finds the objects found at full resolution, with the same contours
+    # when the objects are refined at full resolution
+    def testPyramidFindsSameObjects(self):
+        for imagePath in sorted(glob.glob("./core/admin/testing/testData/*Object*.jpg")):
+            # Read the frame
+            frame = cv2.imread(imagePath)
+            height, width, _ = frame.shape
+            resolution = (width, height)
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            identifiedObjects = coi(config, resolution).identifyObjects(frame)
+            expected = sorted((label, cv2.boundingRect(contour)) for contour, label in identifiedObjects)
+
+            config.set('ColoredObjectIdentifier', 'PYRAMID_SCALE', '0.5')
+            pyramidObjects = coi(config, resolution).identifyObjects(frame)
+            actual = sorted((label, cv2.boundingRect(contour)) for contour, label in pyramidObjects)
+            assert actual == expected, f"Different objects identified in {imagePath}"
+            contourSets = [sorted((label, contour.tobytes()) for contour, label in objects) for objects in [identifiedObjects, pyramidObjects]]
+            assert contourSets[0] == contourSets[1], f"Different contours identified in {imagePath}"
+
+            # Without refining, the contours are coarser (an object can be split or lose its thin parts),
+            # but every object is found, and nothing is found where there is no object
+            config.set('ColoredObjectIdentifier', 'PYRAMID_REFINE', 'False')
+            coarseRects = [(label, cv2.boundingRect(contour)) for contour, label in coi(config, resolution).identifyObjects(frame)]
+            overlaps = lambda rect, otherRect: min(rect[0] + rect[2], otherRect[0] + otherRect[2]) > max(rect[0], otherRect[0]) and \
+                                               min(rect[1] + rect[3], otherRect[1] + otherRect[3]) > max(rect[1], otherRect[1])
+            for coarseLabel, coarseRect in coarseRects:
+                assert any(label == coarseLabel and overlaps(rect, coarseRect) for label, rect in expected), \
+                    f"A {coarseLabel} object was found without refining where there is none in {imagePath}"
+            for label, rect in expected:
+                found = any(coarseLabel == label and overlaps(rect, coarseRect) for coarseLabel, coarseRect in coarseRects)
+                assert found, f"A {label} object was not found without refining in {imagePath}"
+
 if __name__ == "__main__":
     unittest.main() # run all tests
@@ -0,0 +1,104 @@
+import unittest
+import cv2
+import numpy as np
+import sys
+from unittest import mock
+
+sys.path.append('./core/admin')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from testing.util.testHelpers import readVideo
+
+# Make a frame of a gray scene with a static blue stripe and an orange square at (x, y)
+# @param x: The left of the orange square, None for no square
+# @param y: The top of the orange square
+# @return: The frame (BGR)
+def makeFrame(x, y):
+    frame = np.full((360, 640, 3), 128, dtype=np.uint8)
+    frame[300:330, :] = (200, 60, 0)
+    if x is not None:
+        frame[y:y+60, x:x+60] = (0, 120, 255)
+    return frame
+
+# Sort the contours of every color, to compare contours found in a different order
+# @param colorContours: A list of lists of contours, in the same order as Colors.labels
+# @return: A list of sorted lists of the contours as bytes
+def sortedContours(colorContours):
+    return [sorted(contour.tobytes() for contour in contours) for contours in colorContours]
+
+class foregroundFilterTest(unittest.TestCase):
+
+    # Find the contours of the frames of a clip with and without the foreground filter
+    # @param videoName: The name of the clip in testData
+    # @param frameCount: The number of frames to use
+    # @return: The frames, a list of tuples (contours, filtered contours, filtered contours of the whole frame)
+    #          per frame, the number of pixels the filter made masks of, and the resolution of the clip
+    def runClip(self, videoName, frameCount):
+        frames, resolution = readVideo(f'./core/admin/testing/testData/{videoName}.mp4')
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        objectIdentifier = coi(config, resolution)
+        config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+        filteredIdentifier = coi(config, resolution)
+        # The same filter to filter the contours of the whole frames
+        foregroundFilter = coi(config, resolution).foregroundFilter
+        results = []
+        with mock.patch.object(filteredIdentifier, 'makeImageMasks', wraps=filteredIdentifier.makeImageMasks) as makeImageMasks:
+            for frame in frames[:frameCount]:
+                contours = objectIdentifier.findObjectContours(frame)
+                filteredContours = filteredIdentifier.findObjectContours(frame)
+                foregroundMask = foregroundFilter.apply(frame)
+                expectedContours = [[] for _ in contours] if foregroundMask is None else \
+                    [foregroundFilter.filterContours(colorContours, foregroundMask) for colorContours in contours]
+                results.append((contours, filteredContours, expectedContours))
+            maskedPixels = sum(call.args[0].shape[0] * call.args[0].shape[1] for call in makeImageMasks.call_args_list)
+        return frames[:frameCount], results, maskedPixels, resolution
+
+    # Test that the static balls and table of the pool clip are filtered out, with the same contours as
+    # filtering the contours of the whole frames
+    def testStaticObjectsAreFilteredOnClip(self):
+        frames, results, _, _ = self.runClip('poolShotsClip1', 60)
+        contourCount = sum(len(colorContours) for contours, _, _ in results for colorContours in contours)
+        filteredCount = sum(len(colorContours) for _, filteredContours, _ in results for colorContours in filteredContours)
+        assert filteredCount * 5 < contourCount, f"Expected far fewer contours, got {filteredCount} of {contourCount}"
+        for index, (_, filteredContours, expectedContours) in enumerate(results):
+            assert sortedContours(filteredContours) == sortedContours(expectedContours), \
+                f"Frame {index} differs from the filtered contours of the whole frame"
+
+    # Test that the clips without static colored objects find the contours of the whole frames, from
+    # masks of a part of the frames only
+    def testMovingObjectsMatchFullFrameOnClips(self):
+        for videoName in ['blueObj', 'blueOrangeObj', 'greenSkittleTracking']:
+            frames, results, maskedPixels, (width, height) = self.runClip(videoName, 100)
+            for index, (contours, filteredContours, _) in enumerate(results):
+                assert sortedContours(filteredContours) == sortedContours(contours), \
+                    f"Frame {index} of {videoName} differs from the contours of the whole frame"
+            assert maskedPixels < 0.6 * len(frames) * width * height, \
+                f"Expected masks of a part of {videoName}, got {maskedPixels / (len(frames) * width * height):.2f} of the frames"
+
+    # Test that only the moving square is identified once the stripe is learned into the background
+    def testStaticFixtureIsFiltered(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        objectIdentifier = coi(config, (640, 360))
+        config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+        filteredIdentifier = coi(config, (640, 360))
+
+        # Learn the scene without the square
+        for _ in range(30):
+            filteredIdentifier.identifyObjects(makeFrame(None, 0))
+        assert filteredIdentifier.foregroundFilter.emptyCount > 0, "The static scene was not learned into the background"
+        assert filteredIdentifier.identifyObjects(makeFrame(None, 0)) == [], "Objects identified in the static scene"
+
+        for step in range(10):
+            frame = makeFrame(100 + 20 * step, 100)
+            labels = sorted(label for _, label in objectIdentifier.identifyObjects(frame))
+            filteredObjects = filteredIdentifier.identifyObjects(frame)
+            assert labels == ['blue', 'orange'], f"Expected the stripe and the square, got {labels}"
+            assert [label for _, label in filteredObjects] == ['orange'], \
+                f"Expected the square only, got {[label for _, label in filteredObjects]}"
+            x, y, w, h = cv2.boundingRect(filteredObjects[0][0])
+            assert abs(x - (100 + 20 * step)) <= 3 and abs(y - 100) <= 3, f"The square was found at {(x, y)}"
+
+if __name__ == "__main__":
+    unittest.main()
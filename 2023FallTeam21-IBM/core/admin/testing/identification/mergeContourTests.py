@@ -12,6 +12,19 @@ from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as co
 from identification.ContourMerger import ContourMerger as cm
 from tracking.CorrectiveTracker import CorrectiveTracker as ct
 
+# Make a contour whose bounding rectangle is (x, y, w, h)
+def rectangleContour(x, y, w, h):
+    return np.array([[[x, y]], [[x + w - 1, y]], [[x + w - 1, y + h - 1]], [[x, y + h - 1]]], dtype=np.int32)
+
+# Make random contours with many nested, touching and overlapping bounding rectangles
+def randomContours(generator, count, size):
+    contours = []
+    for _ in range(count):
+        x, y = generator.integers(0, size, 2)
+        w, h = generator.integers(1, size // 2, 2)
+        contours.append(rectangleContour(int(x), int(y), int(w), int(h)))
+    return contours
+
 class contourMergerTest(unittest.TestCase):
 
     # Test if two contours will be merged if they are moving towards each other.
@@ -378,5 +391,62 @@ class contourMergerTest(unittest.TestCase):
                 trackedObjects) >= 2, "failed to detect one of the objects in the video."
 
 
+    # Test that the vectorized rectangle distance matrix matches calculateRectangleDistance for every pair
+    def testRectangleDistanceMatrixMatchesScalar(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        merger = cm(config, (1280, 720))
+
+        generator = np.random.default_rng(0)
+        for size in [10, 100, 1000]:
+            rects = [cv2.boundingRect(contour) for contour in randomContours(generator, 40, size)]
+            distances = merger.calculateRectangleDistanceMatrix(rects, rects)
+            for i in range(len(rects)):
+                for j in range(len(rects)):
+                    assert distances[i, j] == merger.calculateRectangleDistance(rects[i], rects[j]), f"Different distance between {rects[i]} and {rects[j]}"
+
+    # Test that the sweep cluster engine merges the same contours as the pairwise cluster engine
+    def testSweepClusterMatchesPairwise(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        sweepConfig = readConfigFile(f'./core/admin/config/default.ini')
+        sweepConfig.set('ContourMerger', 'CLUSTER_ENGINE', 'sweep')
+        resolution = (1280, 720)
+        merger = cm(config, resolution)
+        sweepMerger = cm(sweepConfig, resolution)
+
+        generator = np.random.default_rng(0)
+        for count in [0, 1, 2, 5, 20, 60]:
+            for size in [40, 200, 1000]:
+                contours = randomContours(generator, count, size)
+
+                # The pairwise engine merges the list in place, so give each engine its own list
+                clustered = merger.clusterContours(list(contours))
+                sweepClustered = sweepMerger.clusterContours(list(contours))
+
+                assert len(sweepClustered) == len(clustered), f"Different amount of clusters ({count} contours of size {size})"
+                for contour, sweepContour in zip(clustered, sweepClustered):
+                    assert np.array_equal(contour, sweepContour), f"Different clusters ({count} contours of size {size})"
+
+    # Test that the sweep swallow engine swallows the same contours as the pairwise swallow engine
+    def testSweepSwallowMatchesPairwise(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        sweepConfig = readConfigFile(f'./core/admin/config/default.ini')
+        sweepConfig.set('ContourMerger', 'SWALLOW_ENGINE', 'sweep')
+        resolution = (1280, 720)
+        merger = cm(config, resolution)
+        sweepMerger = cm(sweepConfig, resolution)
+
+        generator = np.random.default_rng(0)
+        for count in [0, 1, 2, 5, 20, 100]:
+            for size in [10, 40, 200]:
+                contourLabelTuples = [(contour, 'red') for contour in randomContours(generator, count, size)]
+
+                swallowed = merger.swallowContours(contourLabelTuples)
+                sweepSwallowed = sweepMerger.swallowContours(contourLabelTuples)
+
+                assert len(sweepSwallowed) == len(swallowed), f"Different amount of contours swallowed ({count} contours of size {size})"
+                for (contour, _), (sweepContour, _) in zip(swallowed, sweepSwallowed):
+                    assert contour is sweepContour, f"Different contours swallowed ({count} contours of size {size})"
+
+
 if __name__ == "__main__":
     unittest.main()  # run all tests
@@ -0,0 +1,152 @@
+import unittest
+import contextlib
+import io
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from tracking.PredictiveTracker import PredictiveTracker as pt
+from pipeline.ParallelIdentifier import ParallelIdentifier
+from pipeline.SegmentProcessor import SegmentProcessor
+from metrics.Metrics import Metrics, HISTOGRAMS, getMetrics
+import TrashTrackBatch
+from testing.util.testHelpers import readVideo, sameObjects
+
+# Parse the samples of a Prometheus text dump, returns a dictionary of values by sample
+# @param text: The Prometheus text
+# @return: A dictionary of values by sample (name with labels)
+def parsePrometheus(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            sample, value = line.rsplit(' ', 1)
+            samples[sample] = float(value)
+    return samples
+
+class MetricsTests(unittest.TestCase):
+
+    # Test that the stages of the identifier, merger and trackers are recorded, without changing what they identify and track
+    def testStagesRecorded(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        frames, resolution = readVideo("./core/admin/testing/testData/blueOrangeObj.mp4")
+        objectIdentifier = coi(config, resolution)
+        assert objectIdentifier.metrics is None and getMetrics(config) is None, "the metrics are enabled by default"
+        expectedObjects = [objectIdentifier.identifyObjects(frame) for frame in frames]
+
+        config.set('Metrics', 'ENABLED', 'True')
+        metrics = getMetrics(config)
+        metrics.reset()
+        objectIdentifier = coi(config, resolution)
+        trackers = [ct(config, resolution), pt(config, resolution)]
+        trackCount = 0
+        for index, frame in enumerate(frames):
+            objects = objectIdentifier.identifyObjects(frame)
+            assert sameObjects(objects, expectedObjects[index]), f"Different objects identified in frame {index}"
+            for tracker in trackers:
+                tracker.update(objects)
+                trackCount += len(tracker.getTrackedObjects())
+
+        for name in ['identifier_hsv_seconds', 'identifier_masks_seconds', 'identifier_contours_seconds', 'identifier_merge_seconds']:
+            assert metrics.getHistogram(name).count == len(frames), f"{name} was not recorded for every frame"
+        assert metrics.getHistogram('identifier_objects').sum == sum(len(objects) for objects in expectedObjects), "the objects were not counted"
+        assert metrics.getHistogram('merger_clusters').count == 6 * len(frames), "the clusters of every color were not counted"
+        assert metrics.getHistogram('merger_cluster_contours').sum >= metrics.getHistogram('merger_clusters').sum, "more clusters than contours"
+        assert metrics.getHistogram('tracker_update_seconds').count == 2 * len(frames), "the tracker updates were not recorded"
+        assert metrics.getHistogram('tracker_tracks').sum == trackCount, "the tracked objects were not counted"
+        assert metrics.getHistogram('tracker_pairs').sum > 0, "no tracker pairs were counted"
+
+    # Test that the histograms are exported in the Prometheus text format to a file and a socket
+    def testPrometheusExport(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Receive the export on a local socket
+            server = socket.create_server(('127.0.0.1', 0))
+            received = []
+            def receive():
+                connection, _ = server.accept()
+                with connection:
+                    received.append(b''.join(iter(lambda: connection.recv(65536), b'')).decode())
+            receiver = threading.Thread(target=receive)
+            receiver.start()
+
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('Metrics', 'EXPORT_PATH', os.path.join(directory, 'trashtrack.prom'))
+            config.set('Metrics', 'EXPORT_ADDRESS', f'127.0.0.1:{server.getsockname()[1]}')
+            metrics = Metrics(config)
+            for value in [0.0004, 0.003, 0.003, 2.0]:
+                metrics.observe('tracker_update_seconds', value)
+            for value in [0, 3, 3, 40]:
+                metrics.observe('tracker_tracks', value)
+            metrics.export()
+            receiver.join(5.0)
+            server.close()
+
+            with open(config.get('Metrics', 'EXPORT_PATH')) as f:
+                text = f.read()
+            assert received == [text], "the socket did not receive the export"
+            samples = parsePrometheus(text)
+            for name in HISTOGRAMS:
+                count = samples[f'trashtrack_{name}_count']
+                assert samples[f'trashtrack_{name}_bucket{{le="+Inf"}}'] == count, f"the +Inf bucket of {name} is not the count"
+            assert samples['trashtrack_tracker_update_seconds_count'] == 4, "the durations were not counted"
+            assert samples['trashtrack_tracker_update_seconds_bucket{le="0.0005"}'] == 1, "the buckets are not cumulative"
+            assert samples['trashtrack_tracker_update_seconds_bucket{le="0.005"}'] == 3, "the buckets are not cumulative"
+            assert samples['trashtrack_tracker_update_seconds_bucket{le="1.0"}'] == 3, "a value was counted in a bucket it is over"
+            assert samples['trashtrack_tracker_tracks_bucket{le="0"}'] == 1, "a count of 0 was not counted in the 0 bucket"
+            assert samples['trashtrack_tracker_tracks_sum'] == 46, "the counts were not summed"
+
+    # Test that the metrics recorded in the worker processes are merged into the metrics of this process
+    def testWorkerMetricsMerged(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('Metrics', 'ENABLED', 'True')
+        config.set('SegmentProcessor', 'SEGMENT_FRAMES', '60')
+        config.set('SegmentProcessor', 'OVERLAP_FRAMES', '20')
+        videoPath = "./core/admin/testing/testData/blueOrangeObj.mp4"
+        frames, resolution = readVideo(videoPath)
+        metrics = getMetrics(config)
+        # Values recorded before the workers start are not sent back by them
+        metrics.reset()
+        metrics.observe('identifier_objects', 1)
+
+        with ParallelIdentifier(config, resolution, workers=2) as parallelIdentifier:
+            list(parallelIdentifier.identifyFrames(frames))
+        assert metrics.getHistogram('identifier_hsv_seconds').count == len(frames), "the identifier metrics of the workers were not merged"
+        assert metrics.getHistogram('identifier_objects').count == len(frames) + 1, "the metrics were counted twice"
+
+        metrics.reset()
+        segmentProcessor = SegmentProcessor(config, workers=2)
+        _, _, frameCount = segmentProcessor.processVideo(videoPath)
+        # The segments overlap, so their frames are identified more than once
+        assert metrics.getHistogram('identifier_hsv_seconds').count >= frameCount, "the identifier metrics of the segments were not merged"
+        assert metrics.getHistogram('tracker_update_seconds').count == metrics.getHistogram('identifier_hsv_seconds').count, \
+            "the tracker metrics of the segments were not merged"
+
+    # Test that every config of a batch run exports its own histograms to its own export options
+    def testBatchExportsEveryConfig(self):
+        with tempfile.TemporaryDirectory() as directory:
+            videoPath = "./core/admin/testing/testData/blueObj.mp4"
+            frames, _ = readVideo(videoPath)
+            for name in ['first', 'second']:
+                config = readConfigFile(f'./core/admin/config/default.ini')
+                config.set('Metrics', 'ENABLED', 'True')
+                config.set('Metrics', 'EXPORT_PATH', os.path.join(directory, f'{name}.prom'))
+                config.set('Metrics', 'PREFIX', f'{name}_')
+                with open(os.path.join(directory, f'{name}.ini'), 'w') as f:
+                    config.write(f)
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert TrashTrackBatch.main(['--config', 'first', 'second', '--config-dir', directory, '--output', directory, '--workers', '1', videoPath]) == 0, \
+                    "the batch run failed"
+            for name in ['first', 'second']:
+                with open(os.path.join(directory, f'{name}.prom')) as f:
+                    samples = parsePrometheus(f.read())
+                assert samples[f'{name}_tracker_update_seconds_count'] == len(frames), f"the {name} config did not export its own histograms"
+
+if __name__ == "__main__":
+    unittest.main()
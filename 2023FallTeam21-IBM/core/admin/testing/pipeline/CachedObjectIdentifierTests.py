@@ -0,0 +1,67 @@
+import unittest
+import cv2
+import glob
+import sys
+import tempfile
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.CachedObjectIdentifier import CachedObjectIdentifier, IdentificationCache
+from testing.util.testHelpers import readVideo, sameObjects
+
+class CachedObjectIdentifierTests(unittest.TestCase):
+
+    # Test that replaying a video gets the same objects from the cache, and that they can be tracked and drawn
+    def testReplayHitsCache(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        frames, resolution = readVideo("./core/admin/testing/testData/blueOrangeObj.mp4")
+        objectIdentifier = coi(config, resolution)
+        cachedIdentifier = CachedObjectIdentifier(config, coi(config, resolution))
+        expectedObjects = [objectIdentifier.identifyObjects(frame) for frame in frames]
+        for _ in range(2):
+            tracker = ct(config, resolution)
+            for index, frame in enumerate(frames):
+                objects = cachedIdentifier.identifyObjects(frame)
+                assert sameObjects(objects, expectedObjects[index]), f"Different objects identified in frame {index}"
+                tracker.update(objects)
+                cv2.drawContours(frame.copy(), [contour for contour, _ in objects], -1, (0, 255, 0), 2)
+        cache = cachedIdentifier.cache
+        assert cache.missCount + cache.hitCount == 2 * len(frames), "a frame was not looked up"
+        assert cache.hitCount >= len(frames), "the replayed frames were not found in the cache"
+        assert cache.evictionCount == 0, "a frame was evicted under the memory bound"
+
+    # Test that the least recently used frames are evicted to the spill directory and read back, and the keys depend on the options
+    def testEvictionAndSpill(self):
+        images = [cv2.imread(path) for path in sorted(glob.glob("./core/admin/testing/testData/*Background.jpg"))]
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('CachedObjectIdentifier', 'MAX_MEMORY', '0.01')
+            config.set('CachedObjectIdentifier', 'SPILL_DIRECTORY', directory)
+            resolution = (images[0].shape[1], images[0].shape[0])
+            cachedIdentifier = CachedObjectIdentifier(config, coi(config, resolution))
+            expectedObjects = [cachedIdentifier.identifyObjects(image) for image in images]
+            cache = cachedIdentifier.cache
+            assert cache.evictionCount > 0, "no frame was evicted over the memory bound"
+            assert cache.memoryBytes <= cache.maxBytes or len(cache.entries) == 1, "the cache is over the memory bound"
+
+            # A new cache reads the spilled frames
+            cachedIdentifier = CachedObjectIdentifier(config, coi(config, resolution), IdentificationCache(config))
+            for index, image in enumerate(images):
+                assert sameObjects(cachedIdentifier.identifyObjects(image), expectedObjects[index]), f"Different objects read back for image {index}"
+            assert cachedIdentifier.cache.spillHitCount > 0, "no frame was read from the spill directory"
+
+            # Other identifier options do not share the keys
+            config.set('ColoredObjectIdentifier', 'MINIMUM_CONTOUR_AREA', '800')
+            otherIdentifier = CachedObjectIdentifier(config, coi(config, resolution), cachedIdentifier.cache)
+            assert otherIdentifier.getKey(images[0]) != cachedIdentifier.getKey(images[0]), "other options have the same key"
+
+            config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+            with self.assertRaises(ValueError):
+                CachedObjectIdentifier(config, coi(config, resolution))
+
+if __name__ == "__main__":
+    unittest.main()
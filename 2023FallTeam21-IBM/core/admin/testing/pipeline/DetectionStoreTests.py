@@ -0,0 +1,86 @@
+import unittest
+import cv2
+import numpy as np
+import os
+import sys
+import tempfile
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from tracking.PredictiveTracker import PredictiveTracker as pt
+from pipeline.DetectionStore import DetectionStore
+from testing.util.testHelpers import readVideo
+
+# Get the tracked objects of a tracker as a sorted list of (id, label, x, y, w, h)
+def trackedState(tracker):
+    trackedObjects = tracker.getTrackedObjects()
+    return sorted((id, trackedObjects[id].getLabel()) + tuple(trackedObjects[id].getBoundingRectangle()) for id in trackedObjects)
+
+class DetectionStoreTests(unittest.TestCase):
+
+    # Test that replaying the stored detections through the trackers tracks the same objects as the identified frames
+    def testReplayMatchesIdentification(self):
+        videoPath = "./core/admin/testing/testData/twoRedOrangeItems.mp4"
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('DetectionStore', 'DIRECTORY', directory)
+            config.set('DetectionStore', 'STORE_CONTOURS', 'True')
+            store = DetectionStore(config)
+            assert store.load(videoPath, config) is None, "a video that was not stored was loaded"
+            store.record(videoPath, config)
+            recording = store.load(videoPath, config)
+            assert recording is not None, "the stored video was not loaded"
+
+            frames, resolution = readVideo(videoPath)
+            assert recording.frameCount == len(frames), "the number of frames was not stored"
+            assert recording.resolution == resolution, "the resolution was not stored"
+            for trackerClass in [ct, pt]:
+                objectIdentifier = coi(config, resolution)
+                tracker = trackerClass(config, resolution)
+                expectedStates = []
+                for frame in frames:
+                    objects = objectIdentifier.identifyObjects(frame)
+                    tracker.update(objects)
+                    expectedStates.append(trackedState(tracker))
+                    if trackerClass is ct:
+                        # The stored columns and contours of the frame
+                        labels, rects, areas = recording.getDetections(len(expectedStates) - 1)
+                        assert [recording.labelNames[label] for label in labels] == [label for _, label in objects], "the labels were not stored"
+                        assert rects.tolist() == [list(cv2.boundingRect(contour)) for contour, _ in objects], "the rectangles were not stored"
+                        assert np.allclose(areas, [cv2.contourArea(contour) for contour, _ in objects]), "the areas were not stored"
+                        for contour, (expectedContour, _) in zip(recording.getContours(len(expectedStates) - 1), objects):
+                            assert abs(cv2.contourArea(contour) - cv2.contourArea(expectedContour)) <= 0.05 * cv2.contourArea(expectedContour) + 20, \
+                                "the simplified contour is not close to the contour"
+
+                states = []
+                recording.replay(trackerClass(config, resolution), lambda frame, tracker: states.append(trackedState(tracker)))
+                assert states == expectedStates, f"the replayed {trackerClass.__name__} tracked different objects"
+
+    # Test that the stored detections are keyed by the video and the identifier options only
+    def testStoreKey(self):
+        videoPath = "./core/admin/testing/testData/blueObj.mp4"
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('DetectionStore', 'DIRECTORY', directory)
+            store = DetectionStore(config)
+            path = store.loadOrRecord(videoPath, config).path
+            assert os.listdir(directory) == [os.path.basename(path)], "the store did not write one directory"
+
+            # Tracker options do not change the key
+            config.set('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD', '75.0')
+            assert store.load(videoPath, config) is not None, "a tracker option changed the key"
+            # Identifier options and other videos do
+            assert store.load("./core/admin/testing/testData/blueOrangeObj.mp4", config) is None, "another video was loaded"
+            config.set('ColoredObjectIdentifier', 'MINIMUM_CONTOUR_AREA', '800')
+            assert store.load(videoPath, config) is None, "an identifier option did not change the key"
+            # Detections without contours are not loaded when the contours are stored
+            config.set('ColoredObjectIdentifier', 'MINIMUM_CONTOUR_AREA', '400')
+            config.set('DetectionStore', 'STORE_CONTOURS', 'True')
+            assert DetectionStore(config).load(videoPath, config) is None, "detections without contours were loaded"
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+import os
+import sys
+import tempfile
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.FlightRecorder import FlightRecorder, getTrackerState, loadFlightRecord, getFlightRecordObjects, replayFlightRecord
+from testing.util.testHelpers import readVideo, sameObjects
+
+class FlightRecorderTests(unittest.TestCase):
+
+    # Test that the frames over the budget are dumped, and that replaying a dump takes the same path as the frame
+    def testSlowFramesReplay(self):
+        frames, resolution = readVideo("./core/admin/testing/testData/blueOrangeObj.mp4")
+        frames = frames[:12]
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('FlightRecorder', 'DIRECTORY', directory)
+            # Every frame is over the budget
+            config.set('FlightRecorder', 'LATENCY_BUDGET', '0.0')
+            config.set('FlightRecorder', 'RING_SIZE', '4')
+            config.set('FlightRecorder', 'MAX_DUMPS', str(len(frames) - 2))
+            objectIdentifier = coi(config, resolution)
+            tracker = ct(config, resolution)
+            recorder = FlightRecorder(config, coi(config, resolution), ct(config, resolution))
+            for index, frame in enumerate(frames):
+                expectedObjects = objectIdentifier.identifyObjects(frame)
+                tracker.update(expectedObjects)
+                assert sameObjects(recorder.process(frame), expectedObjects), f"Different objects identified in frame {index}"
+                assert getTrackerState(recorder.tracker)[0].tolist() == getTrackerState(tracker)[0].tolist(), f"Different objects tracked in frame {index}"
+            assert len(recorder.dumpPaths) == len(frames) - 2, "the dumps were not limited to MAX_DUMPS"
+            assert len(os.listdir(directory)) == len(recorder.dumpPaths), "a dump was not written"
+            assert [record['frame'] for record in recorder.ring] == list(range(len(frames) - 4, len(frames))), "the ring does not hold the last frames"
+
+            for path in recorder.dumpPaths[-2:]:
+                columns, meta = loadFlightRecord(path)
+                assert np.array_equal(columns['frame'], frames[meta['frame']]), "the raw frame was not dumped"
+                assert meta['ring'][-1]['frame'] == meta['frame'] and len(meta['ring']) == 4, "the ring was not dumped"
+                assert len(columns['trackerBefore']) > 0, "the tracker state before the frame was not dumped"
+                objects, (state, idCount), record = replayFlightRecord(path)
+                assert sameObjects(objects, getFlightRecordObjects(columns, meta)), "the replay identified different objects"
+                assert state.tolist() == columns['trackerAfter'].tolist() and idCount == meta['idCountAfter'], "the replay tracked different objects"
+                for key in ['contours', 'objects', 'tracks', 'pairs']:
+                    assert record[key] == meta['ring'][-1][key], f"the replay took another path ({key})"
+
+    # Test that the frames under the budget are not dumped, and the metrics stage times are recorded when enabled
+    def testFastFramesNotDumped(self):
+        frames, resolution = readVideo("./core/admin/testing/testData/blueObj.mp4")
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('FlightRecorder', 'DIRECTORY', os.path.join(directory, 'records'))
+            config.set('FlightRecorder', 'LATENCY_BUDGET', '1000000.0')
+            config.set('Metrics', 'ENABLED', 'True')
+            recorder = FlightRecorder(config, coi(config, resolution), ct(config, resolution))
+            for frame in frames[:10]:
+                recorder.process(frame)
+            assert recorder.dumpPaths == [] and not os.path.exists(os.path.join(directory, 'records')), "a frame under the budget was dumped"
+            record = recorder.ring[-1]
+            assert record['metricSeconds']['identifier_hsv_seconds'] > 0, "the metrics stage times were not recorded"
+            assert abs(sum(record['stages'].values()) - record['seconds']) < 1e-6, "the stage times do not add up to the frame time"
+
+            config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+            with self.assertRaises(ValueError):
+                FlightRecorder(config, coi(config, resolution), ct(config, resolution))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from pipeline.IncrementalIdentifier import IncrementalIdentifier
+from testing.util.testHelpers import readVideo, sameObjects
+
+class IncrementalIdentifierTests(unittest.TestCase):
+
+    # Test that making the masks of the changed tiles only (with any change counted) identifies
+    # the same objects as the full frame, on clips where only some of the tiles change
+    def testChangedTilesMatchFullFrame(self):
+        for videoName in ["poolShotsClip1", "poolShotsClip2"]:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('IncrementalIdentifier', 'FULL_RECOMPUTE_INTERVAL', '30')
+            config.set('IncrementalIdentifier', 'DIFF_THRESHOLD', '0')
+            frames, resolution = readVideo(f"./core/admin/testing/testData/{videoName}.mp4")
+            objectIdentifier = coi(config, resolution)
+            incrementalIdentifier = IncrementalIdentifier(config, coi(config, resolution))
+            for index, frame in enumerate(frames):
+                assert sameObjects(incrementalIdentifier.identifyObjects(frame), objectIdentifier.identifyObjects(frame)), \
+                    f"Different objects identified in frame {index} of {videoName}"
+            assert incrementalIdentifier.recomputedTileCount > 0, f"no tiles were made again in {videoName}"
+            assert incrementalIdentifier.fullRecomputeCount < len(frames), f"every frame was identified in full in {videoName}"
+
+    # Test that a frame that did not change is not identified again, and that a small change only makes its tiles again
+    def testUnchangedFrameSkipsWork(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('IncrementalIdentifier', 'FULL_RECOMPUTE_INTERVAL', '10')
+        frames, resolution = readVideo("./core/admin/testing/testData/blueOrangeObj.mp4")
+        objectIdentifier = coi(config, resolution)
+        incrementalIdentifier = IncrementalIdentifier(config, coi(config, resolution))
+        expectedObjects = objectIdentifier.identifyObjects(frames[0])
+        for _ in range(5):
+            assert sameObjects(incrementalIdentifier.identifyObjects(frames[0]), expectedObjects), "Different objects identified"
+        assert incrementalIdentifier.fullRecomputeCount == 1, "the unchanged frame was identified in full"
+        assert incrementalIdentifier.unchangedCount == 4, "the unchanged frame was identified again"
+
+        # Paint a small square (inside one tile and its neighbors)
+        frame = frames[0].copy()
+        frame[100:120, 100:120] = (255, 0, 0)
+        assert sameObjects(incrementalIdentifier.identifyObjects(frame), objectIdentifier.identifyObjects(frame)), "Different objects identified"
+        assert 0 < incrementalIdentifier.recomputedTileCount <= 9, "more tiles than the changed tiles and their neighbors were made again"
+
+        # The full frame is identified again every FULL_RECOMPUTE_INTERVAL frames
+        for _ in range(5):
+            incrementalIdentifier.identifyObjects(frame)
+        assert incrementalIdentifier.fullRecomputeCount == 2, "the full frame was not identified again"
+
+        # The tiles are identified without the foreground filter, so it is only allowed when every frame is identified in full
+        config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+        with self.assertRaises(ValueError):
+            IncrementalIdentifier(config, coi(config, resolution))
+        config.set('IncrementalIdentifier', 'FULL_RECOMPUTE_INTERVAL', '1')
+        IncrementalIdentifier(config, coi(config, resolution))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import cv2
+import glob
+import math
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from tracking.PredictiveTracker import PredictiveTracker as pt
+from pipeline.KeyframeProcessor import KeyframeProcessor
+
+# Track the objects of a video with a keyframe processor, returns the (label, center) of the tracked objects of every frame
+# @param videoPath: The path to the video
+# @param detectionStride: The DETECTION_STRIDE of the keyframe processor
+# @param trackerClass: The class of the tracker, CorrectiveTracker by default
+# @return: The (label, center) of the tracked objects of every frame, and the number of keyframes
+def trackVideo(videoPath, detectionStride, trackerClass=ct):
+    config = readConfigFile(f'./core/admin/config/default.ini')
+    config.set('KeyframeProcessor', 'DETECTION_STRIDE', str(detectionStride))
+
+    # Initialize the camera
+    cap = cv2.VideoCapture(videoPath)
+
+    # Get the video resolution
+    videoWidth = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    videoHeight = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    resolution = (videoWidth, videoHeight)
+
+    # Initialize the object identifier, the tracker and the keyframe processor
+    tracker = trackerClass(config, resolution)
+    keyframeProcessor = KeyframeProcessor(config, coi(config, resolution), tracker)
+
+    frameObjects = []
+    while True:
+        # Read the frame
+        ret, frame = cap.read()
+        if not ret:
+            break
+        keyframeProcessor.process(frame)
+        trackedObjects = tracker.getTrackedObjects()
+        frameObjects.append([(trackedObject.getLabel(), trackedObject.getCenter()) for trackedObject in trackedObjects.values()])
+    return frameObjects, keyframeProcessor.keyframeCount
+
+class KeyframeProcessorTests(unittest.TestCase):
+
+    # Test that identifying every fifth frame and following the flow in between tracks the
+    # objects of the tracking clips within a few pixels of identifying every frame
+    def testFlowFollowsPerFrameIdentification(self):
+        for videoPath in sorted(glob.glob("./core/admin/testing/testData/*Tracking.mp4")):
+            everyFrame, _ = trackVideo(videoPath, 1)
+            keyframes, keyframeCount = trackVideo(videoPath, 5)
+            assert len(keyframes) == len(everyFrame), "the videos have a different number of frames"
+            assert keyframeCount < len(keyframes) / 3, f"too many keyframes in {videoPath}: {keyframeCount} of {len(keyframes)}"
+
+            for frameNumber, (expectedObjects, objects) in enumerate(zip(everyFrame, keyframes)):
+                for label, (x, y) in expectedObjects:
+                    distances = [math.hypot(x - otherX, y - otherY) for otherLabel, (otherX, otherY) in objects if otherLabel == label]
+                    assert len(distances) > 0, f"a {label} object was lost in frame {frameNumber} of {videoPath}"
+                    assert min(distances) <= 10, f"a {label} object is {min(distances):.1f} pixels off in frame {frameNumber} of {videoPath}"
+
+    # Test that a predictive tracker keeps the objects of the tracking clips between keyframes with its
+    # predictions, every fifth frame being a keyframe
+    def testPredictiveTrackerPredictsBetweenKeyframes(self):
+        for videoPath in sorted(glob.glob("./core/admin/testing/testData/*Tracking.mp4")):
+            everyFrame, _ = trackVideo(videoPath, 1)
+            keyframes, keyframeCount = trackVideo(videoPath, 5, pt)
+            assert keyframeCount == math.ceil(len(keyframes) / 5), f"not every fifth frame was a keyframe in {videoPath}: {keyframeCount}"
+
+            for frameNumber, (expectedObjects, objects) in enumerate(zip(everyFrame, keyframes)):
+                assert len(objects) == len(expectedObjects), f"{len(objects)} objects tracked in frame {frameNumber} of {videoPath}"
+                for label, (x, y) in expectedObjects:
+                    distances = [math.hypot(x - otherX, y - otherY) for otherLabel, (otherX, otherY) in objects if otherLabel == label]
+                    assert len(distances) > 0, f"a {label} object was lost in frame {frameNumber} of {videoPath}"
+                    assert min(distances) <= 30, f"a {label} object is {min(distances):.1f} pixels off in frame {frameNumber} of {videoPath}"
+
+    # Test that a stride of one identifies every frame, like updating the tracker directly
+    def testStrideOneIdentifiesEveryFrame(self):
+        videoPath = "./core/admin/testing/testData/blueOrangeObj.mp4"
+        frameObjects, keyframeCount = trackVideo(videoPath, 1)
+        assert keyframeCount == len(frameObjects), "a frame was not identified"
+        assert all(len(objects) == 2 for objects in frameObjects), "more or less than two items were tracked"
+
+    # Test that the dropped frames count towards the stride, and that a gap of the stride or more is a keyframe
+    def testDroppedFramesCountTowardsStride(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('KeyframeProcessor', 'DETECTION_STRIDE', '5')
+        cap = cv2.VideoCapture("./core/admin/testing/testData/blueOrangeObj.mp4")
+        frames = [cap.read()[1] for _ in range(6)]
+        resolution = (frames[0].shape[1], frames[0].shape[0])
+        keyframeProcessor = KeyframeProcessor(config, coi(config, resolution), ct(config, resolution))
+        keyframes = [keyframeProcessor.process(frame, elapsedFrames) for frame, elapsedFrames in zip(frames, [1, 2, 2, 1, 6, 1])]
+        assert keyframes == [True, False, False, True, True, False], f"the dropped frames were not counted: {keyframes}"
+
+if __name__ == "__main__":
+    unittest.main()
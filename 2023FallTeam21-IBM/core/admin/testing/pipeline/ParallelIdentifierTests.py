@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile, readConfigDict, configToDict
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.ParallelIdentifier import ParallelIdentifier
+from testing.util.testHelpers import readVideo
+
+class ParallelIdentifierTests(unittest.TestCase):
+
+    # Test that identifying the frames in worker processes gives bit-identical contours and tracks, in frame order
+    def testParallelMatchesSerial(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        frames, resolution = readVideo("./core/admin/testing/testData/blueOrangeObj.mp4")
+
+        # Identify and track the frames serially
+        objectIdentifier = coi(config, resolution)
+        tracker = ct(config, resolution)
+        expectedObjects = []
+        expectedTracks = []
+        for frame in frames:
+            contourLabelTuples = objectIdentifier.identifyObjects(frame)
+            tracker.update(contourLabelTuples)
+            expectedObjects.append(contourLabelTuples)
+            expectedTracks.append([(id, trackedObject.getBoundingRectangle()) for id, trackedObject in tracker.getTrackedObjects().items()])
+
+        # Identify the frames in worker processes, and track them
+        tracker = ct(config, resolution)
+        with ParallelIdentifier(config, resolution, workers=3) as parallelIdentifier:
+            results = list(parallelIdentifier.identifyFrames(frames))
+        assert len(results) == len(frames), "a frame was lost"
+        for index, (frame, contourLabelTuples) in enumerate(results):
+            assert frame is frames[index], "the frames are not in order"
+            assert len(contourLabelTuples) == len(expectedObjects[index]), "different amount of objects identified"
+            for (contour, label), (expectedContour, expectedLabel) in zip(contourLabelTuples, expectedObjects[index]):
+                assert label == expectedLabel and np.array_equal(contour, expectedContour), "different objects identified"
+            tracker.update(contourLabelTuples)
+            tracks = [(id, trackedObject.getBoundingRectangle()) for id, trackedObject in tracker.getTrackedObjects().items()]
+            assert tracks == expectedTracks[index], "the objects were tracked differently"
+        assert parallelIdentifier.maxReordered <= parallelIdentifier.maxPending, "the reorder buffer held more than the pending frames"
+
+        # The workers can not share the background of the foreground filter
+        config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+        with self.assertRaises(ValueError):
+            ParallelIdentifier(config, resolution, workers=3)
+
+    # Test that a config survives the conversion to a dictionary, including changed options
+    def testConfigDictRoundTrip(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('ColoredObjectIdentifier', 'MASK_ENGINE', 'lookup')
+        copy = readConfigDict(configToDict(config))
+        assert copy.get('ColoredObjectIdentifier', 'MASK_ENGINE') == 'lookup', "a changed option was lost"
+        assert copy.getlist('ColoredObjectIdentifier', 'RED_LOWER1') == config.getlist('ColoredObjectIdentifier', 'RED_LOWER1'), "the list converter was lost"
+        assert configToDict(copy) == configToDict(config), "the configs are different"
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import contextlib
+import io
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.DetectionStore import DetectionStore
+from pipeline.ParameterSweep import ParameterSweep, trackFrames
+from testing.util.testHelpers import readVideo
+from testing.util import parameterSweep
+
+SCENARIOS = [
+    dict(name='blue', video="./core/admin/testing/testData/blueObj.mp4", criteria='track', objects=[(0, 'blue')]),
+    dict(name='greenMerge', video="./core/admin/testing/testData/greenMerge.mp4", criteria='merge', counts=(1, 2), mergedRatio=(0.45, 0.55)),
+]
+
+class ParameterSweepTests(unittest.TestCase):
+
+    # Test that merging and tracking the stored contours tracks the same objects as identifying the frames
+    def testTrackFramesMatchesIdentification(self):
+        videoPath = "./core/admin/testing/testData/twoRedOrangeItems.mp4"
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('DetectionStore', 'DIRECTORY', directory)
+            recording = DetectionStore(config).loadOrRecord(videoPath, config, unmerged=True)
+            # A merger option, the contours are stored before they are merged
+            config.set('ContourMerger', 'DEFAULT_THRESHOLD_DISTANCE', '80.0')
+
+            frames, resolution = readVideo(videoPath)
+            objectIdentifier = coi(config, resolution)
+            tracker = ct(config, resolution)
+            expectedTracks = []
+            for frame in frames:
+                tracker.update(objectIdentifier.identifyObjects(frame))
+                trackedObjects = tracker.getTrackedObjects()
+                expectedTracks.append(sorted((id, trackedObjects[id].getLabel()) for id in trackedObjects))
+
+            assert trackFrames(config, resolution, recording.getFrameColorContours()) == expectedTracks, \
+                "merging and tracking the stored contours tracked different objects"
+
+    # Test that the default options pass the scenarios, a bad tracker threshold ranks lower, and the workers get the same results
+    def testSweepRanksCombinations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('DetectionStore', 'DIRECTORY', directory)
+            grid = [('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD', [1.0, 150.0])]
+            results = ParameterSweep(config, workers=1).run(SCENARIOS, grid)
+
+            assert len(results) == 2, "every combination was not evaluated"
+            assert results[0]['options'] == {('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD'): 150.0}, "the default threshold did not rank first"
+            assert results[0]['passed'] == len(SCENARIOS), f"the default threshold failed {results[0]['scenarios']}"
+            assert results[1]['score'] < results[0]['score'], "the bad threshold did not score lower"
+            assert ParameterSweep(config, workers=2).run(SCENARIOS, grid) == results, "the worker processes got different results"
+
+            with self.assertRaises(ValueError):
+                ParameterSweep(config).makeCombinations([('ColoredObjectIdentifier', 'MINIMUM_CONTOUR_AREA', [400])])
+
+    # Test that the sweep script runs every scenario on the bundled test videos, and skips the missing videos with a warning
+    def testSweepScriptRunsTestData(self):
+        grid = [('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD', [150.0])]
+        with tempfile.TemporaryDirectory() as directory:
+            output, errors = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+                exitCode = parameterSweep.main(['default', '1', directory], grid)
+            assert exitCode == 0, f"the sweep failed: {errors.getvalue()}"
+            assert errors.getvalue() == "", f"a scenario was skipped: {errors.getvalue()}"
+            assert f"1 combinations of {len(parameterSweep.SCENARIOS)} scenarios" in output.getvalue(), "every scenario was not swept"
+
+            scenarios = parameterSweep.SCENARIOS[:1] + [dict(name='missing', video="./core/admin/testing/testData/missing.mp4", criteria='track', objects=[])]
+            output, errors = io.StringIO(), io.StringIO()
+            with mock.patch.object(parameterSweep, 'SCENARIOS', scenarios), contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+                exitCode = parameterSweep.main(['default', '1', directory], grid)
+            assert exitCode == 0, "the sweep stopped on a missing video"
+            assert "skipping missing" in errors.getvalue(), "the missing video was not reported"
+            assert "1 combinations of 1 scenarios" in output.getvalue(), "the missing video was not skipped"
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import cv2
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.RegionScheduler import RegionScheduler
+
+class RegionSchedulerTests(unittest.TestCase):
+
+    # Test that searching around the tracked objects and the frame edges, with a full scan every
+    # tenth frame, tracks the objects of the clips exactly like identifying the full frame
+    def testRegionsTrackLikeFullFrame(self):
+        for videoName in ["blueObj", "blueOrangeObj", "greenSkittleTracking", "orangeOrange", "twoRedOrangeItems"]:
+            config = readConfigFile(f'./core/admin/config/default.ini')
+            config.set('RegionScheduler', 'FULL_SCAN_INTERVAL', '10')
+
+            # Initialize the camera
+            cap = cv2.VideoCapture(f"./core/admin/testing/testData/{videoName}.mp4")
+
+            # Get the video resolution
+            videoWidth = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            videoHeight = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            resolution = (videoWidth, videoHeight)
+
+            # Initialize a tracker for the full frame, and one for the regions
+            objectIdentifier = coi(config, resolution)
+            tracker = ct(config, resolution)
+            regionTracker = ct(config, resolution)
+            regionScheduler = RegionScheduler(config, resolution, coi(config, resolution), regionTracker)
+
+            frameCount = 0
+            while True:
+                # Read the frame
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frameCount += 1
+
+                tracker.update(objectIdentifier.identifyObjects(frame))
+                regionTracker.update(regionScheduler.identifyObjects(frame))
+
+                expected = [(id, trackedObject.getLabel(), trackedObject.getBoundingRectangle()) for id, trackedObject in tracker.getTrackedObjects().items()]
+                actual = [(id, trackedObject.getLabel(), trackedObject.getBoundingRectangle()) for id, trackedObject in regionTracker.getTrackedObjects().items()]
+                assert actual == expected, f"the tracked objects are different in frame {frameCount} of {videoName}"
+
+            assert regionScheduler.fullScanCount == (frameCount + 9) // 10, "the full frame was not scanned every tenth frame"
+
+    # Test that the regions cover the tracked objects with a margin, and the entry edges
+    def testRegionsCoverTrackedObjectsAndEdges(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('RegionScheduler', 'ENTRY_EDGES', 'left, bottom')
+        resolution = (1280, 720)
+        tracker = ct(config, resolution)
+        regionScheduler = RegionScheduler(config, resolution, coi(config, resolution), tracker)
+
+        tracker.update([(cv2.boxPoints(((600, 300), (40, 40), 0)).astype(int), "red")])
+        regions = regionScheduler.getRegions(1280, 720)
+        margin = regionScheduler.MOTION_MARGIN
+        strip = regionScheduler.EDGE_STRIP_WIDTH
+        x, y, w, h = tracker.getTrackedObjects()[0].getBoundingRectangle()
+        assert any(rx <= x - margin and ry <= y - margin and rx + rw >= x + w + margin and ry + rh >= y + h + margin for rx, ry, rw, rh in regions), "the tracked object is not covered"
+        assert any(rx == 0 and ry == 0 and rw >= strip and rh == 720 for rx, ry, rw, rh in regions), "the left edge is not covered"
+        assert any(rx == 0 and ry + rh == 720 and rw == 1280 and rh >= strip for rx, ry, rw, rh in regions), "the bottom edge is not covered"
+        assert len(regions) == 3, "an edge that is not an entry edge is covered"
+
+if __name__ == "__main__":
+    unittest.main()
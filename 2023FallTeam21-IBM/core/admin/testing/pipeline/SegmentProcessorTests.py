@@ -0,0 +1,58 @@
+import unittest
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile, configToDict
+from pipeline.SegmentProcessor import SegmentProcessor, processSegment, splitSegments
+
+class SegmentProcessorTests(unittest.TestCase):
+
+    # Test that processing a video in short overlapping segments gives the same detections and track IDs as one tracker
+    # (seeking twoRedOrangeItems lands a frame early, so its segments have to be aligned by their frames)
+    def testSegmentsMatchSingleTracker(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('SegmentProcessor', 'SEGMENT_FRAMES', '60')
+        config.set('SegmentProcessor', 'OVERLAP_FRAMES', '20')
+        for videoPath in ["./core/admin/testing/testData/twoRedOrangeItems.mp4", "./core/admin/testing/testData/yellowMerge.mp4"]:
+            expected = processSegment(configToDict(config), videoPath, 0, None, 0)
+            segmentProcessor = SegmentProcessor(config, workers=2)
+            detections, tracks, frameCount = segmentProcessor.processVideo(videoPath)
+            assert frameCount == expected['frameCount'], "the frame count is different"
+            assert segmentProcessor.unalignedSegments == 0, "a segment was not aligned"
+            assert detections == expected['detections'], "different objects identified"
+            assert tracks == expected['tracks'], "the objects were tracked differently"
+
+        # The segments can not start with the background of the foreground filter
+        config.set('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER', 'True')
+        with self.assertRaises(ValueError):
+            SegmentProcessor(config, workers=2)
+
+    # Test that the segments cover every frame, and that a track moving across a segment boundary keeps its ID
+    def testStitchKeepsIdsAcrossSegments(self):
+        segments = splitSegments(100, 40, 10)
+        assert segments == [(0, 40), (30, 40), (60, None)], "the segments do not overlap"
+
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('SegmentProcessor', 'SEGMENT_FRAMES', '40')
+        config.set('SegmentProcessor', 'OVERLAP_FRAMES', '10')
+        segmentProcessor = SegmentProcessor(config, workers=1)
+        # One object moving right, tracked with a different local ID in every segment, and a second
+        # object that only appears in the second segment
+        results = []
+        for start, count in segments:
+            count = count if count is not None else 100 - start
+            tracks = [(frame, 5 + start, 0, 2 * (start + frame), 10, 20, 20) for frame in range(count)]
+            if start == 30:
+                tracks += [(frame, 1, 1, 300, 300, 20, 20) for frame in range(20, count)]
+            digests = [bytes([start + frame]) for frame in range(count)]
+            results.append({'detections': [], 'tracks': tracks, 'frameCount': count,
+                            'headDigests': digests[:10], 'tailDigests': digests[-10:]})
+        detections, tracks, frameCount = segmentProcessor.stitchSegments([start for start, _ in segments], results)
+        assert frameCount == 100, "frames were lost"
+        assert [frame for frame, id, *_ in tracks if id == 0] == list(range(100)), "the moving object changed ID"
+        assert [frame for frame, id, *_ in tracks if id == 1] == list(range(50, 70)), "the second object did not get a new ID"
+
+if __name__ == "__main__":
+    unittest.main()
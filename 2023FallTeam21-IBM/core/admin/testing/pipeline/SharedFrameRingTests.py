@@ -0,0 +1,88 @@
+import unittest
+import multiprocessing
+import numpy as np
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from pipeline.SharedFrameRing import SharedFrameRing
+from pipeline.ParallelIdentifier import ParallelIdentifier
+from testing.util.testHelpers import readVideo
+
+# Read a frame of a ring from another process, returns the sum of the frame
+# @param description: The description of the ring
+# @param slot: The slot of the frame
+# @param sequence: The sequence number of the frame
+# @return: The sum of the pixels of the frame
+def sumSharedFrame(description, slot, sequence):
+    slotCount, frameShape, dtype, name = description
+    ring = SharedFrameRing(slotCount, frameShape, dtype, name)
+    total = int(ring.read(slot, sequence).sum(dtype=np.int64))
+    ring.close()
+    return total
+
+class SharedFrameRingTests(unittest.TestCase):
+
+    # Test that released slots are reused, and that reading a reused slot with an old sequence number fails
+    def testSlotReuse(self):
+        frames, _ = readVideo("./core/admin/testing/testData/blueObj.mp4")
+        ring = SharedFrameRing(2, frames[0].shape)
+        try:
+            first = ring.acquire()
+            second = ring.acquire()
+            assert ring.acquire() is None, "more slots than the ring holds"
+            firstSequence = ring.write(first, frames[0])
+            secondSequence = ring.write(second, frames[1])
+            assert np.array_equal(ring.read(first, firstSequence), frames[0]), "the frame changed in the ring"
+            assert np.array_equal(ring.read(second, secondSequence), frames[1]), "the frame changed in the ring"
+
+            # The released slot is acquired again, and holds the new frame
+            ring.release(first)
+            third = ring.acquire()
+            assert third == first, "the released slot was not reused"
+            thirdSequence = ring.write(third, frames[2])
+            assert np.array_equal(ring.read(third, thirdSequence), frames[2]), "the frame changed in the ring"
+            with self.assertRaises(ValueError):
+                ring.read(first, firstSequence)
+        finally:
+            ring.close()
+
+    # Test that another process reads the frames the capture process wrote, by slot
+    def testOtherProcessReadsFrames(self):
+        frames, _ = readVideo("./core/admin/testing/testData/orangeOrange.mp4")
+        ring = SharedFrameRing(3, frames[0].shape)
+        try:
+            with multiprocessing.Pool(1) as pool:
+                for frame in frames[:9]:
+                    slot = ring.acquire()
+                    sequence = ring.write(slot, frame)
+                    total = pool.apply(sumSharedFrame, (ring.getDescription(), slot, sequence))
+                    assert total == int(frame.sum(dtype=np.int64)), "the other process read a different frame"
+                    ring.release(slot)
+        finally:
+            ring.close()
+
+    # Test that identifying frames sent through the ring gives the same objects as sending the frames pickled
+    def testSharedMatchesPickled(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        frames, resolution = readVideo("./core/admin/testing/testData/greenMerge.mp4")
+
+        config.set('ParallelIdentifier', 'SHARED_FRAMES', 'False')
+        with ParallelIdentifier(config, resolution, workers=2) as parallelIdentifier:
+            expected = [contourLabelTuples for _, contourLabelTuples in parallelIdentifier.identifyFrames(frames)]
+
+        config.set('ParallelIdentifier', 'SHARED_FRAMES', 'True')
+        with ParallelIdentifier(config, resolution, workers=2) as parallelIdentifier:
+            results = [contourLabelTuples for _, contourLabelTuples in parallelIdentifier.identifyFrames(frames)]
+            assert parallelIdentifier.ring is None, "the ring was not freed"
+
+        assert len(results) == len(expected), "a frame was lost"
+        for contourLabelTuples, expectedTuples in zip(results, expected):
+            assert len(contourLabelTuples) == len(expectedTuples), "different amount of objects identified"
+            for (contour, label), (expectedContour, expectedLabel) in zip(contourLabelTuples, expectedTuples):
+                assert label == expectedLabel and np.array_equal(contour, expectedContour), "different objects identified"
+
+if __name__ == "__main__":
+    unittest.main()
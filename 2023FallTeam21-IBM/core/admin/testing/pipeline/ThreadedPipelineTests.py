@@ -0,0 +1,137 @@
+import unittest
+import cv2
+import sys
+import threading
+import time
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.ThreadedPipeline import ThreadedPipeline
+
+# Capture that reads numbered frames slowly, like a camera, and records the (start, end) time of every read
+class SlowCapture():
+    def __init__(self, frameCount, delay):
+        self.frameCount = frameCount
+        self.delay = delay
+        self.index = 0
+        self.times = []
+
+    def read(self):
+        if self.index >= self.frameCount:
+            return False, None
+        start = time.perf_counter()
+        time.sleep(self.delay)
+        self.times.append((start, time.perf_counter()))
+        self.index += 1
+        return True, self.index
+
+class ThreadedPipelineTests(unittest.TestCase):
+
+    # Test that the threaded pipeline tracks the objects of a video like processing it serially
+    def testThreadedMatchesSerial(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        videoPath = "./core/admin/testing/testData/blueOrangeObj.mp4"
+
+        # Get the video resolution
+        cap = cv2.VideoCapture(videoPath)
+        resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+        # Track the objects serially
+        objectIdentifier = coi(config, resolution)
+        tracker = ct(config, resolution)
+        expected = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            tracker.update(objectIdentifier.identifyObjects(frame))
+            expected.append([(id, trackedObject.getBoundingRectangle()) for id, trackedObject in tracker.getTrackedObjects().items()])
+
+        # Track the objects in the pipeline
+        objectIdentifier = coi(config, resolution)
+        tracker = ct(config, resolution)
+        def processFrame(frame, elapsedFrames):
+            tracker.update(objectIdentifier.identifyObjects(frame))
+            return [(id, trackedObject.getBoundingRectangle()) for id, trackedObject in tracker.getTrackedObjects().items()]
+        pipeline = ThreadedPipeline(cv2.VideoCapture(videoPath), processFrame, 2)
+        actual = list(pipeline.frames())
+
+        assert actual == expected, "the pipeline tracked the objects differently"
+        assert [stats.frameCount for stats in pipeline.stats] == [len(expected)] * 3, "a stage did not handle every frame"
+        assert all(stats.maxDepth <= 2 for stats in pipeline.stats), "a queue held more frames than its size"
+
+    # Test that capturing and processing overlap, and the frames stay in order
+    def testStagesOverlap(self):
+        capture = SlowCapture(20, 0.01)
+        processTimes = []
+        def processFrame(index, elapsedFrames):
+            start = time.perf_counter()
+            time.sleep(0.01)
+            processTimes.append((start, time.perf_counter()))
+            return index
+        pipeline = ThreadedPipeline(capture, processFrame, 4)
+        frames = list(pipeline.frames())
+
+        assert frames == list(range(1, 21)), "the frames are not in order"
+        # A frame was read while another one was processed
+        overlaps = [(captureStart, captureEnd) for captureStart, captureEnd in capture.times
+                    if any(captureStart < processEnd and processStart < captureEnd for processStart, processEnd in processTimes)]
+        assert len(overlaps) > 0, "the capture and processing did not overlap"
+        assert len(pipeline.formatStats().splitlines()) == 3, "the statistics are not formatted per stage"
+
+    # Test that stopping early ends the threads, that errors reach the caller, and that None frames are output
+    def testStopAndErrors(self):
+        pipeline = ThreadedPipeline(SlowCapture(1000, 0.001), lambda index, elapsedFrames: index, 2)
+        for index in pipeline.frames():
+            if index == 5:
+                break
+        assert not any(thread.name in ('capture', 'process') for thread in threading.enumerate()), "the threads did not stop"
+
+        def failFrame(index, elapsedFrames):
+            raise RuntimeError("processing failed")
+        pipeline = ThreadedPipeline(SlowCapture(10, 0.0), failFrame, 2)
+        with self.assertRaises(RuntimeError):
+            list(pipeline.frames())
+
+        # None is a processed frame like any other, not the end of the frames
+        pipeline = ThreadedPipeline(SlowCapture(10, 0.0), lambda index, elapsedFrames: None, 2)
+        assert list(pipeline.frames()) == [None] * 10, "the frames processed to None were not output"
+
+    # Test that the latest frame mode skips the frames processing can not keep up with, and reports them
+    def testLatestFrameDropsStaleFrames(self):
+        processed = []
+        def processFrame(index, elapsedFrames):
+            time.sleep(0.02)
+            processed.append((index, elapsedFrames))
+            return index
+        pipeline = ThreadedPipeline(SlowCapture(50, 0.002), processFrame, 2, latestFrame=True)
+        frames = list(pipeline.frames())
+
+        assert frames == sorted(frames), "the frames are not in order"
+        assert len(frames) < 50, "no frames were dropped"
+        assert pipeline.captureStats.droppedFrames == 50 - len(frames), "the dropped frames were not counted"
+        # The elapsed frames count the dropped frames since the last processed frame
+        previous = 0
+        for index, elapsedFrames in processed:
+            assert elapsedFrames == index - previous, "the elapsed frames do not match the frame numbers"
+            previous = index
+
+    # Test that the tracker follows an object that moved further than the threshold over dropped frames
+    def testElapsedFramesScaleTrackerThreshold(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        tracker = ct(config, (1280, 720))
+        step = int(tracker.DEFAULT_TRACKER_THRESHOLD * 1.5)
+
+        tracker.update([(cv2.boxPoints(((200, 300), (40, 40), 0)).astype(int), "blue")])
+        tracker.update([(cv2.boxPoints(((200 + step, 300), (40, 40), 0)).astype(int), "blue")], elapsedFrames=2)
+        assert list(tracker.getTrackedObjects()) == [0], "the object was not followed over the dropped frame"
+        tracker.update([(cv2.boxPoints(((200 + 2 * step, 300), (40, 40), 0)).astype(int), "blue")])
+        assert list(tracker.getTrackedObjects()) == [1], "the object was followed further than the threshold"
+        assert tracker.getThreshold(100) == tracker.DEFAULT_TRACKER_THRESHOLD * tracker.MAX_THRESHOLD_SCALE, "the threshold scale is not capped"
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import contextlib
+import cv2
+import io
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+import TrashTrackBatch
+
+class TrashTrackBatchTests(unittest.TestCase):
+
+    # Test that the batch run writes the detections and tracks of every video and config, and an annotated video
+    def testBatchWritesDetectionsAndTracks(self):
+        with tempfile.TemporaryDirectory() as outputDir:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                exitCode = TrashTrackBatch.main(['--config', 'default', 'defaultDark', '--output', outputDir, '--annotate',
+                                                 './core/admin/testing/testData/blueObj*.mp4', './core/admin/testing/testData/blueOrangeObj.mp4'])
+            assert exitCode == 0, "the batch run failed"
+            assert "fps" in output.getvalue(), "the frames per second were not reported"
+
+            for configName in ['default', 'defaultDark']:
+                # One blue object, tracked in every frame with the same id
+                results = np.load(os.path.join(outputDir, f'blueObj.{configName}.npz'))
+                frameCount = int(results['frameCount'])
+                tracks = results['tracks']
+                assert frameCount > 0, "no frames were processed"
+                assert tracks.shape == (frameCount, 7), "more or less than one item was tracked per frame"
+                assert np.array_equal(tracks[:, 0], np.arange(frameCount)), "the tracks are not per frame"
+                assert set(tracks[:, 1].tolist()) == {0}, "the id of the tracked object changed"
+                assert set(results['labels'][tracks[:, 2]].tolist()) == {'blue'}, "the tracked object is not blue"
+                assert len(results['detections']) == frameCount, "more or less than one item was identified per frame"
+                assert tuple(results['resolution']) == (480, 854), "the resolution was not recorded"
+
+                # Two objects, blue and orange
+                results = np.load(os.path.join(outputDir, f'blueOrangeObj.{configName}.npz'))
+                labels = results['labels'][results['tracks'][:, 2]]
+                assert set(labels.tolist()) == {'blue', 'orange'}, "the tracked objects are not blue and orange"
+
+                # The annotated video has every frame
+                cap = cv2.VideoCapture(os.path.join(outputDir, f'blueObj.{configName}.mp4'))
+                assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == frameCount, "the annotated video is missing frames"
+
+    # Test that the batch run with stored detections writes the same results, and only tracks the stored videos again
+    def testBatchWithStoredDetections(self):
+        with tempfile.TemporaryDirectory() as outputDir:
+            videoPath = './core/admin/testing/testData/blueOrangeObj.mp4'
+            configPath = os.path.join(outputDir, 'stored.ini')
+            config = TrashTrackBatch.readConfigFile('./core/admin/config/default.ini')
+            config.set('DetectionStore', 'DIRECTORY', os.path.join(outputDir, 'detections'))
+            with open(configPath, 'w') as f:
+                config.write(f)
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert TrashTrackBatch.main(['--config', 'default', '--output', outputDir, videoPath]) == 0, "the batch run failed"
+                for _ in range(2):
+                    assert TrashTrackBatch.main(['--config', 'stored', '--config-dir', outputDir, '--output', outputDir, '--detections', videoPath]) == 0, \
+                        "the batch run with stored detections failed"
+                    assert len(os.listdir(os.path.join(outputDir, 'detections'))) == 1, "the detections were not stored once"
+                    expected = np.load(os.path.join(outputDir, 'blueOrangeObj.default.npz'))
+                    results = np.load(os.path.join(outputDir, 'blueOrangeObj.stored.npz'))
+                    for name in ['detections', 'tracks', 'labels', 'resolution', 'frameCount']:
+                        assert np.array_equal(results[name], expected[name]), f"the stored run wrote different {name}"
+
+    # Test that identifying the frames in the worker processes of the config, or in one segment worker, writes the same results as in this process
+    def testWorkersFromConfig(self):
+        with tempfile.TemporaryDirectory() as outputDir:
+            videoPath = './core/admin/testing/testData/blueOrangeObj.mp4'
+            config = TrashTrackBatch.readConfigFile('./core/admin/config/default.ini')
+            config.set('ParallelIdentifier', 'WORKERS', '2')
+            TrashTrackBatch.processVideo(config, videoPath, os.path.join(outputDir, 'serial.npz'))
+            stats = TrashTrackBatch.processVideo(config, videoPath, os.path.join(outputDir, 'parallel.npz'), workers=None)
+            expected = np.load(os.path.join(outputDir, 'serial.npz'))
+            results = np.load(os.path.join(outputDir, 'parallel.npz'))
+            assert stats['frames'] == int(expected['frameCount']), "frames were lost"
+            for name in ['detections', 'tracks']:
+                assert np.array_equal(results[name], expected[name]), f"the parallel run wrote different {name}"
+
+            # --workers uses the config unless it is given, also with --segments (where 1 is one worker process)
+            assert TrashTrackBatch.parseArguments([videoPath]).workers is None, "--workers does not default to the config"
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert TrashTrackBatch.main(['--output', outputDir, '--segments', '--workers', '1', videoPath]) == 0, "the one worker segment run failed"
+            results = np.load(os.path.join(outputDir, 'blueOrangeObj.default.npz'))
+            assert np.array_equal(results['tracks'], expected['tracks']), "the one worker segment run wrote different tracks"
+
+    # Test that videos with the same name in different directories write their own results, and that videos that would write the same results fail
+    def testBatchKeepsVideoDirectories(self):
+        with tempfile.TemporaryDirectory() as directory:
+            outputDir = os.path.join(directory, 'output')
+            for day in ['day1', 'day2']:
+                os.makedirs(os.path.join(directory, 'recordings', day))
+                shutil.copy('./core/admin/testing/testData/blueObj.mp4', os.path.join(directory, 'recordings', day, 'cam.mp4'))
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert TrashTrackBatch.main(['--workers', '1', '--output', outputDir, os.path.join(directory, 'recordings', '*', 'cam.mp4')]) == 0, "the batch run failed"
+            for day in ['day1', 'day2']:
+                assert os.path.isfile(os.path.join(outputDir, day, 'cam.default.npz')), f"the results of {day} were not written"
+
+            shutil.copy('./core/admin/testing/testData/blueObj.mp4', os.path.join(directory, 'recordings', 'day1', 'cam.avi'))
+            with contextlib.redirect_stderr(io.StringIO()):
+                assert TrashTrackBatch.main(['--output', outputDir, os.path.join(directory, 'recordings', 'day1', 'cam.*')]) == 1, \
+                    "the batch run did not fail with videos that write the same results"
+
+    # Test that the flight recorder records the frames identified in this process, and fails the runs it can not record
+    def testFlightRecorderNeedsOneProcess(self):
+        with tempfile.TemporaryDirectory() as outputDir:
+            videoPath = './core/admin/testing/testData/blueObj.mp4'
+            config = TrashTrackBatch.readConfigFile('./core/admin/config/default.ini')
+            config.set('FlightRecorder', 'ENABLED', 'True')
+            config.set('FlightRecorder', 'DIRECTORY', os.path.join(outputDir, 'records'))
+            config.set('FlightRecorder', 'LATENCY_BUDGET', '0.0')
+            config.set('FlightRecorder', 'MAX_DUMPS', '1')
+            with open(os.path.join(outputDir, 'recorded.ini'), 'w') as f:
+                config.write(f)
+            arguments = ['--config', 'recorded', '--config-dir', outputDir, '--output', outputDir, videoPath]
+
+            # WORKERS of the config is 0, one worker per CPU
+            with self.assertRaises(ValueError):
+                TrashTrackBatch.processVideo(config, videoPath, os.path.join(outputDir, 'parallel.npz'), workers=None)
+            for extraArguments in [[], ['--workers', '2'], ['--segments', '--workers', '1'], ['--detections', '--workers', '1']]:
+                with contextlib.redirect_stderr(io.StringIO()) as error:
+                    assert TrashTrackBatch.main(extraArguments + arguments) == 1, f"the batch run with {extraArguments} did not fail"
+                assert '[FlightRecorder]' in error.getvalue(), f"the batch run with {extraArguments} did not report the flight recorder"
+            assert not os.path.exists(os.path.join(outputDir, 'records')), "a run that can not be recorded was recorded"
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert TrashTrackBatch.main(['--workers', '1'] + arguments) == 0, "the batch run in this process failed"
+            assert len(os.listdir(os.path.join(outputDir, 'records'))) == 1, "the frame over the budget was not dumped"
+
+    # Test that the batch run fails without videos or with an unknown config
+    def testBatchFailsWithoutInputs(self):
+        with tempfile.TemporaryDirectory() as outputDir, contextlib.redirect_stderr(io.StringIO()):
+            assert TrashTrackBatch.main(['--output', outputDir, './core/admin/testing/testData/*.missing']) == 1, "the batch run did not fail without videos"
+            assert TrashTrackBatch.main(['--config', 'missing', '--output', outputDir, './core/admin/testing/testData/blueObj.mp4']) == 1, "the batch run did not fail with an unknown config"
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import cv2
+import itertools
 import numpy as np
 import sys
 
@@ -11,6 +12,7 @@ from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as co
 from identification.TrashObjectIdentifier import TrashObjectIdentifier as toi
 from tracking.CorrectiveTracker import CorrectiveTracker as ct
 from tracking.PredictiveTracker import PredictiveTracker as pt
+from tracking.TrackedObject import TrackedObject
 
 class CorrectiveTrackerTests(unittest.TestCase):
 
@@ -396,5 +398,112 @@ class CorrectiveTrackerTests(unittest.TestCase):
             ) == globalColor, "the color of the tracked object is not the same as the first frame"
 
 
+    # Test that the vectorized object distance matrix matches calculateObjectDistance for every pair
+    def testObjectDistanceMatrixMatchesScalar(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        tracker = ct(config, (1280, 720))
+
+        generator = np.random.default_rng(0)
+        for size in [10, 100, 1000]:
+            rects = [tuple(int(value) for value in rect) for rect in np.column_stack(
+                [generator.integers(0, size, (40, 2)), generator.integers(1, size // 2, (40, 2))])]
+            objects = [TrackedObject(id, rect, 'red') for id, rect in enumerate(rects)]
+            distances = tracker.calculateObjectDistanceMatrix(rects, rects)
+            for i in range(len(rects)):
+                for j in range(len(objects)):
+                    assert distances[i, j] == tracker.calculateObjectDistance(rects[i], objects[j]), f"Different distance between {rects[i]} and {rects[j]}"
+
+
+    # Test that solveAssignment assigns as many allowed pairs as possible at the lowest total cost,
+    # by comparing it to every possible assignment of small random matrices
+    def testSolveAssignmentMatchesBruteForce(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        tracker = ct(config, (1280, 720))
+
+        generator = np.random.default_rng(0)
+        for _ in range(300):
+            rowCount, columnCount = (int(count) for count in generator.integers(1, 6, 2))
+            costs = generator.integers(0, 10, (rowCount, columnCount)).astype(float)
+            allowed = generator.random((rowCount, columnCount)) < generator.random()
+
+            rows, columns = tracker.solveAssignment(costs, allowed)
+            assert len(set(rows.tolist())) == len(rows) and len(set(columns.tolist())) == len(columns), "a row or column was assigned twice"
+            assert allowed[rows, columns].all(), "a pair that is not allowed was assigned"
+
+            # Find the best assignment by trying every column (or none) for every row
+            best = (0, 0.0)
+            for choice in itertools.product(range(-1, columnCount), repeat=rowCount):
+                assigned = [(row, column) for row, column in enumerate(choice) if column != -1]
+                if len(set(column for _, column in assigned)) != len(assigned) or not all(allowed[pair] for pair in assigned):
+                    continue
+                best = min(best, (-len(assigned), sum(costs[pair] for pair in assigned)))
+            assert (-len(rows), costs[rows, columns].sum()) == best, "the assignment is not optimal"
+
+    # Test that the spatial index finds every tracked object with the label within the tracker threshold
+    def testObjectIndexFindsCloseObjects(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        tracker = ct(config, (1280, 720))
+        threshold = tracker.DEFAULT_TRACKER_THRESHOLD
+
+        generator = np.random.default_rng(0)
+        labels = ["red", "green", "blue"]
+        for id in range(200):
+            x, y, w, h = (int(value) for value in generator.integers(0, [1200, 650, 80, 80]))
+            tracker.trackedObjects[id] = TrackedObject(id, (x, y, w, h), labels[id % 3])
+        tracker.syncObjectIndex()
+        # Move some of the tracked objects around (the index follows the position updates)
+        for id in range(0, 200, 7):
+            x, y, w, h = (int(value) for value in generator.integers(0, [1200, 650, 80, 80]))
+            tracker.trackedObjects[id].updatePosition((x, y, w, h))
+
+        for _ in range(200):
+            rect = tuple(int(value) for value in generator.integers(0, [1200, 650, 80, 80]))
+            label = labels[int(generator.integers(0, 3))]
+            candidates = tracker.findCandidateObjects(rect, label, threshold)
+            assert candidates == sorted(candidates), "the candidates are not in the order of the tracked objects"
+            assert all(tracker.trackedObjects[id].getLabel() == label for id in candidates), "a candidate has another label"
+            for id, trackedObject in tracker.trackedObjects.items():
+                if trackedObject.getLabel() == label and tracker.calculateObjectDistance(rect, trackedObject) < threshold:
+                    assert id in candidates, "a close tracked object was not found"
+
+    # Test that the global assignment mode keeps the ids and colors of two objects
+    def testGlobalAssignmentBlueOrangeObjTracked(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('CorrectiveTracker', 'ASSIGNMENT_MODE', 'global')
+
+        # Initialize the camera
+        cap = cv2.VideoCapture(
+            "./core/admin/testing/testData/blueOrangeObj.mp4")
+
+        # Get the video resolution
+        videoWidth = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        videoHeight = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        resolution = (videoWidth, videoHeight)
+
+        # Initialize the object identifier
+        objectIdentifier = coi(config, resolution)
+
+        # Initialize the tracker
+        tracker = ct(config, resolution)
+
+        # get the number of frames in the video
+        num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        for _ in range(num_frames):
+            # Read the frame
+            _, frame = cap.read()
+
+            # Get the contours
+            contourLabelTuples = objectIdentifier.identifyObjects(frame)
+
+            tracker.update(contourLabelTuples)
+            trackedObjects = tracker.getTrackedObjects()
+
+            # make sure the same two objects are tracked in every frame
+            assert sorted(trackedObjects) == [0, 1], "the ids of the tracked objects are not the same as the first frame"
+            assert trackedObjects[0].getLabel() == "blue", "the color of the tracked object is not the same as the first frame"
+            assert trackedObjects[1].getLabel() == "orange", "the color of the tracked object is not the same as the first frame"
+
+
 if __name__ == "__main__":
     unittest.main()  # run all tests
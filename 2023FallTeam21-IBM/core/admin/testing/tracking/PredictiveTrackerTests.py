@@ -0,0 +1,158 @@
+import unittest
+import cv2
+import numpy as np
+import sys
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.PredictiveTracker import PredictiveTracker as pt
+
+# Build a rectangle contour labeled with a color
+def rectangleContour(x, y, w, h, label):
+    return (np.array([[[x, y]], [[x + w - 1, y]], [[x + w - 1, y + h - 1]], [[x, y + h - 1]]], dtype=np.int32), label)
+
+class PredictiveTrackerTests(unittest.TestCase):
+
+    # Test that one object keeps its id and color when it is only identified every third frame
+    def testBlueObjTrackedEveryThirdFrame(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+
+        # set global id and color
+        objID = 0
+        objectColor = "blue"
+
+        # Initialize the camera
+        cap = cv2.VideoCapture("./core/admin/testing/testData/blueObj.mp4")
+
+        # Get the video resolution
+        videoWidth = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        videoHeight = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        resolution = (videoWidth, videoHeight)
+
+        # Initialize the object identifier and the tracker
+        objectIdentifier = coi(config, resolution)
+        tracker = pt(config, resolution)
+
+        # get the number of frames in the video
+        num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        for frameNumber in range(num_frames):
+            # Read the frame
+            _, frame = cap.read()
+
+            # Only identify the objects every third frame, and predict in between
+            if frameNumber % 3 == 0:
+                tracker.update(objectIdentifier.identifyObjects(frame))
+            else:
+                tracker.predict()
+            trackedObjects = tracker.getTrackedObjects()
+
+            # make sure there is only one object tracked
+            assert len(
+                trackedObjects) == 1, "more or less than one item was tracked"
+
+            # make sure the id and color are the same as in the first frame
+            assert trackedObjects[0].getId(
+            ) == objID, "the id of the tracked object is not the same as the first frame"
+            assert trackedObjects[0].getLabel(
+            ) == objectColor, "the color of the tracked object is not the same as the first frame"
+
+    # Test that two objects keep their ids and colors when they are only identified every fifth frame
+    def testBlueOrangeObjTrackedEveryFifthFrame(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+
+        # Initialize the camera
+        cap = cv2.VideoCapture(
+            "./core/admin/testing/testData/blueOrangeObj.mp4")
+
+        # Get the video resolution
+        videoWidth = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        videoHeight = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        resolution = (videoWidth, videoHeight)
+
+        # Initialize the object identifier and the tracker
+        objectIdentifier = coi(config, resolution)
+        tracker = pt(config, resolution)
+
+        # get the number of frames in the video
+        num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        for frameNumber in range(num_frames):
+            # Read the frame
+            _, frame = cap.read()
+
+            # Only identify the objects every fifth frame, and predict in between
+            if frameNumber % 5 == 0:
+                tracker.update(objectIdentifier.identifyObjects(frame))
+            else:
+                tracker.predict()
+            trackedObjects = tracker.getTrackedObjects()
+
+            # make sure the ids and colors are the same as in the first frame
+            assert sorted(trackedObjects) == [0, 1], "the ids of the tracked objects are not the same as the first frame"
+            assert trackedObjects[0].getLabel() == "blue", "the color of the tracked object is not the same as the first frame"
+            assert trackedObjects[1].getLabel() == "orange", "the color of the tracked object is not the same as the first frame"
+
+    # Test that an object moving at a constant velocity is predicted between detections
+    def testConstantVelocityPredicted(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        tracker = pt(config, (1280, 720))
+
+        # The object moves 6 pixels right and 3 pixels down every frame, and is identified every fourth frame
+        for frameNumber in range(60):
+            x, y = 100 + 6 * frameNumber, 100 + 3 * frameNumber
+            if frameNumber % 4 == 0:
+                tracker.update([rectangleContour(x, y, 40, 30, "red")])
+            else:
+                tracker.predict()
+                # After the velocity settles, the prediction should follow the object
+                if frameNumber > 20:
+                    predictedX, predictedY, _, _ = tracker.getTrackedObjects()[0].getBoundingRectangle()
+                    assert abs(predictedX - x) <= 2 and abs(predictedY - y) <= 2, "the predicted position does not follow the object"
+        assert list(tracker.getTrackedObjects()) == [0], "the object was not tracked as one object"
+
+    # Test that a track survives MAX_MISSED_FRAMES updates without contours, and is removed after
+    def testTrackSurvivesMissedFrames(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        tracker = pt(config, (1280, 720))
+
+        tracker.update([rectangleContour(100, 100, 40, 40, "green"), rectangleContour(600, 400, 40, 40, "blue")])
+        for _ in range(tracker.MAX_MISSED_FRAMES):
+            tracker.update([rectangleContour(600, 400, 40, 40, "blue")])
+            assert sorted(tracker.getTrackedObjects()) == [0, 1], "a track was removed before MAX_MISSED_FRAMES"
+        tracker.update([rectangleContour(600, 400, 40, 40, "blue")])
+        assert sorted(tracker.getTrackedObjects()) == [1], "a track was not removed after MAX_MISSED_FRAMES"
+
+        # A contour with another label does not continue a track
+        tracker.update([rectangleContour(600, 400, 40, 40, "yellow")])
+        assert sorted(tracker.getTrackedObjects()) == [1, 2], "a contour continued a track with another label"
+
+    # Test that the dropped frames and the frames predicted over count towards MAX_MISSED_FRAMES
+    def testMissedFramesCountElapsedFrames(self):
+        config = readConfigFile(f'./core/admin/config/default.ini')
+        config.set('PredictiveTracker', 'MAX_MISSED_FRAMES', '5')
+        tracker = pt(config, (1280, 720))
+
+        tracker.update([rectangleContour(100, 100, 40, 40, "green"), rectangleContour(600, 400, 40, 40, "blue")])
+        # 3 frames without the green object
+        tracker.update([rectangleContour(600, 400, 40, 40, "blue")], elapsedFrames=3)
+        assert sorted(tracker.getTrackedObjects()) == [0, 1], "a track was removed before MAX_MISSED_FRAMES frames"
+        # 6 frames without the green object
+        tracker.update([rectangleContour(600, 400, 40, 40, "blue")], elapsedFrames=3)
+        assert sorted(tracker.getTrackedObjects()) == [1], "a track was not removed after MAX_MISSED_FRAMES frames"
+
+        # 2 frames predicted over and 3 dropped frames, then identified again
+        tracker.update([rectangleContour(100, 100, 40, 40, "green"), rectangleContour(600, 400, 40, 40, "blue")])
+        tracker.predict(elapsedFrames=2)
+        tracker.update([rectangleContour(100, 100, 40, 40, "green"), rectangleContour(600, 400, 40, 40, "blue")], elapsedFrames=3)
+        assert sorted(tracker.getTrackedObjects()) == [1, 2], "a track that was identified again was removed"
+        # 5 frames predicted over, and a sixth frame without the blue object
+        tracker.predict(elapsedFrames=5)
+        tracker.update([rectangleContour(100, 100, 40, 40, "green")])
+        assert sorted(tracker.getTrackedObjects()) == [2], "the predicted frames did not count as missed"
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,7 @@ from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as co
 from identification.Labels import TrashTypes
 from identification.Labels import Colors
 from config.config_gen import readConfigFile
+from pipeline.CachedObjectIdentifier import CachedObjectIdentifier, IdentificationCache
 
 # Get the name of the config file from user input
 # configFileName = input('Enter the name of the config file: ')
@@ -24,6 +25,11 @@ config = readConfigFile(f'./core/admin/config/{configFileName}.ini')
 # Vertical offset between box and label text
 LABEL_DISPLAY_HEIGHT = config.getint('TrashTrack2', 'LABEL_DISPLAY_HEIGHT')
 
+# The objects identified in the images, so going back to an image does not identify it again
+cache = IdentificationCache(config)
+# The cached object identifiers, by resolution
+objectIdentifiers = {}
+
 def showIdentifiedImage(imagePath):
     # Read an image frame
     frame = cv2.imread(imagePath)
@@ -32,8 +38,10 @@ def showIdentifiedImage(imagePath):
     imageHeight, imageWidth, _ = frame.shape
     resolution = (imageWidth, imageHeight)
 
-    # Create the object identifier
-    objectIdentifier = coi(config, resolution)
+    # Get the object identifier
+    if resolution not in objectIdentifiers:
+        objectIdentifiers[resolution] = CachedObjectIdentifier(config, coi(config, resolution), cache)
+    objectIdentifier = objectIdentifiers[resolution]
 
     # Create the tracker
     tracker = ct(config, resolution)
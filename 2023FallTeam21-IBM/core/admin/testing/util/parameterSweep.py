@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+
+sys.path.append('./core/admin/tracker')
+sys.path.append('./core/admin/')
+
+from config.config_gen import readConfigFile
+from pipeline.ParameterSweep import ParameterSweep
+
+# Sweeps the ContourMerger and CorrectiveTracker options over the test videos, and reports the
+# combinations ranked by the number of test scenarios they pass.
+# Run from the project root:
+#   python core/admin/testing/util/parameterSweep.py [config name] [workers] [detections directory]
+# The contours of the videos are identified once and stored in the DetectionStore DIRECTORY (or the
+# detections directory given), so later sweeps with the same ColoredObjectIdentifier options only
+# merge and track. The scenarios whose video is not found are skipped with a warning.
+
+DATA = "./core/admin/testing/testData"
+
+# The scenarios of the CorrectiveTracker and merge contour tests
+SCENARIOS = [
+    dict(name='noItems', video=f"{DATA}/NoItemsTracked.mp4", criteria='track', objects=[]),
+    dict(name='blue', video=f"{DATA}/blueObj.mp4", criteria='track', objects=[(0, 'blue')]),
+    dict(name='blueOrange', video=f"{DATA}/blueOrangeObj.mp4", criteria='track', objects=[(0, 'blue'), (1, 'orange')]),
+    dict(name='redGreenBlueOrange', video=f"{DATA}/redGreenBlueOrangeObj.mp4", criteria='track',
+         objects=[(0, 'red'), (1, 'green'), (2, 'blue'), (3, 'orange')]),
+    dict(name='red', video=f"{DATA}/redSkittleTracking.mp4", criteria='track', objects=[(0, 'red')]),
+    dict(name='green', video=f"{DATA}/greenSkittleTracking.mp4", criteria='track', objects=[(0, 'green')]),
+    dict(name='yellow', video=f"{DATA}/yellowSkittleTracking.mp4", criteria='track', objects=[(0, 'yellow')]),
+    dict(name='orange', video=f"{DATA}/orangeSkittleTracking.mp4", criteria='track', objects=[(0, 'orange')]),
+    dict(name='yellowMerge', video=f"{DATA}/oneYellowObjectMerged.mp4", criteria='merge', mergedRatio=(0.35, 0.45)),
+    dict(name='orangeMerge', video=f"{DATA}/twoOrangeMarkerMerge.mp4", criteria='merge', counts=(1, 2), mergedRatio=(0.40, 0.50)),
+    dict(name='greenMerge', video=f"{DATA}/greenMerge.mp4", criteria='merge', counts=(1, 2), mergedRatio=(0.45, 0.55)),
+    dict(name='redMerge', video=f"{DATA}/redMerge.mp4", criteria='merge', counts=(1, 2), mergedRatio=(0.40, 0.50)),
+    dict(name='redOrange', video=f"{DATA}/twoRedOrangeItems.mp4", criteria='separate', minimum=2),
+    dict(name='yellowGreen', video=f"{DATA}/twoYellowGreenMerge.mp4", criteria='separate', minimum=2),
+]
+
+# The options to sweep, (section, option, values)
+GRID = [
+    ('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD', [75.0, 100.0, 125.0, 150.0, 175.0, 200.0]),
+    ('ContourMerger', 'DEFAULT_THRESHOLD_DISTANCE', [40.0, 50.0, 60.0, 70.0, 80.0]),
+    ('ContourMerger', 'SWALLOW_AREA_RATIO_THRESHOLD', [0.25, 0.5, 0.75]),
+]
+
+# Number of ranked combinations to print
+TOP = 20
+
+# Sweep the options over the scenarios, and print the best combinations
+# @param arguments: The command line arguments, [config name] [workers] [detections directory] (sys.argv[1:] if not given)
+# @param grid: The options to sweep, (section, option, values)
+# @return: The exit code
+def main(arguments=None, grid=GRID):
+    if arguments is None:
+        arguments = sys.argv[1:]
+    configFileName = arguments[0] if len(arguments) > 0 else 'default'
+    workers = int(arguments[1]) if len(arguments) > 1 else None
+    config = readConfigFile(f'./core/admin/config/{configFileName}.ini')
+    if len(arguments) > 2:
+        config.set('DetectionStore', 'DIRECTORY', arguments[2])
+
+    # Some of the test videos are not in every checkout, the ranking is over the scenarios found
+    scenarios = [scenario for scenario in SCENARIOS if os.path.exists(scenario['video'])]
+    for scenario in SCENARIOS:
+        if scenario not in scenarios:
+            print(f"Warning: skipping {scenario['name']}, {scenario['video']} was not found", file=sys.stderr)
+    if len(scenarios) == 0:
+        print("No scenario video was found", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results = ParameterSweep(config, workers).run(scenarios, grid)
+    seconds = time.perf_counter() - start
+    print(f"{len(results)} combinations of {len(scenarios)} scenarios in {seconds:.1f} seconds")
+    print()
+
+    print(' '.join(f"{option:>28}" for _, option, _ in grid) + f" {'passed':>6} {'score':>6}  failed")
+    for result in results[:TOP]:
+        failed = [name for name, (passed, _) in result['scenarios'].items() if not passed]
+        print(' '.join(f"{result['options'][(section, option)]:>28}" for section, option, _ in grid) +
+              f" {result['passed']:>6} {result['score']:6.3f}  {', '.join(failed)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import cv2
+import sys
+import glob
+import time
+
+sys.path.append('./core/admin/tracker')
+sys.path.append('./core/admin/')
+
+from config.config_gen import readConfigFile
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from pipeline.SegmentProcessor import rectangleOverlap
+from testing.util.testHelpers import readVideo
+
+# Reports the accuracy and frames per second of the pyramid mode of the ColoredObjectIdentifier
+# on the test videos, against identifying the objects at full resolution.
+# Run from the project root:
+#   python core/admin/testing/util/pyramidReport.py [config name]
+# An object counts as found when an object with the same label overlaps its bounding rectangle
+# by at least MIN_OVERLAP (intersection over union).
+
+# Pyramid modes to report, (PYRAMID_SCALE, PYRAMID_REFINE)
+PYRAMID_MODES = [(1.0, True), (0.75, True), (0.5, True), (0.5, False), (0.25, True), (0.25, False)]
+# Smallest intersection over union for an object to count as found
+MIN_OVERLAP = 0.5
+
+# Compare identified objects against the expected objects, returns the counts and overlaps of the matches
+# @param objects: A list of tuples (contour, label) identified
+# @param expectedObjects: A list of tuples (contour, label) expected
+# @return: The number of matched objects, and the sum of their overlaps
+def compareObjects(objects, expectedObjects):
+    rects = [(cv2.boundingRect(contour), label) for contour, label in objects]
+    matched = 0
+    overlapSum = 0.0
+    for expectedContour, expectedLabel in expectedObjects:
+        expectedRect = cv2.boundingRect(expectedContour)
+        best = max([rectangleOverlap(rect, expectedRect) for rect, label in rects if label == expectedLabel], default=0.0)
+        if best >= MIN_OVERLAP:
+            matched += 1
+            overlapSum += best
+    return matched, overlapSum
+
+# Identify the objects of every frame, returns the objects and the frames per second
+# @param objectIdentifier: The object identifier
+# @param frames: The frames
+# @return: A list (per frame) of lists of tuples (contour, label), and the frames per second
+def identifyFrames(objectIdentifier, frames):
+    start = time.perf_counter()
+    objects = [objectIdentifier.identifyObjects(frame) for frame in frames]
+    seconds = time.perf_counter() - start
+    return objects, len(frames) / seconds if seconds > 0 else 0.0
+
+def main():
+    configFileName = sys.argv[1] if len(sys.argv) > 1 else 'default'
+    # Totals of every mode over all the videos
+    totals = {mode: dict(frames=0, seconds=0.0, expected=0, identified=0, matched=0, precisionMatched=0, overlapSum=0.0)
+              for mode in PYRAMID_MODES}
+    print(f"{'video':32} {'scale':>5} {'refine':>6} {'fps':>7} {'recall':>6} {'precision':>9} {'overlap':>7}")
+    for videoPath in sorted(glob.glob("./core/admin/testing/testData/*.mp4")):
+        frames, resolution = readVideo(videoPath)
+        expected = None
+        for scale, refine in PYRAMID_MODES:
+            config = readConfigFile(f'./core/admin/config/{configFileName}.ini')
+            config.set('ColoredObjectIdentifier', 'PYRAMID_SCALE', str(scale))
+            config.set('ColoredObjectIdentifier', 'PYRAMID_REFINE', str(refine))
+            objects, fps = identifyFrames(coi(config, resolution), frames)
+            if expected is None:
+                expected = objects
+            # Recall: expected objects found, precision: identified objects that were expected
+            expectedCount = sum(len(frameObjects) for frameObjects in expected)
+            identifiedCount = sum(len(frameObjects) for frameObjects in objects)
+            matched, overlapSum = 0, 0.0
+            precisionMatched = 0
+            for frameObjects, expectedObjects in zip(objects, expected):
+                frameMatched, frameOverlap = compareObjects(frameObjects, expectedObjects)
+                matched += frameMatched
+                overlapSum += frameOverlap
+                precisionMatched += compareObjects(expectedObjects, frameObjects)[0]
+            recall = matched / expectedCount if expectedCount else 1.0
+            precision = precisionMatched / identifiedCount if identifiedCount else 1.0
+            overlap = overlapSum / matched if matched else 1.0
+            videoName = videoPath.replace('\\', '/').split('/')[-1]
+            print(f"{videoName:32} {scale:5.2f} {str(refine):>6} {fps:7.1f} {recall:6.3f} {precision:9.3f} {overlap:7.3f}")
+            total = totals[(scale, refine)]
+            total['frames'] += len(frames)
+            total['seconds'] += len(frames) / fps if fps > 0 else 0.0
+            total['expected'] += expectedCount
+            total['identified'] += identifiedCount
+            total['matched'] += matched
+            total['precisionMatched'] += precisionMatched
+            total['overlapSum'] += overlapSum
+
+    print()
+    for (scale, refine), total in totals.items():
+        fps = total['frames'] / total['seconds'] if total['seconds'] > 0 else 0.0
+        recall = total['matched'] / total['expected'] if total['expected'] else 1.0
+        precision = total['precisionMatched'] / total['identified'] if total['identified'] else 1.0
+        overlap = total['overlapSum'] / total['matched'] if total['matched'] else 1.0
+        print(f"{'total':32} {scale:5.2f} {str(refine):>6} {fps:7.1f} {recall:6.3f} {precision:9.3f} {overlap:7.3f}")
+
+if __name__ == '__main__':
+    main()
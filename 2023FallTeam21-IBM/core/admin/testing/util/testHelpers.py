@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+
+# Helpers shared by the tests and the reports
+# Import them from the project root with core/admin on the path:
+#   from testing.util.testHelpers import readVideo, sameObjects
+
+# Read the frames of a video
+# @param videoPath: The path to the video
+# @return: A list of frames, and the resolution of the video
+def readVideo(videoPath):
+    cap = cv2.VideoCapture(videoPath)
+    resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return frames, resolution
+
+# Check that two lists of tuples (contour, label) are the same
+# @param objects: The first list of tuples (contour, label)
+# @param expectedObjects: The second list of tuples (contour, label)
+# @return: True if the labels and contours are the same, in the same order
+def sameObjects(objects, expectedObjects):
+    return len(objects) == len(expectedObjects) and all(
+        label == expectedLabel and np.array_equal(contour, expectedContour)
+        for (contour, label), (expectedContour, expectedLabel) in zip(objects, expectedObjects))
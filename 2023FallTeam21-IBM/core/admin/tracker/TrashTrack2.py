@@ -10,6 +10,12 @@ from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as co
 from identification.TrashObjectIdentifier import TrashObjectIdentifier as toi
 from tracking.CorrectiveTracker import CorrectiveTracker as ct
 from tracking.PredictiveTracker import PredictiveTracker as pt
+from pipeline.KeyframeProcessor import KeyframeProcessor
+from pipeline.RegionScheduler import RegionScheduler
+from pipeline.IncrementalIdentifier import IncrementalIdentifier
+from pipeline.ThreadedPipeline import ThreadedPipeline
+from pipeline.FlightRecorder import FlightRecorder
+from metrics.Metrics import getMetrics
 
 # Get the name of the config file from user input
 configFileName = input('Enter the name of the config file: ')
@@ -23,13 +29,21 @@ LABEL_DISPLAY_HEIGHT = config.getint('TrashTrack2', 'LABEL_DISPLAY_HEIGHT')
 # Capture resolution
 DISPLAY_WIDTH = config.getint('TrashTrack2', 'DISPLAY_WIDTH')
 DISPLAY_HEIGHT = config.getint('TrashTrack2', 'DISPLAY_HEIGHT')
-
-def showFrame(frame, objectIdentifier, tracker):
-    # Get the contours
-    contourLabelTuples = objectIdentifier.identifyObjects(frame)
-
-    # Update the tracker
-    tracker.update(contourLabelTuples)
+# Capture mode: serial (capture, process and show in turn), threaded (in pipeline stages)
+# or latest (in pipeline stages, always processing the newest frame and dropping the others)
+CAPTURE_MODE = config.get('TrashTrack2', 'CAPTURE_MODE')
+# Number of frames every queue of the threaded pipeline can hold
+PIPELINE_QUEUE_SIZE = config.getint('TrashTrack2', 'PIPELINE_QUEUE_SIZE')
+# Tracker: corrective (the tracked objects follow the flow between keyframes) or predictive
+# (a Kalman filter predicts the tracked objects between keyframes)
+TRACKER = config.get('TrashTrack2', 'TRACKER')
+
+def analyzeFrame(frame, frameProcessor, tracker, elapsedFrames=1):
+    if config.getboolean('TrashTrack2', 'FLIP_CAMERA'):
+        frame = cv2.flip(frame, 1)
+
+    # Identify the objects (on keyframes, or every frame with the flight recorder) and update the tracker
+    frameProcessor.process(frame, elapsedFrames)
 
     # Draw the contours
     trackedObjects = tracker.getTrackedObjects()
@@ -48,9 +62,31 @@ def showFrame(frame, objectIdentifier, tracker):
         cv2.putText(frame, str(trackedObject.getId()), trackedObject.getCenter(), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
+    return frame
+
+def showFrame(frame, frameProcessor, tracker):
+    # Analyze the frame
+    frame = analyzeFrame(frame, frameProcessor, tracker)
+
     # Show the frame
     cv2.imshow('frame', frame)
 
+# Capture, analyze and show the frames in a threaded pipeline, until q is pressed
+# The camera is read in a capture thread and the frames are analyzed in a processing thread,
+# while this thread shows them.
+# @param latestFrame: Whether to always analyze the newest frame, dropping the frames analysis can not keep up with
+def runThreaded(cap, frameProcessor, tracker, latestFrame):
+    pipeline = ThreadedPipeline(cap, lambda frame, elapsedFrames: analyzeFrame(frame, frameProcessor, tracker, elapsedFrames),
+                                PIPELINE_QUEUE_SIZE, latestFrame)
+    for frame in pipeline.frames():
+        # Show the frame
+        cv2.imshow('frame', frame)
+
+        # Exit if q is pressed
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+    print(pipeline.formatStats())
+
 
 def main():
     # Initialize the camera
@@ -67,20 +103,53 @@ def main():
     objectIdentifier = coi(config, resolution)
 
     # Initialize the tracker
-    tracker = ct(config, resolution)
-
-    while True:
-        # Read an image frame
-        _, frame = cap.read()
-        if config.getboolean('TrashTrack2', 'FLIP_CAMERA'):
-            frame = cv2.flip(frame, 1)
-
-        # Analyze and show the frame
-        showFrame(frame, objectIdentifier, tracker)
-
-        # Exit if q is pressed
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    if TRACKER == 'corrective':
+        tracker = ct(config, resolution)
+    elif TRACKER == 'predictive':
+        tracker = pt(config, resolution)
+    else:
+        raise ValueError(f"Unknown TRACKER: {TRACKER}")
+
+    # Initialize the incremental identifier (only makes the masks of the tiles that changed again,
+    # and identifies the full frame every FULL_RECOMPUTE_INTERVAL frames)
+    incrementalIdentifier = IncrementalIdentifier(config, objectIdentifier)
+
+    # Initialize the region scheduler (identifies the full frame every FULL_SCAN_INTERVAL frames,
+    # and only the regions around the tracked objects and the entry edges otherwise)
+    regionScheduler = RegionScheduler(config, resolution, incrementalIdentifier, tracker)
+
+    # Initialize the keyframe processor (identifies the objects every DETECTION_STRIDE frames, and
+    # follows the flow or the predictions of the tracker in between)
+    keyframeProcessor = KeyframeProcessor(config, regionScheduler, tracker)
+
+    # With the [FlightRecorder] ENABLED, the flight recorder identifies every frame and updates the
+    # tracker instead (the frames over the latency budget are dumped, so they can be replayed)
+    frameProcessor = keyframeProcessor
+    if config.getboolean('FlightRecorder', 'ENABLED'):
+        if TRACKER != 'corrective':
+            raise ValueError(f"The [FlightRecorder] replays the frames with a corrective TRACKER: {TRACKER}")
+        frameProcessor = FlightRecorder(config, objectIdentifier, tracker)
+
+    if CAPTURE_MODE in ('threaded', 'latest'):
+        runThreaded(cap, frameProcessor, tracker, CAPTURE_MODE == 'latest')
+    elif CAPTURE_MODE != 'serial':
+        raise ValueError(f"Unknown CAPTURE_MODE: {CAPTURE_MODE}")
+    else:
+        while True:
+            # Read an image frame
+            _, frame = cap.read()
+
+            # Analyze and show the frame
+            showFrame(frame, frameProcessor, tracker)
+
+            # Exit if q is pressed
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    # Export the stage histograms, if the metrics are enabled
+    metrics = getMetrics(config)
+    if metrics is not None:
+        metrics.export()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
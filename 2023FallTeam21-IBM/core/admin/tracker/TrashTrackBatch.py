@@ -0,0 +1,337 @@
+import argparse
+import cv2
+import glob
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.append('./core/admin/')
+sys.path.append('./core/admin/tracker/')
+
+from config.config_gen import readConfigFile
+from identification.Labels import Colors
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier as coi
+from tracking.CorrectiveTracker import CorrectiveTracker as ct
+from pipeline.ParallelIdentifier import ParallelIdentifier
+from pipeline.SegmentProcessor import SegmentProcessor
+from pipeline.DetectionStore import DetectionStore
+from metrics.Metrics import getMetrics
+from pipeline.FlightRecorder import FlightRecorder
+
+# Headless batch processing of recorded videos
+# Identifies and tracks the objects of every video with every config, without a display, and writes
+# the detections and tracks of every frame to a compressed .npz file (and optionally an annotated video).
+# Run from the project root:
+#   python core/admin/tracker/TrashTrackBatch.py --config default defaultDark --output out "recordings/*.mp4"
+# The results of a video are written to <video name>.<config name>.npz in the output directory, under the
+# directories of the video below the directory all the videos share (recordings/day1/cam.mp4 and
+# recordings/day2/cam.mp4 are written to day1/cam.default.npz and day2/cam.default.npz).
+# The frames are identified in parallel worker processes (--workers, WORKERS from the [ParallelIdentifier]
+# config by default, the tracks are the same as identifying them in this process with --workers 1).
+# With --segments, the videos are split into overlapping time segments that are identified and tracked
+# in parallel worker processes, and the track IDs are stitched across the segments.
+# With --detections, the identified objects are stored in the DetectionStore (see the [DetectionStore]
+# config), and a video that is already stored with the same identifier options is only tracked again.
+# With the [Metrics] ENABLED, the stage histograms of every config (with the ones of the worker processes)
+# are exported after the config (see the [Metrics] config).
+# With the [FlightRecorder] ENABLED, the frames over the latency budget are dumped with the records of
+# the frames before them (see the FlightRecorder). The flight recorder identifies the frames itself, so
+# it needs --workers 1 (WORKERS of the shipped config is 0) and fails with --segments or --detections.
+# The .npz file holds:
+#   detections: An (n, 7) int32 array of (frame, label, x, y, w, h, area) rows, one per identified object
+#   tracks: An (m, 7) int32 array of (frame, id, label, x, y, w, h) rows, one per tracked object per frame
+#   labels: The label names, indexed by the label columns
+#   resolution, fps, frameCount: The resolution, frame rate and number of frames of the video
+
+# Expand video paths and globs into a sorted list of paths, without duplicates
+# @param patterns: The video paths or globs
+# @return: A list of video paths
+def expandVideoPaths(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths += [path for path in matches if path not in paths]
+    return paths
+
+# Draw the tracked objects on a frame, like TrashTrack2 shows them
+# @param frame: The frame to draw on
+# @param trackedObjects: The tracked objects to draw
+# @param labelDisplayHeight: The vertical offset between box and label text (LABEL_DISPLAY_HEIGHT of the [TrashTrack2] config)
+def drawTrackedObjects(frame, trackedObjects, labelDisplayHeight):
+    for id in trackedObjects:
+        trackedObject = trackedObjects[id]
+        # Draw the bounding rectangle
+        cv2.rectangle(frame, trackedObject.getBoundingRectangle(),
+                      Colors.labelColor(trackedObject.getLabel()), 2)
+        # Draw the label
+        x, y, _, _ = trackedObject.getBoundingRectangle()
+        cv2.putText(frame, str(trackedObject.getLabel()), (x, y - labelDisplayHeight),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        # Draw TrackedObject ID
+        cv2.putText(frame, str(trackedObject.getId()), trackedObject.getCenter(),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+# Get the output names of the videos, returns a dictionary of names (without extension) by video path
+# The names keep the directories of the videos below the directory they all share, so videos with the
+# same file name in different directories do not overwrite each other's results.
+# @param videoPaths: The video paths
+# @return: A dictionary of output names by video path
+def getOutputNames(videoPaths):
+    directories = [os.path.dirname(os.path.abspath(path)) for path in videoPaths]
+    commonDirectory = os.path.commonpath(directories)
+    outputNames = {}
+    for path, directory in zip(videoPaths, directories):
+        name = os.path.splitext(os.path.basename(path))[0]
+        outputNames[path] = os.path.normpath(os.path.join(os.path.relpath(directory, commonDirectory), name))
+    names = list(outputNames.values())
+    duplicates = sorted(path for path in videoPaths if names.count(outputNames[path]) > 1)
+    if duplicates:
+        raise ValueError(f"Videos would write the same results: {', '.join(duplicates)}")
+    return outputNames
+
+# Check that the [FlightRecorder] is not enabled for a run it can not record, raises a ValueError if it is
+# @param config: The configuration object that stores the settings to run with
+# @param run: The run the flight recorder can not record, for the error message
+def checkFlightRecorder(config, run):
+    if config.getboolean('FlightRecorder', 'ENABLED'):
+        raise ValueError(f"The [FlightRecorder] can not record {run}: use --workers 1 without --segments or --detections, or disable it")
+
+# Read the frames of a video capture
+# @param cap: The video capture to read
+# @return: A generator of frames
+def readFrames(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame
+
+# Identify and track the objects of a video, and write the detections and tracks, returns the statistics of the run
+# @param config: The configuration object that stores the settings to run with
+# @param videoPath: The path to the video
+# @param outputPath: The path of the .npz file to write
+# @param annotatedPath: The path of the annotated video to write, None to not write one
+# @param workers: The number of worker processes to identify the frames in (1 identifies them in this
+#                 process, 0 uses one worker per CPU, None uses WORKERS from the [ParallelIdentifier] config)
+# @return: A dictionary with the number of frames, the processing time (seconds, including decoding) and the frames per second
+def processVideo(config, videoPath, outputPath, annotatedPath=None, workers=1):
+    if workers is None:
+        workers = config.getint('ParallelIdentifier', 'WORKERS')
+    if workers != 1:
+        checkFlightRecorder(config, 'the frames identified in worker processes')
+    cap = cv2.VideoCapture(videoPath)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {videoPath}")
+
+    # Get the video resolution
+    videoWidth = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    videoHeight = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    resolution = (videoWidth, videoHeight)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    # Initialize the tracker
+    tracker = ct(config, resolution)
+    labelIndex = {label: index for index, label in enumerate(Colors.labels)}
+
+    writer = None
+    labelDisplayHeight = config.getint('TrashTrack2', 'LABEL_DISPLAY_HEIGHT')
+    if annotatedPath is not None:
+        writer = cv2.VideoWriter(annotatedPath, cv2.VideoWriter_fourcc(*'mp4v'), fps if fps > 0 else 30.0, resolution)
+
+    # Identify the frames in this process, or in worker processes (the results come back in frame order)
+    parallelIdentifier = None
+    flightRecorder = None
+    if config.getboolean('FlightRecorder', 'ENABLED'):
+        # The flight recorder identifies and tracks every frame itself
+        flightRecorder = FlightRecorder(config, coi(config, resolution), tracker)
+        identifiedFrames = ((frame, None) for frame in readFrames(cap))
+    elif workers == 1:
+        objectIdentifier = coi(config, resolution)
+        identifiedFrames = ((frame, objectIdentifier.identifyObjects(frame)) for frame in readFrames(cap))
+    else:
+        parallelIdentifier = ParallelIdentifier(config, resolution, workers)
+        identifiedFrames = parallelIdentifier.identifyFrames(readFrames(cap))
+
+    detections = []
+    tracks = []
+    frameCount = 0
+    start = time.perf_counter()
+    try:
+        for frame, contourLabelTuples in identifiedFrames:
+            # Update the tracker
+            if flightRecorder is not None:
+                contourLabelTuples = flightRecorder.process(frame)
+            else:
+                tracker.update(contourLabelTuples)
+
+            # Record the detections and tracks of the frame
+            for contour, label in contourLabelTuples:
+                x, y, w, h = cv2.boundingRect(contour)
+                detections.append((frameCount, labelIndex[label], x, y, w, h, int(round(cv2.contourArea(contour)))))
+            trackedObjects = tracker.getTrackedObjects()
+            for id in trackedObjects:
+                x, y, w, h = trackedObjects[id].getBoundingRectangle()
+                tracks.append((frameCount, id, labelIndex[trackedObjects[id].getLabel()], x, y, w, h))
+
+            if writer is not None:
+                drawTrackedObjects(frame, trackedObjects, labelDisplayHeight)
+                writer.write(frame)
+            frameCount += 1
+        processingTime = time.perf_counter() - start
+    finally:
+        # Stop the worker processes and close the files, also when a frame failed
+        if parallelIdentifier is not None:
+            parallelIdentifier.close()
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+    writeResults(outputPath, detections, tracks, resolution, fps, frameCount)
+    return {'frames': frameCount, 'seconds': processingTime, 'fps': frameCount / processingTime if processingTime > 0 else 0.0}
+
+# Identify and track the objects of a video in parallel time segments, and write the detections and tracks,
+# returns the statistics of the run
+# @param config: The configuration object that stores the settings to run with
+# @param videoPath: The path to the video
+# @param outputPath: The path of the .npz file to write
+# @param workers: The number of worker processes (0 uses one worker per CPU, None uses WORKERS from the [SegmentProcessor] config)
+# @return: A dictionary with the number of frames, the processing time (seconds, including decoding) and the frames per second
+def processVideoSegments(config, videoPath, outputPath, workers=None):
+    checkFlightRecorder(config, 'time segments')
+    cap = cv2.VideoCapture(videoPath)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {videoPath}")
+    resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    start = time.perf_counter()
+    segmentProcessor = SegmentProcessor(config, workers)
+    detections, tracks, frameCount = segmentProcessor.processVideo(videoPath)
+    processingTime = time.perf_counter() - start
+
+    writeResults(outputPath, detections, tracks, resolution, fps, frameCount)
+    return {'frames': frameCount, 'seconds': processingTime, 'fps': frameCount / processingTime if processingTime > 0 else 0.0}
+
+# Track the objects of a video from its stored detections, and write the detections and tracks, returns the statistics of the run
+# The video is identified and stored first if it is not stored with the identifier options of the config.
+# @param config: The configuration object that stores the settings to run with
+# @param videoPath: The path to the video
+# @param outputPath: The path of the .npz file to write
+# @return: A dictionary with the number of frames, the processing time (seconds, including identifying
+#          the video if it was not stored) and the frames per second
+def processVideoStored(config, videoPath, outputPath):
+    checkFlightRecorder(config, 'stored detections')
+    start = time.perf_counter()
+    recording = DetectionStore(config).loadOrRecord(videoPath, config)
+    tracker = ct(config, recording.resolution)
+
+    tracks = []
+    def recordTracks(frame, tracker):
+        trackedObjects = tracker.getTrackedObjects()
+        for id in trackedObjects:
+            x, y, w, h = trackedObjects[id].getBoundingRectangle()
+            tracks.append((frame, id, Colors.labels.index(trackedObjects[id].getLabel()), x, y, w, h))
+    recording.replay(tracker, recordTracks)
+    processingTime = time.perf_counter() - start
+
+    # The detections of every frame, as (frame, label, x, y, w, h, area) rows
+    frames = np.repeat(np.arange(recording.frameCount), np.diff(recording.frameOffsets))
+    detections = np.column_stack([frames, recording.labels, recording.rects, np.round(recording.areas)])
+    writeResults(outputPath, detections, tracks, recording.resolution, recording.fps, recording.frameCount)
+    return {'frames': recording.frameCount, 'seconds': processingTime,
+            'fps': recording.frameCount / processingTime if processingTime > 0 else 0.0}
+
+# Write the detections and tracks of a video to a compressed .npz file
+# @param outputPath: The path of the .npz file to write
+# @param detections: The (frame, label, x, y, w, h, area) detections
+# @param tracks: The (frame, id, label, x, y, w, h) tracks
+# @param resolution: The resolution (width, height) of the video
+# @param fps: The frame rate of the video
+# @param frameCount: The number of frames of the video
+def writeResults(outputPath, detections, tracks, resolution, fps, frameCount):
+    np.savez_compressed(outputPath,
+                        detections=np.array(detections, dtype=np.int32).reshape(-1, 7),
+                        tracks=np.array(tracks, dtype=np.int32).reshape(-1, 7),
+                        labels=np.array(Colors.labels),
+                        resolution=np.array(resolution, dtype=np.int32),
+                        fps=np.float64(fps),
+                        frameCount=np.int64(frameCount))
+
+# Parse the command line arguments, returns the parsed arguments
+# @param argv: The command line arguments (without the program name)
+# @return: The parsed arguments
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Identify and track the objects of recorded videos without a display.')
+    parser.add_argument('videos', nargs='+', help='video paths or globs (quote globs so the shell does not expand them)')
+    parser.add_argument('--config', nargs='+', default=['default'], help='names of the config files in core/admin/config (default: default)')
+    parser.add_argument('--config-dir', default='./core/admin/config', help='directory of the config files')
+    parser.add_argument('--output', default='.', help='directory to write the results to')
+    parser.add_argument('--annotate', action='store_true', help='also write an annotated video for every run')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes to identify the frames (or segments) in '
+                        '(default: WORKERS from the [ParallelIdentifier] config, or the [SegmentProcessor] config with --segments; '
+                        '1: in this process, or one segment at a time with --segments; 0: one per CPU)')
+    parser.add_argument('--segments', action='store_true', help='identify and track overlapping time segments of the videos in parallel')
+    parser.add_argument('--detections', action='store_true', help='store the identified objects in the [DetectionStore] DIRECTORY, and only track the videos that are already stored')
+    return parser.parse_args(argv)
+
+# Process every video with every config, and report the frames per second of every run
+# @param argv: The command line arguments (without the program name), sys.argv[1:] if not given
+# @return: The exit code
+def main(argv=None):
+    arguments = parseArguments(sys.argv[1:] if argv is None else argv)
+    videoPaths = expandVideoPaths(arguments.videos)
+    if len(videoPaths) == 0:
+        print('No videos found', file=sys.stderr)
+        return 1
+    if arguments.segments and arguments.annotate:
+        print('--annotate can not be used with --segments', file=sys.stderr)
+        return 1
+    if arguments.detections and (arguments.annotate or arguments.segments):
+        print('--detections can not be used with --annotate or --segments', file=sys.stderr)
+        return 1
+    try:
+        outputNames = getOutputNames(videoPaths)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for outputName in outputNames.values():
+        os.makedirs(os.path.join(arguments.output, os.path.dirname(outputName)), exist_ok=True)
+
+    totalFrames = 0
+    totalTime = 0.0
+    for configName in arguments.config:
+        configPath = os.path.join(arguments.config_dir, f'{configName}.ini')
+        if not os.path.isfile(configPath):
+            print(f'Config file not found: {configPath}', file=sys.stderr)
+            return 1
+        config = readConfigFile(configPath)
+        for videoPath in videoPaths:
+            outputName = outputNames[videoPath]
+            outputPath = os.path.join(arguments.output, f'{outputName}.{configName}.npz')
+            annotatedPath = os.path.join(arguments.output, f'{outputName}.{configName}.mp4') if arguments.annotate else None
+            try:
+                if arguments.detections:
+                    stats = processVideoStored(config, videoPath, outputPath)
+                elif arguments.segments:
+                    stats = processVideoSegments(config, videoPath, outputPath, arguments.workers)
+                else:
+                    stats = processVideo(config, videoPath, outputPath, annotatedPath, arguments.workers)
+            except ValueError as error:
+                print(error, file=sys.stderr)
+                return 1
+            totalFrames += stats['frames']
+            totalTime += stats['seconds']
+            print(f"{videoPath} [{configName}]: {stats['frames']} frames in {stats['seconds']:.2f} s ({stats['fps']:.1f} fps) -> {outputPath}")
+        # Export the histograms of the config, and start the next config from empty histograms
+        metrics = getMetrics(config)
+        if metrics is not None:
+            metrics.export()
+            metrics.reset()
+    if totalTime > 0:
+        print(f"Total: {totalFrames} frames in {totalTime:.2f} s ({totalFrames / totalTime:.1f} fps)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,21 @@
+import collections
 import cv2
 import numpy as np
+import time
 
 from identification.ObjectIdentifier import ObjectIdentifier
 from identification.ContourMerger import ContourMerger
+from identification.ForegroundFilter import ForegroundFilter
 from identification.Labels import Colors
+from metrics.Metrics import getMetrics
 
 # Concrete class for object identification by the 6 colors: red, green, blue, yellow, purple, orange
 class ColoredObjectIdentifier(ObjectIdentifier):
     
     # Standard resolution average (pixels) (for width of 1280 and height of 720)
     STANDARD_RESOLUTION_AREA = 1280.0 * 720.0
+    # Largest number of buffer sets (one per frame or region size) to keep
+    MAX_BUFFER_SETS = 4
 
     # Initializes the Colored Object Identifier and its options
     # @param config: The configuration object that stores the settings the project is running on
@@ -35,38 +41,138 @@ class ColoredObjectIdentifier(ObjectIdentifier):
         self.PURPLE_UPPER = np.array(config.getlist('ColoredObjectIdentifier', 'PURPLE_UPPER'))
         self.ORANGE_LOWER = np.array(config.getlist('ColoredObjectIdentifier', 'ORANGE_LOWER'))
         self.ORANGE_UPPER = np.array(config.getlist('ColoredObjectIdentifier', 'ORANGE_UPPER'))
+        self.MASK_ENGINE = config.get('ColoredObjectIdentifier', 'MASK_ENGINE')
+        self.CONTOUR_ENGINE = config.get('ColoredObjectIdentifier', 'CONTOUR_ENGINE')
+        self.PYRAMID_SCALE = config.getfloat('ColoredObjectIdentifier', 'PYRAMID_SCALE')
+        self.PYRAMID_REFINE = config.getboolean('ColoredObjectIdentifier', 'PYRAMID_REFINE')
+        self.PYRAMID_MARGIN = config.getfloat('ColoredObjectIdentifier', 'PYRAMID_MARGIN')
+        self.USE_FOREGROUND_FILTER = config.getboolean('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER')
+
+        # Group the HSV ranges by color, in the same order as Colors.labels
+        # (red is split into two ranges that wrap around the hue circle)
+        self.colorRanges = [
+            [(self.RED_LOWER1, self.RED_UPPER1), (self.RED_LOWER2, self.RED_UPPER2)],
+            [(self.GREEN_LOWER, self.GREEN_UPPER)],
+            [(self.BLUE_LOWER, self.BLUE_UPPER)],
+            [(self.YELLOW_LOWER, self.YELLOW_UPPER)],
+            [(self.PURPLE_LOWER, self.PURPLE_UPPER)],
+            [(self.ORANGE_LOWER, self.ORANGE_UPPER)],
+        ]
+        # Compile the HSV ranges into a lookup table once, if the lookup engine is used
+        if self.MASK_ENGINE == 'lookup':
+            self.lookupTable = self.compileLookupTable(self.colorRanges)
+        elif self.MASK_ENGINE != 'inrange':
+            raise ValueError(f"Unknown MASK_ENGINE: {self.MASK_ENGINE}")
+        if self.CONTOUR_ENGINE not in ('contours', 'components'):
+            raise ValueError(f"Unknown CONTOUR_ENGINE: {self.CONTOUR_ENGINE}")
+        if not 0.0 < self.PYRAMID_SCALE <= 1.0:
+            raise ValueError(f"PYRAMID_SCALE must be more than 0 and at most 1: {self.PYRAMID_SCALE}")
 
         # Convert the resolution into pixel thresholds
         resolutionWidth = resolution[0]
         resolutionHeight = resolution[1]
         resolutionArea = resolutionWidth * resolutionHeight
         self.MINIMUM_CONTOUR_AREA = self.MINIMUM_CONTOUR_AREA * resolutionArea / self.STANDARD_RESOLUTION_AREA
+        self.PYRAMID_MARGIN = self.PYRAMID_MARGIN * (resolutionArea / self.STANDARD_RESOLUTION_AREA) ** 0.5
+        # Build the morphology kernel once (the 3x3 rectangle erode and dilate use by default)
+        self.morphologyKernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        # The buffers the frames are converted and thresholded into, by frame size, reused for every
+        # frame of the same size so identifying a frame does not allocate full-frame images
+        self.bufferSets = collections.OrderedDict()
+        # The full image masks the pyramid mode refines the regions into, kept apart from the buffer
+        # sets (the many region sizes would drop them)
+        self.refineBuffers = None
         # Initialize the contour merger
         self.contourMerger = ContourMerger(config, resolution)
+        # Get the metrics the stages are recorded in, None if they are not enabled
+        self.metrics = getMetrics(config)
+        # Initialize the foreground filter, if only the objects of the moving foreground are identified
+        self.foregroundFilter = ForegroundFilter(config, resolution) if self.USE_FOREGROUND_FILTER else None
         # Call the parent constructor
         super().__init__()
 
+    # Get the buffers for a frame size, returns a dictionary of buffers
+    # The buffers are allocated the first time a size is seen, and the least recently used size
+    # is dropped when there are more than MAX_BUFFER_SETS sizes (regions can have many sizes).
+    # @param height: The height of the frame
+    # @param width: The width of the frame
+    # @return: A dictionary of buffers (hsv, range, eroded, extra, masks, and lookup, channels,
+    #          bits or labels for the engines that use them, and image for the pyramid mode)
+    def getBuffers(self, height, width):
+        key = (height, width)
+        buffers = self.bufferSets.get(key)
+        if buffers is not None:
+            self.bufferSets.move_to_end(key)
+            return buffers
+        buffers = {
+            'hsv': np.empty((height, width, 3), dtype=np.uint8),
+            'range': np.empty((height, width), dtype=np.uint8),
+            'eroded': np.empty((height, width), dtype=np.uint8),
+            'extra': np.empty((height, width), dtype=np.uint8),
+            'masks': [np.empty((height, width), dtype=np.uint8) for _ in Colors.labels],
+        }
+        if self.MASK_ENGINE == 'lookup':
+            buffers['lookup'] = np.empty((height, width, 3), dtype=np.uint8)
+            buffers['channels'] = [np.empty((height, width), dtype=np.uint8) for _ in range(3)]
+            buffers['bits'] = np.empty((height, width), dtype=np.uint8)
+        if self.CONTOUR_ENGINE == 'components':
+            buffers['labels'] = np.empty((height, width), dtype=np.int32)
+        if self.PYRAMID_SCALE < 1.0:
+            buffers['image'] = np.empty((height, width, 3), dtype=np.uint8)
+        self.bufferSets[key] = buffers
+        if len(self.bufferSets) > self.MAX_BUFFER_SETS:
+            self.bufferSets.popitem(last=False)
+        return buffers
+
     # Make a mask for the color, returns the mask
     # @param hsvFrame: The HSV frame to make a mask for
     # @param lower: The lower bound of the color
     # @param upper: The upper bound of the color
+    # @param dst: The image to write the mask to, None to allocate one
     # @return: The mask
-    def makeMask(self, hsvFrame, lower, upper):
-        mask = cv2.inRange(hsvFrame, lower, upper)
-        mask = self.cleanNoise(mask, self.ERODE_ITERATIONS, self.DILATE_ITERATIONS)
+    def makeMask(self, hsvFrame, lower, upper, dst=None):
+        buffers = self.getBuffers(*hsvFrame.shape[:2])
+        mask = cv2.inRange(hsvFrame, lower, upper, dst=buffers['range'])
+        mask = self.cleanNoise(mask, self.ERODE_ITERATIONS, self.DILATE_ITERATIONS,
+                               self.morphologyKernel, dst=dst, work=buffers['eroded'])
         return mask
 
+    # Find the contours in a color mask that are larger than MINIMUM_CONTOUR_AREA, returns a list of contours
+    # Uses findContours and filters every contour by area, or connected components
+    # with bulk filtering, depending on CONTOUR_ENGINE.
+    # @param mask: The mask to find contours in
+    # @param minimumArea: The area a contour must be larger than, MINIMUM_CONTOUR_AREA if not given
+    # @return: A list of contours
+    def findColorContours(self, mask, minimumArea=None):
+        if minimumArea is None:
+            minimumArea = self.MINIMUM_CONTOUR_AREA
+        if self.CONTOUR_ENGINE == 'components':
+            labels = self.getBuffers(*mask.shape[:2])['labels']
+            return self.defineComponentContours(mask, minimumArea, labels)
+        contours = self.defineContours(mask)
+        return [contour for contour in contours if cv2.contourArea(contour) > minimumArea]
+
     # Identify objects by color, returns a list of tuples (contour, label)
     # Gets the contours for the specific color mask, merges the contours,
     # swallows inner contours, and assigns labels to the contours.
     # @param mask: The mask to identify objects in
     # @param color: The color to identify objects by
+    # @param foregroundMask: The foreground mask to keep the contours of, None to keep every contour
     # @return: A list of tuples (contour, label)
-    def identifyObjectsByColor(self, mask, color):
+    def identifyObjectsByColor(self, mask, color, foregroundMask=None):
         # Find contours in the mask
-        contours = self.defineContours(mask)
+        contours = self.findColorContours(mask)
+        if foregroundMask is not None:
+            contours = self.foregroundFilter.filterContours(contours, foregroundMask)
+        return self.mergeColorContours(contours, color)
+
+    # Merge the contours of a color into objects, returns a list of tuples (contour, label)
+    # Merges the contours, assigns labels to the contours and swallows inner contours.
+    # @param contours: The contours of the color
+    # @param color: The color of the contours
+    # @return: A list of tuples (contour, label)
+    def mergeColorContours(self, contours, color):
         # Merge contours
-        contours = [contour for contour in contours if cv2.contourArea(contour) > self.MINIMUM_CONTOUR_AREA]
         contours = self.contourMerger.clusterContours(contours)
         # Assign labels
         tuples = self.assignLabels(contours, color)
@@ -74,43 +180,344 @@ class ColoredObjectIdentifier(ObjectIdentifier):
             tuples = self.contourMerger.swallowContours(tuples)
         return tuples
 
-    # Concrete definition for object identification, returns a list of tuples (contour, label)
-    # Creates mask for every color, identifies objects by color, and returns the compiled list of tuples
-    # @param image: The image to identify objects in
-    # @return: A list of tuples (contour, label)
-    def identifyObjects(self, image):
-        # Convert the image to HSV
-        hsvFrame = cv2.cvtColor(image, self.CVT_COLOR_CODE)
+    # Compile HSV ranges into a per-channel lookup table, returns the table
+    # Every range is given one bit. For each channel, the table entry of a value
+    # has the bit of every range whose bounds contain that value set, so that a
+    # pixel is inside a range exactly when the bit is set in all three channels.
+    # @param colorRanges: A list (per color) of lists of (lower, upper) HSV bounds
+    # @return: A 1x256x3 uint8 lookup table for cv2.LUT
+    def compileLookupTable(self, colorRanges):
+        ranges = [colorRange for ranges in colorRanges for colorRange in ranges]
+        if len(ranges) > 8:
+            raise ValueError(f"The lookup engine supports at most 8 HSV ranges, got {len(ranges)}")
+        lookupTable = np.zeros((1, 256, 3), dtype=np.uint8)
+        for bit, (lower, upper) in enumerate(ranges):
+            for channel in range(3):
+                start = max(int(lower[channel]), 0)
+                end = min(int(upper[channel]), 255) + 1
+                lookupTable[0, start:end, channel] |= 1 << bit
+        return lookupTable
+
+    # Make the masks for every color with one cv2.inRange call per HSV range, returns the list of masks
+    # The masks are buffers of the identifier, they are overwritten by the next frame of the same size.
+    # @param hsvFrame: The HSV frame to make the masks for
+    # @return: A list of masks, in the same order as Colors.labels
+    def makeMasksInRange(self, hsvFrame):
+        buffers = self.getBuffers(*hsvFrame.shape[:2])
+        redBuffer, greenBuffer, blueBuffer, yellowBuffer, purpleBuffer, orangeBuffer = buffers['masks']
         # Initialize the list of masks
         masks = []
         # Threshold the HSV image to get only red colors
-        redMask1 = self.makeMask(hsvFrame, self.RED_LOWER1, self.RED_UPPER1)
-        redMask2 = self.makeMask(hsvFrame, self.RED_LOWER2, self.RED_UPPER2)
-        redMask = cv2.bitwise_or(redMask1, redMask2)
+        redMask1 = self.makeMask(hsvFrame, self.RED_LOWER1, self.RED_UPPER1, redBuffer)
+        redMask2 = self.makeMask(hsvFrame, self.RED_LOWER2, self.RED_UPPER2, buffers['extra'])
+        redMask = cv2.bitwise_or(redMask1, redMask2, dst=redBuffer)
         masks.append(redMask)
         # Threshold the HSV image to get only green colors
-        greenMask = self.makeMask(hsvFrame, self.GREEN_LOWER, self.GREEN_UPPER)
+        greenMask = self.makeMask(hsvFrame, self.GREEN_LOWER, self.GREEN_UPPER, greenBuffer)
         masks.append(greenMask)
         # Threshold the HSV image to get only blue colors
-        blueMask = self.makeMask(hsvFrame, self.BLUE_LOWER, self.BLUE_UPPER)
+        blueMask = self.makeMask(hsvFrame, self.BLUE_LOWER, self.BLUE_UPPER, blueBuffer)
         masks.append(blueMask)
         # Threshold the HSV image to get only yellow colors
-        yellowMask = self.makeMask(hsvFrame, self.YELLOW_LOWER, self.YELLOW_UPPER)
+        yellowMask = self.makeMask(hsvFrame, self.YELLOW_LOWER, self.YELLOW_UPPER, yellowBuffer)
         masks.append(yellowMask)
         # Threshold the HSV image to get only purple colors
-        purpleMask = self.makeMask(hsvFrame, self.PURPLE_LOWER, self.PURPLE_UPPER)
+        purpleMask = self.makeMask(hsvFrame, self.PURPLE_LOWER, self.PURPLE_UPPER, purpleBuffer)
         masks.append(purpleMask)
         # Threshold the HSV image to get only orange colors
-        orangeMask = self.makeMask(hsvFrame, self.ORANGE_LOWER, self.ORANGE_UPPER)
+        orangeMask = self.makeMask(hsvFrame, self.ORANGE_LOWER, self.ORANGE_UPPER, orangeBuffer)
         masks.append(orangeMask)
+        return masks
+
+    # Make the masks for every color with the precompiled lookup table, returns the list of masks
+    # Classifies every pixel into a bit set of matching HSV ranges in a single pass,
+    # then cleans the noise of every range and combines the ranges of each color.
+    # Gives the same masks as makeMasksInRange (also buffers of the identifier).
+    # @param hsvFrame: The HSV frame to make the masks for
+    # @return: A list of masks, in the same order as Colors.labels
+    def makeMasksLookup(self, hsvFrame):
+        buffers = self.getBuffers(*hsvFrame.shape[:2])
+        # Look up the range bits of every channel, a pixel is in a range if all three channels agree
+        hueBits, saturationBits, valueBits = cv2.split(cv2.LUT(hsvFrame, self.lookupTable, dst=buffers['lookup']), buffers['channels'])
+        rangeBits = cv2.bitwise_and(hueBits, saturationBits, dst=buffers['bits'])
+        rangeBits = cv2.bitwise_and(rangeBits, valueBits, dst=rangeBits)
+        # Initialize the list of masks
+        masks = []
+        bit = 0
+        for ranges, colorBuffer in zip(self.colorRanges, buffers['masks']):
+            colorMask = None
+            for _ in ranges:
+                # Extract the range from the bit set and clean its noise
+                mask = cv2.bitwise_and(rangeBits, 1 << bit, dst=buffers['range'])
+                mask = cv2.compare(mask, 0, cv2.CMP_NE, dst=mask)
+                mask = self.cleanNoise(mask, self.ERODE_ITERATIONS, self.DILATE_ITERATIONS, self.morphologyKernel,
+                                       dst=colorBuffer if colorMask is None else buffers['extra'], work=buffers['eroded'])
+                colorMask = mask if colorMask is None else cv2.bitwise_or(colorMask, mask, dst=colorMask)
+                bit += 1
+            masks.append(colorMask)
+        return masks
+
+    # Make the masks for every color with the configured MASK_ENGINE, returns the list of masks
+    # @param hsvFrame: The HSV frame to make the masks for
+    # @return: A list of masks, in the same order as Colors.labels
+    def makeMasks(self, hsvFrame):
+        if self.MASK_ENGINE == 'lookup':
+            return self.makeMasksLookup(hsvFrame)
+        return self.makeMasksInRange(hsvFrame)
+
+    # Convert an image to HSV and make the masks for every color, returns the list of masks
+    # @param image: The image to make the masks for
+    # @return: A list of masks, in the same order as Colors.labels
+    def makeImageMasks(self, image):
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        # Convert the image to HSV
+        hsvFrame = cv2.cvtColor(image, self.CVT_COLOR_CODE, dst=self.getBuffers(*image.shape[:2])['hsv'])
+        if metrics is not None:
+            converted = time.perf_counter()
+            metrics.observe('identifier_hsv_seconds', converted - start)
+        # Threshold the HSV image for every color
+        masks = self.makeMasks(hsvFrame)
+        if metrics is not None:
+            metrics.observe('identifier_masks_seconds', time.perf_counter() - converted)
+        return masks
+
+    # Concrete definition for object identification, returns a list of tuples (contour, label)
+    # Creates mask for every color, identifies objects by color, and returns the compiled list of tuples
+    # With USE_FOREGROUND_FILTER, only the objects of the moving foreground are identified: only the
+    # regions of the foreground are converted and thresholded (see findContoursInRegions, the objects
+    # they cut through are followed out of them), and a frame without foreground is not thresholded at all.
+    # @param image: The image to identify objects in
+    # @return: A list of tuples (contour, label)
+    def identifyObjects(self, image):
+        return self.identifyObjectsInContours(self.findObjectContours(image))
+
+    # Find the contours of every color in an image, before they are merged, returns a list (per color) of lists of contours
+    # Finds the contours identifyObjects merges into objects (with the foreground filter and pyramid mode).
+    # @param image: The image to find the contours in
+    # @return: A list of lists of contours, in the same order as Colors.labels
+    def findObjectContours(self, image):
+        foregroundMask = None
+        if self.foregroundFilter is not None:
+            foregroundMask = self.foregroundFilter.apply(image)
+            if foregroundMask is None:
+                return [[] for _ in Colors.labels]
+        if self.PYRAMID_SCALE < 1.0:
+            return self.findContoursPyramid(image, foregroundMask)
+        metrics = self.metrics
+        if foregroundMask is not None:
+            # Only convert and threshold the regions of the foreground
+            colorContours = self.findContoursInRegions(image, self.foregroundFilter.findRegions(foregroundMask), foregroundMask)
+            if metrics is not None:
+                metrics.observe('identifier_foreground_contours', sum(len(contours) for contours in colorContours))
+            return colorContours
+        masks = self.makeImageMasks(image)
+        if metrics is not None:
+            start = time.perf_counter()
+        colorContours = [self.findColorContours(mask) for mask in masks]
+        if metrics is not None:
+            metrics.observe('identifier_contours_seconds', time.perf_counter() - start)
+            metrics.observe('identifier_contours', sum(len(contours) for contours in colorContours))
+        return colorContours
+
+    # Identify objects in the masks of every color, returns a list of tuples (contour, label)
+    # @param masks: A list of masks, in the same order as Colors.labels
+    # @param foregroundMask: The foreground mask to keep the contours of, None to keep every contour
+    # @return: A list of tuples (contour, label)
+    def identifyObjectsInMasks(self, masks, foregroundMask=None):
         # Compile the list of tuples
         colorTuples = []
         for i in range(len(masks)):
-            colorTuples += self.identifyObjectsByColor(masks[i], Colors.labels[i])
+            colorTuples += self.identifyObjectsByColor(masks[i], Colors.labels[i], foregroundMask)
         # If SWALLOW_INNER_CONTOURS is true, swallow all inner contours
         if self.SWALLOW_INNER_CONTOURS:
             colorTuples = self.contourMerger.swallowContours(colorTuples)
         return colorTuples
 
+    # Identify objects in the contours of every color, returns a list of tuples (contour, label)
+    # Merges the contours of every color, then swallows the inner contours like identifyObjects.
+    # @param colorContours: A list of lists of contours, in the same order as Colors.labels
+    # @return: A list of tuples (contour, label)
+    def identifyObjectsInContours(self, colorContours):
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        # Compile the list of tuples
+        colorTuples = []
+        for i in range(len(colorContours)):
+            colorTuples += self.mergeColorContours(colorContours[i], Colors.labels[i])
+        # If SWALLOW_INNER_CONTOURS is true, swallow all inner contours
+        if self.SWALLOW_INNER_CONTOURS:
+            colorTuples = self.contourMerger.swallowContours(colorTuples)
+        if metrics is not None:
+            metrics.observe('identifier_merge_seconds', time.perf_counter() - start)
+            metrics.observe('identifier_objects', len(colorTuples))
+        return colorTuples
+
+    # Identify objects inside regions of the image only, returns a list of tuples (contour, label)
+    # Converts and thresholds the regions only (with a border, see refineContours), grows them around
+    # the contours cut by their edges, then merges and swallows the contours like identifyObjects,
+    # so every object with a part inside the regions gets the same contour as in identifyObjects.
+    # With USE_FOREGROUND_FILTER, the foreground of the image is found first when it is not given.
+    # @param image: The image to identify objects in
+    # @param regions: A list of (x, y, w, h) regions to identify objects in
+    # @param foregroundMask: The foreground mask of the image (from the foreground filter), None to find it
+    # @return: A list of tuples (contour, label)
+    def identifyObjectsInRegions(self, image, regions, foregroundMask=None):
+        return self.identifyObjectsInContours(self.findContoursInRegions(image, regions, foregroundMask))
+
+    # Find the contours of every color inside regions of the image, returns a list (per color) of lists of contours
+    # The contours are the contours of the full image that have a part inside the regions (see refineContours).
+    # @param image: The image to find the contours in
+    # @param regions: A list of (x, y, w, h) regions to find the contours in
+    # @param foregroundMask: The foreground mask of the image (from the foreground filter), None to find it
+    # @return: A list of lists of contours (in image coordinates), in the same order as Colors.labels
+    def findContoursInRegions(self, image, regions, foregroundMask=None):
+        if self.foregroundFilter is not None and foregroundMask is None:
+            foregroundMask = self.foregroundFilter.apply(image)
+            if foregroundMask is None:
+                return [[] for _ in Colors.labels]
+        return self.refineContours(image, regions, foregroundMask)
+
+    # Identify objects coarse to fine, returns a list of tuples (contour, label)
+    # Converts, thresholds and finds the contours of the image scaled down by PYRAMID_SCALE. With
+    # PYRAMID_REFINE, the masks are then made again at full resolution in the bounding rectangles of
+    # the contours found (grown by PYRAMID_MARGIN), and the regions are grown until every contour
+    # found at full resolution lies inside them, which gives the same contours as identifyObjects
+    # for every object the coarse pass found a part of. An object the coarse pass finds no part of
+    # (small enough to be cleaned away as noise at the lower resolution, and further than
+    # PYRAMID_MARGIN from the other objects) is lost. Otherwise the contours found are scaled up and
+    # merged as they are, which is faster but coarser (enough for consumers that only use the
+    # bounding rectangles).
+    # @param image: The image to identify objects in
+    # @param foregroundMask: The foreground mask to keep the contours of, None to keep every contour
+    # @return: A list of tuples (contour, label)
+    def identifyObjectsPyramid(self, image, foregroundMask=None):
+        return self.identifyObjectsInContours(self.findContoursPyramid(image, foregroundMask))
+
+    # Find the contours of every color coarse to fine (see identifyObjectsPyramid), returns a list (per color) of lists of contours
+    # @param image: The image to find the contours in
+    # @param foregroundMask: The foreground mask to keep the contours of, None to keep every contour
+    # @return: A list of lists of contours (in image coordinates), in the same order as Colors.labels
+    def findContoursPyramid(self, image, foregroundMask=None):
+        imageHeight, imageWidth = image.shape[:2]
+        scale = self.PYRAMID_SCALE
+        width, height = max(1, int(round(imageWidth * scale))), max(1, int(round(imageHeight * scale)))
+        buffers = self.getBuffers(height, width)
+        smallImage = cv2.resize(image, (width, height), dst=buffers['image'], interpolation=cv2.INTER_LINEAR)
+        # Find the contours of every color, with the area threshold scaled down with the image (a
+        # quarter of it when refining, the area is checked again at full resolution)
+        minimumArea = self.MINIMUM_CONTOUR_AREA * scale * scale * (0.25 if self.PYRAMID_REFINE else 1.0)
+        colorContours = [self.findColorContours(mask, minimumArea) for mask in self.makeImageMasks(smallImage)]
+        if foregroundMask is not None:
+            colorContours = [self.foregroundFilter.filterContours(contours, foregroundMask, scale) for contours in colorContours]
+
+        if self.PYRAMID_REFINE:
+            # Find the contours at full resolution around the contours found
+            margin = self.PYRAMID_MARGIN
+            regions = []
+            for contours in colorContours:
+                for contour in contours:
+                    x, y, w, h = cv2.boundingRect(contour)
+                    regions.append((int(x / scale - margin), int(y / scale - margin),
+                                    int(w / scale + 2 * margin + 1), int(h / scale + 2 * margin + 1)))
+            return self.refineContours(image, regions, foregroundMask)
+
+        # Scale the contours up to full resolution (pixel centers)
+        return [[np.round((contour + 0.5) / scale - 0.5).astype(np.int32) for contour in contours] for contours in colorContours]
 
-    
\ No newline at end of file
+    # Find the contours of every color at full resolution around regions of the image, returns a list (per color) of lists of contours
+    # The masks of the regions are made with a border of ERODE_ITERATIONS + DILATE_ITERATIONS pixels
+    # (cleaning the noise of a mask reaches that far), so they are the same as the masks of the full
+    # image, and are written into full image masks the contours are found in. A blob of a mask next
+    # to a pixel outside the regions may go on outside them (whatever its area inside them), so a
+    # region is added around it (grown by its size and PYRAMID_MARGIN, so a large blob is covered in
+    # a few steps) until every blob with a part in the regions given lies inside the regions. The
+    # other blobs the added regions cut through are dropped, so every contour is a contour of the
+    # full image.
+    # @param image: The image to find the contours in
+    # @param regions: A list of (x, y, w, h) regions to start from
+    # @param foregroundMask: The foreground mask to keep the contours of, None to keep every contour
+    # @return: A list of lists of contours (in image coordinates), in the same order as Colors.labels
+    def refineContours(self, image, regions, foregroundMask=None):
+        imageHeight, imageWidth = image.shape[:2]
+        buffers = self.refineBuffers
+        if buffers is None or buffers['covered'].shape != (imageHeight, imageWidth):
+            buffers = self.refineBuffers = {
+                'masks': [np.zeros((imageHeight, imageWidth), dtype=np.uint8) for _ in Colors.labels],
+                'covered': np.zeros((imageHeight, imageWidth), dtype=np.uint8),
+                'area': (0, 0, 0, 0),
+            }
+        masks, covered = buffers['masks'], buffers['covered']
+        # Clear the part of the masks the last image used, and keep track of the part this image uses
+        left, top, right, bottom = buffers['area']
+        for mask in masks + [covered]:
+            mask[top:bottom, left:right] = 0
+        left, top, right, bottom = imageWidth, imageHeight, 0, 0
+        border = self.ERODE_ITERATIONS + self.DILATE_ITERATIONS
+        # (at least a pixel, so every added region covers more of the image)
+        margin = max(self.PYRAMID_MARGIN, 1)
+        # The regions given are marked 3 in covered (the seeds of the blobs to follow), the added regions 1
+        coverValue = 3
+        coveredRegions = []
+        coveredArea = 0
+        while regions:
+            # Make the masks of the regions, with a border around them, and keep the part inside the regions
+            # (only the part of the regions that is not covered yet)
+            regions = self.cutRegions(self.mergeRegions(regions, imageWidth, imageHeight), coveredRegions)
+            coveredArea += sum(w * h for _, _, w, h in regions)
+            if coveredArea > imageWidth * imageHeight / 3:
+                # Past a third of the image, identifying the whole image at once is cheaper than many pieces
+                colorContours = [self.findColorContours(mask) for mask in self.makeImageMasks(image)]
+                break
+            coveredRegions += regions
+            for x, y, w, h in regions:
+                outerLeft, outerTop = max(x - border, 0), max(y - border, 0)
+                outerRight, outerBottom = min(x + w + border, imageWidth), min(y + h + border, imageHeight)
+                regionMasks = self.makeImageMasks(image[outerTop:outerBottom, outerLeft:outerRight])
+                for mask, regionMask in zip(masks, regionMasks):
+                    mask[y:y+h, x:x+w] = regionMask[y - outerTop:y - outerTop + h, x - outerLeft:x - outerLeft + w]
+                covered[y:y+h, x:x+w] |= coverValue
+                left, top, right, bottom = min(left, x), min(top, y), max(right, x + w), max(bottom, y + h)
+            buffers['area'] = (left, top, right, bottom)
+            # The covered pixels next to a pixel outside the regions, in the part of the image around the regions
+            outerLeft, outerTop = max(left - 1, 0), max(top - 1, 0)
+            outerRight, outerBottom = min(right + 1, imageWidth), min(bottom + 1, imageHeight)
+            outerCovered = covered[outerTop:outerBottom, outerLeft:outerRight]
+            uncovered = cv2.compare(outerCovered, 0, cv2.CMP_EQ)
+            edge = cv2.bitwise_and(cv2.dilate(uncovered, self.morphologyKernel), cv2.bitwise_not(uncovered))
+            coverValue = 1
+            # Add a region around every blob with a pixel on the edge and one in the regions given. The
+            # blobs are found by filling them (with 1) from their pixels on the edge. The other blobs on
+            # the edge (reached by the added regions only) are cut, they are dropped once no region is added.
+            regions = []
+            blobs = []
+            for mask in masks:
+                outerMask = mask[outerTop:outerBottom, outerLeft:outerRight]
+                maskEdge = cv2.bitwise_and(edge, outerMask)
+                if cv2.countNonZero(maskEdge) == 0:
+                    continue
+                points = cv2.findNonZero(maskEdge)
+                for x, y in points.reshape(-1, 2).tolist():
+                    if outerMask[y, x] != 255:
+                        continue
+                    _, _, _, (blobX, blobY, blobWidth, blobHeight) = cv2.floodFill(outerMask, None, (x, y), 1, flags=8)
+                    blob = outerMask[blobY:blobY+blobHeight, blobX:blobX+blobWidth] == 1
+                    seeded = np.any(blob & (outerCovered[blobY:blobY+blobHeight, blobX:blobX+blobWidth] & 2 != 0))
+                    blobs.append((outerMask, (x, y), seeded))
+                    if seeded:
+                        regions.append((int(outerLeft + blobX - blobWidth - margin), int(outerTop + blobY - blobHeight - margin),
+                                        int(3 * blobWidth + 2 * margin + 1), int(3 * blobHeight + 2 * margin + 1)))
+            # Put the blobs back, and drop the cut ones if there are no more regions to add
+            for outerMask, point, seeded in blobs:
+                cv2.floodFill(outerMask, None, point, 255 if seeded or regions else 0, flags=8)
+        else:
+            if right <= left:
+                return [[] for _ in Colors.labels]
+            # Find the contours in the part of the masks the regions cover
+            offset = np.array([left, top], dtype=np.int32)
+            colorContours = [[contour + offset for contour in self.findColorContours(mask[top:bottom, left:right])] for mask in masks]
+        if foregroundMask is not None:
+            colorContours = [self.foregroundFilter.filterContours(contours, foregroundMask) for contours in colorContours]
+        return colorContours
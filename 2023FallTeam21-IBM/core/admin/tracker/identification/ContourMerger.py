@@ -1,6 +1,10 @@
 import cv2
 import numpy as np
 import math
+import heapq
+import time
+
+from metrics.Metrics import getMetrics
 
 class ContourMerger():
     # Standard resolution average (pixels) (for width of 1280 and height of 720)
@@ -12,6 +16,12 @@ class ContourMerger():
         # Get the options from the config file
         self.DEFAULT_THRESHOLD_DISTANCE = config.getfloat('ContourMerger', 'DEFAULT_THRESHOLD_DISTANCE')
         self.SWALLOW_AREA_RATIO_THRESHOLD = config.getfloat('ContourMerger', 'SWALLOW_AREA_RATIO_THRESHOLD')
+        self.CLUSTER_ENGINE = config.get('ContourMerger', 'CLUSTER_ENGINE')
+        self.SWALLOW_ENGINE = config.get('ContourMerger', 'SWALLOW_ENGINE')
+        if self.CLUSTER_ENGINE not in ('pairwise', 'sweep'):
+            raise ValueError(f"Unknown CLUSTER_ENGINE: {self.CLUSTER_ENGINE}")
+        if self.SWALLOW_ENGINE not in ('pairwise', 'sweep'):
+            raise ValueError(f"Unknown SWALLOW_ENGINE: {self.SWALLOW_ENGINE}")
 
         # Convert the resolution into pixel thresholds
         #       (DEFAULT_THRESHOLD_DISTANCE) 
@@ -19,10 +29,47 @@ class ContourMerger():
         resolutionHeight = resolution[1]
         resolutionAverage = (resolutionWidth + resolutionHeight) / 2
         self.DEFAULT_THRESHOLD_DISTANCE = self.DEFAULT_THRESHOLD_DISTANCE * resolutionAverage / self.STANDARD_RESOLUTION_AVERAGE
+        # Get the metrics the merges are recorded in, None if they are not enabled
+        self.metrics = getMetrics(config)
+        # The number of contour pairs the last cluster or swallow measured
+        self.pairCount = 0
         # Call the parent constructor
         super().__init__()
 
 
+    # Get the bounding rectangles of contours, returns an array of rectangles
+    # @param contours: The contours to get the bounding rectangles of
+    # @return: An (n, 4) array of (x, y, w, h) rectangles
+    def boundingRectangles(self, contours):
+        return np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.int64).reshape(-1, 4)
+
+    # Find the pairs of rectangles that overlap, returns two arrays of indices
+    # Sorts the rectangles by their left side and sweeps from left to right, so that
+    # only the rectangles that overlap along x are paired up before checking y.
+    # Two rectangles overlap when the overlap of their sides is larger than -margin
+    # along both axes, i.e. when they are closer than margin along both axes.
+    # @param rectangles: An (n, 4) array of (x, y, w, h) rectangles
+    # @param margin: The distance along each axis below which rectangles are paired (0 for a strict overlap)
+    # @return: Two arrays (first, second) of rectangle indices, with first < second
+    def findRectanglePairs(self, rectangles, margin=0):
+        order = np.argsort(rectangles[:, 0], kind='stable')
+        left = rectangles[order, 0]
+        right = left + rectangles[order, 2]
+        # Every rectangle is paired with the next rectangles in the sweep that start before it ends
+        starts = np.arange(len(order)) + 1
+        counts = np.maximum(np.searchsorted(left, right + margin, side='left') - starts, 0)
+        first = np.repeat(np.arange(len(order)), counts)
+        second = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        first = order[first]
+        second = order[second]
+        # Keep the pairs that also overlap along y
+        top = rectangles[:, 1]
+        bottom = top + rectangles[:, 3]
+        overlapping = np.minimum(bottom[first], bottom[second]) - np.maximum(top[first], top[second]) > -margin
+        first = first[overlapping]
+        second = second[overlapping]
+        return np.minimum(first, second), np.maximum(first, second)
+
     # Calculate the distance between two contours
     # Determines the direction of the distance,
     # and calculates the distance between the 
@@ -32,8 +79,17 @@ class ContourMerger():
     # @param contour2: The second contour
     def calculateContourDistance(self, contour1, contour2):
         # Get the bounding rectangles
-        x1, y1, w1, h1 = cv2.boundingRect(contour1)
-        x2, y2, w2, h2 = cv2.boundingRect(contour2)
+        return self.calculateRectangleDistance(cv2.boundingRect(contour1), cv2.boundingRect(contour2))
+
+    # Calculate the distance between the bounding rectangles of two contours
+    # (see calculateContourDistance)
+    # NOTE: The distance is measured between points of the two rectangles, so it is
+    #       never smaller than the gap between the rectangles along either axis.
+    # @param rect1: The bounding rectangle (x, y, w, h) of the first contour
+    # @param rect2: The bounding rectangle (x, y, w, h) of the second contour
+    def calculateRectangleDistance(self, rect1, rect2):
+        x1, y1, w1, h1 = rect1
+        x2, y2, w2, h2 = rect2
         # Get the centers of the bounding rectangles
         center1 = (x1 + w1/2, y1 + h1/2)
         center2 = (x2 + w2/2, y2 + h2/2)
@@ -117,6 +173,50 @@ class ContourMerger():
         else:
             return 0
     
+    # Calculate the distances between pairs of bounding rectangles, returns an array of distances
+    # Vectorized version of calculateRectangleDistance, the rectangle arrays are broadcast
+    # against each other (see calculateRectangleDistanceMatrix for all pairs).
+    # @param rects1: An (..., 4) array of (x, y, w, h) rectangles of the first contours
+    # @param rects2: An (..., 4) array of (x, y, w, h) rectangles of the second contours
+    # @return: An array of distances
+    def calculateRectangleDistances(self, rects1, rects2):
+        x1, y1, w1, h1 = np.moveaxis(np.asarray(rects1, dtype=np.float64), -1, 0)
+        x2, y2, w2, h2 = np.moveaxis(np.asarray(rects2, dtype=np.float64), -1, 0)
+        # Use sqrt instead of np.hypot, which does not round like math.hypot
+        def hypot(dx, dy):
+            return np.sqrt(dx * dx + dy * dy)
+        # Determine the direction of the distance
+        up = y1 + h1/2 < y2 + h2/2
+        down = y1 + h1/2 > y2 + h2/2
+        left = x1 + w1/2 < x2 + w2/2
+        right = x1 + w1/2 > x2 + w2/2
+        # Calculate the distance between the corners of the bounding rectangles for every direction
+        upLeft = np.minimum.reduce([hypot(x1 + w1 - x2, y1 + h1 - y2), hypot(x1 - x2, y1 + h1 - y2),
+                                    hypot(x1 + w1 - x2, y1 - y2), hypot(x1 + w1/2 - x2, y1 + h1 - y2),
+                                    hypot(x1 + w1 - x2, y1 + h1/2 - y2)])
+        upRight = np.minimum.reduce([hypot(x1 - x2 - w2, y1 + h1 - y2), hypot(x1 - x2 - w2, y1 - y2),
+                                     hypot(x1 + w1 - x2 - w2, y1 + h1 - y2), hypot(x1 - x2 - w2, y1 + h1/2 - y2),
+                                     hypot(x1 + w1/2 - x2 - w2, y1 + h1 - y2)])
+        downLeft = np.minimum.reduce([hypot(x1 + w1 - x2, y1 - y2 - h2), hypot(x1 + w1 - x2, y1 + h1 - y2 - h2),
+                                      hypot(x1 - x2, y1 - y2 - h2), hypot(x1 + w1 - x2, y1 + h1/2 - y2 - h2),
+                                      hypot(x1 + w1/2 - x2, y1 - y2 - h2)])
+        downRight = np.minimum.reduce([hypot(x1 - x2 - w2, y1 - y2 - h2), hypot(x1 + w1 - x2 - w2, y1 - y2 - h2),
+                                       hypot(x1 - x2 - w2, y1 + h1 - y2 - h2), hypot(x1 + w1/2 - x2 - w2, y1 - y2 - h2),
+                                       hypot(x1 - x2 - w2, y1 + h1/2 - y2 - h2)])
+        return np.select([up & left, up & right, down & left, down & right, up, down, left, right],
+                         [upLeft, upRight, downLeft, downRight,
+                          hypot(x1 + w1/2 - x2, y1 + h1 - y2), hypot(x1 + w1/2 - x2, y1 - y2 - h2),
+                          hypot(x1 + w1 - x2, y1 + h1/2 - y2), hypot(x1 - x2 - w2, y1 + h1/2 - y2)], 0.0)
+
+    # Calculate the distance between every pair of bounding rectangles, returns a distance matrix
+    # @param rects1: An (n, 4) array of (x, y, w, h) rectangles of the first contours
+    # @param rects2: An (m, 4) array of (x, y, w, h) rectangles of the second contours
+    # @return: An (n, m) array, the distance from every first rectangle to every second rectangle
+    def calculateRectangleDistanceMatrix(self, rects1, rects2):
+        rects1 = np.asarray(rects1).reshape(-1, 4)
+        rects2 = np.asarray(rects2).reshape(-1, 4)
+        return self.calculateRectangleDistances(rects1[:, None, :], rects2[None, :, :])
+
     # Merge two contours, returns the merged contour
     # @param contour1: The first contour
     # @param contour2: The second contour
@@ -124,6 +224,97 @@ class ContourMerger():
     def mergeContours(self, contour1, contour2):
         return np.concatenate((contour1, contour2), axis=0)
 
+    # Cluster contours with the configured CLUSTER_ENGINE, returns a list of contours
+    # @param contours: The contours to cluster
+    # NOTE: contours should be of the same object type
+    # @return: A list of contours
+    def clusterContours(self, contours):
+        metrics = self.metrics
+        if metrics is None:
+            if self.CLUSTER_ENGINE == 'sweep':
+                return self.clusterContoursSweep(contours)
+            return self.clusterContoursPairwise(contours)
+        contourCount = len(contours)
+        start = time.perf_counter()
+        if self.CLUSTER_ENGINE == 'sweep':
+            clusters = self.clusterContoursSweep(contours)
+        else:
+            clusters = self.clusterContoursPairwise(contours)
+        metrics.observe('merger_cluster_seconds', time.perf_counter() - start)
+        metrics.observe('merger_cluster_pairs', self.pairCount)
+        metrics.observe('merger_cluster_contours', contourCount)
+        metrics.observe('merger_clusters', len(clusters))
+        return clusters
+
+    # Cluster contours with a sweep over their bounding rectangles, returns a list of contours
+    # Merges the two closest clusters repeatedly, like clusterContoursPairwise, but computes
+    # every bounding rectangle once and only measures the distance between clusters that
+    # are closer than the threshold distance along both axes. The candidate distances are
+    # kept in a heap, and the clusters in a union-find forest whose roots are the lowest
+    # contour index of each cluster (the position the pairwise loop keeps them at).
+    # Gives the same contours as clusterContoursPairwise.
+    # @param contours: The contours to cluster
+    # NOTE: contours should be of the same object type
+    # @return: A list of contours
+    def clusterContoursSweep(self, contours):
+        threshold = self.DEFAULT_THRESHOLD_DISTANCE
+        rectangles = self.boundingRectangles(contours)
+        # Every contour starts as its own cluster
+        parents = list(range(len(contours)))
+        members = [[index] for index in range(len(contours))]
+        versions = [0] * len(contours)
+
+        # Measure all candidate pairs at once, and keep the ones that can be merged
+        firsts, seconds = self.findRectanglePairs(rectangles, threshold)
+        distances = self.calculateRectangleDistances(rectangles[firsts], rectangles[seconds])
+        pairCount = len(distances)
+        close = distances < threshold
+        heap = [(distance, first, second, 0, 0) for distance, first, second
+                in zip(distances[close].tolist(), firsts[close].tolist(), seconds[close].tolist())]
+        heapq.heapify(heap)
+
+        # Merge the two closest clusters until no distance is less than the threshold distance
+        while heap:
+            _, first, second, firstVersion, secondVersion = heapq.heappop(heap)
+            # Skip distances to clusters that have been merged since they were measured
+            if parents[first] != first or parents[second] != second:
+                continue
+            if versions[first] != firstVersion or versions[second] != secondVersion:
+                continue
+            parents[second] = first
+            members[first] += members[second]
+            versions[first] += 1
+            # Grow the bounding rectangle of the merged cluster
+            x1, y1, w1, h1 = rectangles[first]
+            x2, y2, w2, h2 = rectangles[second]
+            x, y = min(x1, x2), min(y1, y2)
+            rectangles[first] = (x, y, max(x1 + w1, x2 + w2) - x, max(y1 + h1, y2 + h2) - y)
+            # Measure the distance to every remaining cluster that is close enough along both axes
+            x, y, w, h = rectangles[first]
+            close = (np.minimum(rectangles[:, 0] + rectangles[:, 2], x + w) - np.maximum(rectangles[:, 0], x) > -threshold) & \
+                    (np.minimum(rectangles[:, 1] + rectangles[:, 3], y + h) - np.maximum(rectangles[:, 1], y) > -threshold)
+            # (there are few of them, so measuring them one by one is faster than a vectorized call)
+            for other in np.flatnonzero(close).tolist():
+                if other == first or parents[other] != other:
+                    continue
+                pair = (min(first, other), max(first, other))
+                distance = self.calculateRectangleDistance(rectangles[pair[0]].tolist(), rectangles[pair[1]].tolist())
+                pairCount += 1
+                if distance < threshold:
+                    heapq.heappush(heap, (distance, pair[0], pair[1], versions[pair[0]], versions[pair[1]]))
+
+        # Concatenate the contours of every cluster, in the order the pairwise loop merges them
+        clusters = []
+        for index in range(len(contours)):
+            if parents[index] != index:
+                continue
+            if len(members[index]) == 1:
+                clusters.append(contours[index])
+            else:
+                clusters.append(np.concatenate([contours[member] for member in members[index]], axis=0))
+        self.pairCount = pairCount
+        return clusters
+
     # Cluster contours, returns a list of contours
     # Clusters contours by merging the two closest contours repeatedly
     # until the distance between the two closest contours is greater than
@@ -131,11 +322,13 @@ class ContourMerger():
     # @param contours: The contours to cluster
     # NOTE: contours should be of the same object type
     # @return: A list of contours
-    def clusterContours(self, contours):
+    def clusterContoursPairwise(self, contours):
         current_contours = contours
+        self.pairCount = 0
         while len(current_contours) > 1:
             min_distance = None
             min_coordinate = None
+            self.pairCount += len(current_contours) * (len(current_contours) - 1) // 2
 
             # Find the two closest contours
             for x in range(len(current_contours)-1):
@@ -162,18 +355,73 @@ class ContourMerger():
 
         return current_contours
     
+    # Swallow inner contours with the configured SWALLOW_ENGINE, returns a list of tuples (contour, label)
+    # @param contourLabelTuples: The tuples (contour, label) to swallow
+    # @return: A list of tuples (contour, label)
+    def swallowContours(self, contourLabelTuples):
+        metrics = self.metrics
+        if metrics is None:
+            if self.SWALLOW_ENGINE == 'sweep':
+                return self.swallowContoursSweep(contourLabelTuples)
+            return self.swallowContoursPairwise(contourLabelTuples)
+        start = time.perf_counter()
+        if self.SWALLOW_ENGINE == 'sweep':
+            tuples = self.swallowContoursSweep(contourLabelTuples)
+        else:
+            tuples = self.swallowContoursPairwise(contourLabelTuples)
+        metrics.observe('merger_swallow_seconds', time.perf_counter() - start)
+        metrics.observe('merger_swallow_pairs', self.pairCount)
+        metrics.observe('merger_swallowed', len(contourLabelTuples) - len(tuples))
+        return tuples
+
+    # Determine which rectangles swallow which, returns an array of booleans
+    # Rectangle a swallows rectangle b if all corners of b are inside a, or if a is
+    # larger than b and b is at least SWALLOW_AREA_RATIO_THRESHOLD contained in a.
+    # @param rectanglesA: An (n, 4) array of (x, y, w, h) swallowing rectangles
+    # @param rectanglesB: An (n, 4) array of (x, y, w, h) swallowed rectangles
+    # @return: An array of n booleans, true where a swallows b
+    def swallowsRectangles(self, rectanglesA, rectanglesB):
+        ax, ay, aw, ah = rectanglesA.T
+        bx, by, bw, bh = rectanglesB.T
+        # All corners of b are inside a
+        inside = (ax < bx) & (ay < by) & (ax + aw > bx + bw) & (ay + ah > by + bh)
+        # a is larger than b, and b is at least SWALLOW_AREA_RATIO_THRESHOLD contained in a
+        x_distance = np.minimum(ax + aw, bx + bw) - np.maximum(ax, bx)
+        y_distance = np.minimum(ay + ah, by + bh) - np.maximum(ay, by)
+        covered = (aw * ah > bw * bh) & (x_distance > 0) & (y_distance > 0)
+        covered &= x_distance * y_distance / (bw * bh) > self.SWALLOW_AREA_RATIO_THRESHOLD
+        return inside | covered
+
+    # Swallow inner contours by sweeping over their bounding rectangles, returns a list of tuples (contour, label)
+    # Computes every bounding rectangle once and only compares the rectangles that
+    # overlap, which are the only ones that can swallow each other.
+    # Gives the same tuples as swallowContoursPairwise.
+    # @param contourLabelTuples: The tuples (contour, label) to swallow
+    # @return: A list of tuples (contour, label)
+    def swallowContoursSweep(self, contourLabelTuples):
+        rectangles = self.boundingRectangles([contour for contour, _ in contourLabelTuples])
+        first, second = self.findRectanglePairs(rectangles)
+        self.pairCount = len(first)
+        # Mark every rectangle that is swallowed by another, in either direction of the pair
+        swallowed = np.zeros(len(rectangles), dtype=bool)
+        swallowed[second[self.swallowsRectangles(rectangles[first], rectangles[second])]] = True
+        swallowed[first[self.swallowsRectangles(rectangles[second], rectangles[first])]] = True
+        return [contourLabelTuple for contourLabelTuple, isSwallowed in zip(contourLabelTuples, swallowed) if not isSwallowed]
+
     # Swallow inner contours, returns a list of contours
     # Determines if one contour is inside another contour,
     # and marks the inner contour for removal. This process
     # is repeated until no more inner contours are found.
     # @param contours: The contours to swallow
     # @return: A list of contours
-    def swallowContours(self, contourLabelTuples):
+    def swallowContoursPairwise(self, contourLabelTuples):
         # get contours and labels
         current_contours = [contour for contour, _ in contourLabelTuples]
         current_labels = [label for _, label in contourLabelTuples]
         # indeces to delete
         delete_indeces = []
+        # every ordered pair of contours is compared
+        self.pairCount = len(current_contours) * (len(current_contours) - 1)
 
         # find inner contours
         # for each contour, check to see if it has any inner contours
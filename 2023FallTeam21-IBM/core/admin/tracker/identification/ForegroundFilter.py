@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+
+# Foreground Filter Class
+# Finds the moving foreground of the frames with an OpenCV background subtractor (MOG2), so the
+# static colored fixtures of the scene (a blue bin edge, a yellow safety stripe) are not merged
+# and tracked every frame. A contour is kept when at least MIN_FOREGROUND_RATIO of its bounding
+# rectangle is foreground (the mask is not applied to the pixels, a fixture would be cut into
+# pieces around every object that moves over it).
+# The subtractor runs on the frame scaled down by SCALE and its mask is grown by MARGIN (the inside
+# of a plain colored object does not change while it moves, only its edges do), the mask stays at
+# that scale and the contours are compared to it scaled down. The bounding rectangles of the blobs of
+# the mask (findRegions) are the regions of the frame the identifier converts and thresholds.
+# An object that stops moving fades into the background at the speed of LEARNING_RATE.
+class ForegroundFilter():
+
+    # Standard resolution average (pixels) (for width of 1280 and height of 720)
+    STANDARD_RESOLUTION_AVERAGE = 1000.0
+
+    # Constructor for the ForegroundFilter class
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param resolution: The resolution (width, height) of the frames
+    # Fields:
+    #   frameCount: The number of frames filtered
+    #   emptyCount: The number of frames without foreground
+    def __init__(self, config, resolution):
+        # Get the options from the config file
+        self.LEARNING_RATE = config.getfloat('ForegroundFilter', 'LEARNING_RATE')
+        self.HISTORY = config.getint('ForegroundFilter', 'HISTORY')
+        self.VAR_THRESHOLD = config.getfloat('ForegroundFilter', 'VAR_THRESHOLD')
+        self.DETECT_SHADOWS = config.getboolean('ForegroundFilter', 'DETECT_SHADOWS')
+        self.SCALE = config.getfloat('ForegroundFilter', 'SCALE')
+        self.MARGIN = config.getfloat('ForegroundFilter', 'MARGIN')
+        self.MIN_FOREGROUND_RATIO = config.getfloat('ForegroundFilter', 'MIN_FOREGROUND_RATIO')
+        if self.LEARNING_RATE > 1.0:
+            raise ValueError(f"LEARNING_RATE must be at most 1 (negative for automatic): {self.LEARNING_RATE}")
+        if not 0.0 < self.SCALE <= 1.0:
+            raise ValueError(f"SCALE must be more than 0 and at most 1: {self.SCALE}")
+
+        # Convert the resolution into pixel thresholds
+        #       (MARGIN)
+        resolutionWidth = resolution[0]
+        resolutionHeight = resolution[1]
+        resolutionAverage = (resolutionWidth + resolutionHeight) / 2
+        self.MARGIN = self.MARGIN * resolutionAverage / self.STANDARD_RESOLUTION_AVERAGE
+
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(self.HISTORY, self.VAR_THRESHOLD, self.DETECT_SHADOWS)
+        # Grow the mask with a square of the margin, at the scale the subtractor runs at
+        radius = int(round(self.MARGIN * self.SCALE))
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * radius + 1, 2 * radius + 1)) if radius > 0 else None
+        # The buffers of the scaled down frame and masks, reused for every frame of the same size
+        self.bufferShape = None
+        self.buffers = {}
+        self.frameCount = 0
+        self.emptyCount = 0
+
+    # Get the buffers for a frame size, returns a dictionary of buffers (image, subtracted, grown, labels)
+    # @param height: The height of the frame
+    # @param width: The width of the frame
+    # @return: A dictionary of buffers
+    def getBuffers(self, height, width):
+        if self.bufferShape != (height, width):
+            self.bufferShape = (height, width)
+            smallWidth, smallHeight = max(1, int(round(width * self.SCALE))), max(1, int(round(height * self.SCALE)))
+            self.buffers = {
+                'image': np.empty((smallHeight, smallWidth, 3), dtype=np.uint8) if self.SCALE < 1.0 else None,
+                'subtracted': np.empty((smallHeight, smallWidth), dtype=np.uint8),
+                'grown': np.empty((smallHeight, smallWidth), dtype=np.uint8),
+                'labels': np.empty((smallHeight, smallWidth), dtype=np.int32),
+            }
+        return self.buffers
+
+    # Find the moving foreground of a frame and learn the frame into the background, returns the mask
+    # The mask is a buffer of the filter, it is overwritten by the next frame.
+    # @param image: The frame to find the foreground of
+    # @return: The mask scaled down by SCALE (255 for the foreground, 0 for the background), or None if nothing is moving
+    def apply(self, image):
+        self.frameCount += 1
+        imageHeight, imageWidth = image.shape[:2]
+        buffers = self.getBuffers(imageHeight, imageWidth)
+        smallImage = image
+        if self.SCALE < 1.0:
+            smallImage = cv2.resize(image, buffers['image'].shape[1::-1], dst=buffers['image'], interpolation=cv2.INTER_LINEAR)
+        subtracted = self.subtractor.apply(smallImage, buffers['subtracted'], self.LEARNING_RATE)
+        # Shadows (127) are background
+        foreground = cv2.threshold(subtracted, 127, 255, cv2.THRESH_BINARY, dst=subtracted)[1]
+        if cv2.countNonZero(foreground) == 0:
+            self.emptyCount += 1
+            return None
+        if self.kernel is not None:
+            foreground = cv2.dilate(foreground, self.kernel, dst=buffers['grown'])
+        return foreground
+
+    # Find the regions of the frame the foreground covers, returns a list of (x, y, w, h) regions
+    # @param foregroundMask: The foreground mask returned by apply
+    # @return: The bounding rectangles of the blobs of the mask, scaled up to the frame
+    def findRegions(self, foregroundMask):
+        _, _, stats, _ = cv2.connectedComponentsWithStats(foregroundMask, self.buffers['labels'], connectivity=8)
+        scale = 1.0 / self.SCALE
+        regions = []
+        # Skip the background component (0)
+        for x, y, w, h in stats[1:, :4].tolist():
+            left, top = int(x * scale), int(y * scale)
+            regions.append((left, top, int(np.ceil((x + w) * scale)) - left, int(np.ceil((y + h) * scale)) - top))
+        return regions
+
+    # Keep the contours that are in the foreground, returns a list of contours
+    # The contours inside a contour that is not kept (the holes of a fixture) are not kept either.
+    # @param contours: The contours to filter
+    # @param foregroundMask: The foreground mask returned by apply
+    # @param contourScale: The scale of the contours (of the frame given to apply)
+    # @return: The contours with at least MIN_FOREGROUND_RATIO of their bounding rectangle in the foreground
+    def filterContours(self, contours, foregroundMask, contourScale=1.0):
+        scale = self.SCALE / contourScale
+        keptContours = []
+        droppedContours = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            # The rectangle in the foreground mask, at least a pixel
+            left, top = int(x * scale), int(y * scale)
+            right, bottom = max(int((x + w) * scale + 0.5), left + 1), max(int((y + h) * scale + 0.5), top + 1)
+            rectangle = foregroundMask[top:bottom, left:right]
+            if cv2.countNonZero(rectangle) >= self.MIN_FOREGROUND_RATIO * rectangle.size:
+                keptContours.append(contour)
+            else:
+                droppedContours.append((contour, (x, y, w, h)))
+        if not droppedContours:
+            return keptContours
+        insideContour = lambda point, contour, rect: rect[0] <= point[0] < rect[0] + rect[2] and rect[1] <= point[1] < rect[1] + rect[3] \
+            and cv2.pointPolygonTest(contour, point, False) >= 0
+        return [contour for contour in keptContours
+                if not any(insideContour((float(contour[0][0][0]), float(contour[0][0][1])), dropped, rect) for dropped, rect in droppedContours)]
@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 
 # Abstract class for object identification
 class ObjectIdentifier():
@@ -13,16 +14,150 @@ class ObjectIdentifier():
     # @param image: The image to clean
     # @param erodeIter: The number of iterations for erosion
     # @param dilateIter: The number of iterations for dilation
+    # @param kernel: The structuring element, None for a 3x3 rectangle
+    # @param dst: The image to write the cleaned image to, None to allocate one
+    # @param work: The image to write the eroded image to, None to allocate one
     # @return: The cleaned image
-    def cleanNoise(self, image, erodeIter, dilateIter):
-        return cv2.dilate(cv2.erode(image, None, iterations=erodeIter), None, iterations=dilateIter)
+    def cleanNoise(self, image, erodeIter, dilateIter, kernel=None, dst=None, work=None):
+        eroded = cv2.erode(image, kernel, dst=work, iterations=erodeIter)
+        return cv2.dilate(eroded, kernel, dst=dst, iterations=dilateIter)
 
     # Define contours in the image, returns a list of contours
     # @param image: The image to define contours in
     # @return: A list of contours
     def defineContours(self, image):
         return cv2.findContours(image, self.FIND_CONTOURS_MODE, self.FIND_CONTOURS_METHOD)[-2]
-    
+
+    # Define contours in the image by connected components, returns a list of contours
+    # Labels the connected components with their statistics, drops every component
+    # whose bounding box is too small to hold a contour larger than the minimum area
+    # in bulk, and only extracts the contours (outer border and holes) of the
+    # components that remain. Gives the same contours, in the same order, as
+    # defineContours that are larger than the minimum area.
+    # @param image: The image to define contours in
+    # @param minimumArea: The area a contour must be larger than
+    # @param labels: The int32 image to write the component labels to, None to allocate one
+    # @return: A list of contours
+    def defineComponentContours(self, image, minimumArea, labels=None):
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(image, labels=labels, connectivity=8)
+        # A contour can not be larger than the box between its outermost pixel centers
+        boxAreas = (stats[:, cv2.CC_STAT_WIDTH] - 1) * (stats[:, cv2.CC_STAT_HEIGHT] - 1)
+        # Skip the background component (0)
+        candidates = np.flatnonzero(boxAreas[1:] > minimumArea) + 1
+        # Visit the components in reverse order of their first pixel in a row by row scan
+        # (the labels are not in that order, the labeling algorithm scans blocks of rows)
+        scanStarts = []
+        for component in candidates:
+            top = stats[component, cv2.CC_STAT_TOP]
+            left = stats[component, cv2.CC_STAT_LEFT]
+            first = np.argmax(labels[top, left:left + stats[component, cv2.CC_STAT_WIDTH]] == component)
+            scanStarts.append((top, left + first))
+        candidates = [candidates[i] for i in sorted(range(len(candidates)), key=scanStarts.__getitem__, reverse=True)]
+        # Extract the outer border and the holes of every remaining component inside its bounding box
+        outerContours = {}
+        holeContours = {}
+        for component in candidates:
+            x, y, w, h = (int(value) for value in stats[component, :4])
+            componentMask = cv2.compare(labels[y:y+h, x:x+w], int(component), cv2.CMP_EQ)
+            contours, hierarchy = cv2.findContours(componentMask, cv2.RETR_CCOMP, self.FIND_CONTOURS_METHOD, offset=(x, y))[-2:]
+            holeContours[component] = []
+            for contour, (_, _, _, parent) in zip(contours, hierarchy[0]):
+                if parent == -1:
+                    outerContours[component] = contour
+                else:
+                    holeContours[component].append(contour)
+        # Find the innermost hole every component lies in, to rebuild the order of the contour tree
+        holeChildren = {}
+        rootComponents = []
+        holes = [(hole, cv2.boundingRect(hole)) for component in candidates for hole in holeContours[component]]
+        for component in candidates:
+            x, y = (float(value) for value in outerContours[component][0][0])
+            parentHole = None
+            parentArea = None
+            for hole, (hx, hy, hw, hh) in holes:
+                if hx < x < hx + hw and hy < y < hy + hh and cv2.pointPolygonTest(hole, (x, y), False) > 0:
+                    area = hw * hh
+                    if parentHole is None or area < parentArea:
+                        parentHole = hole
+                        parentArea = area
+            if parentHole is None:
+                rootComponents.append(component)
+            else:
+                holeChildren.setdefault(id(parentHole), []).append(component)
+        # Walk the contour tree, every component is followed by its holes and what lies in them
+        contours = []
+        stack = rootComponents[::-1]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, np.ndarray):
+                contours.append(item)
+                continue
+            contours.append(outerContours[item])
+            for hole in holeContours[item][::-1]:
+                stack += holeChildren.get(id(hole), [])[::-1]
+                stack.append(hole)
+        return [contour for contour in contours if cv2.contourArea(contour) > minimumArea]
+
+    # Clip regions to the image and resolve the ones that overlap, returns a list of regions
+    # Two overlapping regions are replaced by their bounding rectangle when it is not larger than
+    # the two regions together (so an object is not split between them). Otherwise the later region
+    # is cut into the pieces that lie outside the earlier one, so no pixel is searched twice.
+    # @param regions: A list of (x, y, w, h) regions
+    # @param imageWidth: The width of the image
+    # @param imageHeight: The height of the image
+    # @return: A list of (x, y, w, h) regions that do not overlap
+    def mergeRegions(self, regions, imageWidth, imageHeight):
+        # Clip the regions to the image as (left, top, right, bottom), dropping empty ones
+        boxes = []
+        for x, y, w, h in regions:
+            left, top = max(int(x), 0), max(int(y), 0)
+            right, bottom = min(int(x + w), imageWidth), min(int(y + h), imageHeight)
+            if right > left and bottom > top:
+                boxes.append((left, top, right, bottom))
+        area = lambda box: (box[2] - box[0]) * (box[3] - box[1])
+        # Add the boxes in order, merging or cutting the ones that overlap a box already added
+        mergedBoxes = []
+        stack = boxes[::-1]
+        while stack:
+            box = stack.pop()
+            for i, other in enumerate(mergedBoxes):
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    union = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                    if area(union) <= area(box) + area(other):
+                        del mergedBoxes[i]
+                        stack.append(union)
+                    else:
+                        # The pieces above, below, left and right of the other box
+                        top, bottom = max(box[1], other[1]), min(box[3], other[3])
+                        pieces = [(box[0], box[1], box[2], other[1]), (box[0], other[3], box[2], box[3]),
+                                  (box[0], top, other[0], bottom), (other[2], top, box[2], bottom)]
+                        stack += [piece for piece in pieces[::-1] if piece[2] > piece[0] and piece[3] > piece[1]]
+                    break
+            else:
+                mergedBoxes.append(box)
+        return [(left, top, right - left, bottom - top) for left, top, right, bottom in mergedBoxes]
+
+    # Cut regions into the pieces that lie outside other regions, returns a list of regions
+    # @param regions: A list of (x, y, w, h) regions to cut
+    # @param otherRegions: A list of (x, y, w, h) regions to cut out of them
+    # @return: A list of (x, y, w, h) regions, the parts of the regions outside the other regions
+    def cutRegions(self, regions, otherRegions):
+        pieces = [(x, y, x + w, y + h) for x, y, w, h in regions]
+        for otherX, otherY, otherWidth, otherHeight in otherRegions:
+            other = (otherX, otherY, otherX + otherWidth, otherY + otherHeight)
+            nextPieces = []
+            for box in pieces:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    # The pieces above, below, left and right of the other region
+                    top, bottom = max(box[1], other[1]), min(box[3], other[3])
+                    cuts = [(box[0], box[1], box[2], other[1]), (box[0], other[3], box[2], box[3]),
+                            (box[0], top, other[0], bottom), (other[2], top, box[2], bottom)]
+                    nextPieces += [cut for cut in cuts if cut[2] > cut[0] and cut[3] > cut[1]]
+                else:
+                    nextPieces.append(box)
+            pieces = nextPieces
+        return [(left, top, right - left, bottom - top) for left, top, right, bottom in pieces]
+
     # Assign a label to a contour, returns a tuple (contour, label)
     # @param contour: The contour to assign a label to
     # @param label: The label to assign to the contour
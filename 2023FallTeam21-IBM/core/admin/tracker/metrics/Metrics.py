@@ -0,0 +1,174 @@
+import bisect
+import os
+import socket
+import tempfile
+
+# The buckets (upper bounds) of the durations (seconds) and of the counts
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+# The histograms that are recorded, by name, with their help text (the names ending in _seconds are durations)
+HISTOGRAMS = {
+    'identifier_hsv_seconds': "Time to convert a frame (or region) to HSV",
+    'identifier_masks_seconds': "Time to make the color masks of a frame (or region)",
+    'identifier_contours_seconds': "Time to find the contours of every color mask of a frame",
+    'identifier_merge_seconds': "Time to merge the contours of a frame into objects",
+    'identifier_contours': "Contours of a frame larger than MINIMUM_CONTOUR_AREA",
+    'identifier_foreground_contours': "Contours of a frame kept by the foreground filter",
+    'identifier_objects': "Objects of a frame after merging and swallowing",
+    'merger_cluster_seconds': "Time to cluster the contours of a color",
+    'merger_cluster_pairs': "Contour pairs measured to cluster the contours of a color",
+    'merger_cluster_contours': "Contours of a color before clustering",
+    'merger_clusters': "Contours of a color after clustering",
+    'merger_swallow_seconds': "Time to swallow the inner contours",
+    'merger_swallow_pairs': "Contour pairs compared to swallow the inner contours",
+    'merger_swallowed': "Contours swallowed",
+    'tracker_update_seconds': "Time to update a tracker with the objects of a frame",
+    'tracker_pairs': "Object and track pairs measured to update a tracker",
+    'tracker_tracks': "Tracked objects after an update",
+}
+
+# Histogram Class
+# Counts the values observed in buckets, with their sum, like a Prometheus histogram.
+class Histogram():
+
+    # Constructor for the Histogram class
+    # @param name: The name of the histogram
+    # @param help: The help text of the histogram
+    # @param buckets: The sorted upper bounds of the buckets (the last bucket, +Inf, is added)
+    # Fields:
+    #   counts: The number of values in every bucket (not cumulative), the last one for +Inf
+    #   sum: The sum of the values
+    #   count: The number of values
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    # Observe a value
+    # @param value: The value
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Add the values of another histogram with the same buckets
+    # @param counts: The number of values in every bucket of the other histogram
+    # @param sum: The sum of the values of the other histogram
+    # @param count: The number of values of the other histogram
+    def merge(self, counts, sum, count):
+        for index, bucketCount in enumerate(counts):
+            self.counts[index] += bucketCount
+        self.sum += sum
+        self.count += count
+
+    # Get the mean of the values, returns 0 if there are none
+    # @return: The mean of the values
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    # Format the histogram in the Prometheus text format, returns a string
+    # @param prefix: The prefix of the metric name
+    # @return: The lines of the histogram
+    def format(self, prefix):
+        name = f'{prefix}{self.name}'
+        lines = [f'# HELP {name} {self.help}', f'# TYPE {name} histogram']
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum {self.sum!r}')
+        lines.append(f'{name}_count {self.count}')
+        return '\n'.join(lines)
+
+# Metrics Class
+# Records the durations and counts of the stages of the ColoredObjectIdentifier, ContourMerger and
+# trackers in histograms, which can be read in the process or exported in the Prometheus text
+# format to EXPORT_PATH (a file, written whole) and EXPORT_ADDRESS (host:port, sent over TCP).
+# The stages get the Metrics of the process from getMetrics, which is None when ENABLED is off, so
+# the disabled instrumentation costs a check for None per stage. The metrics are per process: the
+# worker processes of the ParallelIdentifier and SegmentProcessor collect theirs and send them back
+# with their results, to be merged into the Metrics of the main process.
+class Metrics():
+
+    # Constructor for the Metrics class
+    # @param config: The configuration object that stores the settings the project is running on
+    def __init__(self, config):
+        # Get the options from the config file
+        self.ENABLED = config.getboolean('Metrics', 'ENABLED')
+        self.EXPORT_PATH = config.get('Metrics', 'EXPORT_PATH')
+        self.EXPORT_ADDRESS = config.get('Metrics', 'EXPORT_ADDRESS')
+        self.PREFIX = config.get('Metrics', 'PREFIX')
+
+        self.histograms = {}
+        self.reset()
+
+    # Clear every histogram
+    def reset(self):
+        self.histograms = {name: Histogram(name, help, DURATION_BUCKETS if name.endswith('_seconds') else COUNT_BUCKETS)
+                           for name, help in HISTOGRAMS.items()}
+
+    # Observe a value in a histogram
+    # @param name: The name of the histogram (one of HISTOGRAMS)
+    # @param value: The value
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    # Get a histogram, returns the histogram
+    # @param name: The name of the histogram (one of HISTOGRAMS)
+    # @return: The histogram
+    def getHistogram(self, name):
+        return self.histograms[name]
+
+    # Get the values observed since the last collect (or reset) and clear every histogram, returns a dictionary
+    # @return: A dictionary of (counts, sum, count) by histogram name, for the histograms with values
+    def collect(self):
+        values = {name: (histogram.counts, histogram.sum, histogram.count)
+                  for name, histogram in self.histograms.items() if histogram.count > 0}
+        self.reset()
+        return values
+
+    # Add the values collected from other Metrics (in another process)
+    # @param values: A dictionary of (counts, sum, count) by histogram name (from collect)
+    def merge(self, values):
+        for name, (counts, sum, count) in values.items():
+            self.histograms[name].merge(counts, sum, count)
+
+    # Format every histogram in the Prometheus text format, returns a string
+    # @return: The histograms, ending with a new line
+    def formatPrometheus(self):
+        return '\n'.join(histogram.format(self.PREFIX) for histogram in self.histograms.values()) + '\n'
+
+    # Write the histograms to EXPORT_PATH and send them to EXPORT_ADDRESS, the ones that are set
+    def export(self):
+        text = self.formatPrometheus()
+        if self.EXPORT_PATH:
+            # Write to a temporary file and rename it, so a reader never sees a half written file
+            directory = os.path.dirname(os.path.abspath(self.EXPORT_PATH))
+            fd, temporaryPath = tempfile.mkstemp(suffix='.prom', dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.replace(temporaryPath, self.EXPORT_PATH)
+        if self.EXPORT_ADDRESS:
+            host, port = self.EXPORT_ADDRESS.rsplit(':', 1)
+            with socket.create_connection((host, int(port)), timeout=5.0) as connection:
+                connection.sendall(text.encode())
+
+# The metrics of the process, by their export options (EXPORT_PATH, EXPORT_ADDRESS, PREFIX)
+processMetrics = dict[tuple, Metrics]([])
+
+# Get the metrics of the process for the export options of a config, returns None if the metrics are not ENABLED in the config
+# The configs with the same export options share their Metrics, a run that goes through several
+# configs resets them after exporting every config.
+# @param config: The configuration object that stores the settings the project is running on
+# @return: The Metrics of the process, None if they are not enabled
+def getMetrics(config):
+    if not config.getboolean('Metrics', 'ENABLED'):
+        return None
+    key = (config.get('Metrics', 'EXPORT_PATH'), config.get('Metrics', 'EXPORT_ADDRESS'), config.get('Metrics', 'PREFIX'))
+    if key not in processMetrics:
+        processMetrics[key] = Metrics(config)
+    return processMetrics[key]
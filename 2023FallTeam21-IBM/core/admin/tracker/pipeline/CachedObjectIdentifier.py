@@ -0,0 +1,170 @@
+import collections
+import hashlib
+import numpy as np
+import os
+import tempfile
+
+from pipeline.DetectionStore import configDigest
+
+# Bytes counted for every cached object besides its contour (the tuple, label and key)
+OBJECT_OVERHEAD = 64
+
+# Identification Cache Class
+# Keeps the objects identified in frames by key, evicting the least recently used frames when the
+# contours take more than MAX_MEMORY megabytes. With a SPILL_DIRECTORY, the evicted frames are
+# written there (as .npz files named after their key) and read back when they are used again, so
+# the frames are identified once across runs too. A cache can be shared by several identifiers.
+class IdentificationCache():
+
+    # Constructor for the IdentificationCache class
+    # @param config: The configuration object that stores the settings the project is running on
+    # Fields:
+    #   hitCount: The number of frames found in memory
+    #   spillHitCount: The number of frames found in the SPILL_DIRECTORY
+    #   missCount: The number of frames not found
+    #   evictionCount: The number of frames evicted from memory
+    #   memoryBytes: The bytes of the frames in memory
+    def __init__(self, config):
+        # Get the options from the config file
+        self.MAX_MEMORY = config.getfloat('CachedObjectIdentifier', 'MAX_MEMORY')
+        self.SPILL_DIRECTORY = config.get('CachedObjectIdentifier', 'SPILL_DIRECTORY')
+
+        self.maxBytes = int(self.MAX_MEMORY * (1 << 20))
+        if self.SPILL_DIRECTORY:
+            os.makedirs(self.SPILL_DIRECTORY, exist_ok=True)
+        # The objects and bytes of every frame in memory, least recently used first
+        self.entries = collections.OrderedDict()
+        self.hitCount = 0
+        self.spillHitCount = 0
+        self.missCount = 0
+        self.evictionCount = 0
+        self.memoryBytes = 0
+
+    # Get the objects of a frame, returns a list of tuples (contour, label), None if the frame is not cached
+    # @param key: The key of the frame
+    # @return: A list of tuples (contour, label) (the contours are read only), None if the frame is not cached
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hitCount += 1
+            return list(entry[0])
+        objects = self.readSpill(key)
+        if objects is None:
+            self.missCount += 1
+            return None
+        self.spillHitCount += 1
+        self.add(key, objects)
+        return list(objects)
+
+    # Cache the objects of a frame, returns the cached objects
+    # @param key: The key of the frame
+    # @param objects: A list of tuples (contour, label)
+    # @return: A list of tuples (contour, label) (the contours are read only)
+    def put(self, key, objects):
+        if key in self.entries:
+            return list(self.entries[key][0])
+        objects = [(self.freeze(contour), label) for contour, label in objects]
+        self.add(key, objects)
+        return list(objects)
+
+    # Add the objects of a frame to memory, evicting the least recently used frames over the memory bound
+    # @param key: The key of the frame
+    # @param objects: A list of tuples (contour, label), the contours read only
+    def add(self, key, objects):
+        size = sum(contour.nbytes + OBJECT_OVERHEAD for contour, _ in objects) + OBJECT_OVERHEAD
+        self.entries[key] = (objects, size)
+        self.memoryBytes += size
+        while self.memoryBytes > self.maxBytes and self.entries:
+            evictedKey, (evictedObjects, evictedSize) = self.entries.popitem(last=False)
+            self.memoryBytes -= evictedSize
+            self.evictionCount += 1
+            if self.SPILL_DIRECTORY:
+                self.writeSpill(evictedKey, evictedObjects)
+
+    # Make a read only copy of a contour, so the cached contour can not be changed by the callers
+    # @param contour: The contour
+    # @return: The read only contour
+    def freeze(self, contour):
+        contour = np.array(contour, dtype=np.int32)
+        contour.setflags(write=False)
+        return contour
+
+    # Get the path of the spill file of a frame
+    # @param key: The key of the frame
+    # @return: The path of the .npz file
+    def getSpillPath(self, key):
+        return os.path.join(self.SPILL_DIRECTORY, f'{key}.npz')
+
+    # Write the objects of a frame to the SPILL_DIRECTORY, unless they are there already
+    # @param key: The key of the frame
+    # @param objects: A list of tuples (contour, label)
+    def writeSpill(self, key, objects):
+        path = self.getSpillPath(key)
+        if os.path.exists(path):
+            return
+        offsets = np.zeros(len(objects) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(contour) for contour, _ in objects])
+        points = np.concatenate([contour.reshape(-1, 2) for contour, _ in objects]) if objects else np.zeros((0, 2), dtype=np.int32)
+        labels = np.array([label for _, label in objects], dtype=str)
+        # Write to a temporary file and rename it, so a spill file is never read half written
+        fd, temporaryPath = tempfile.mkstemp(suffix='.npz', dir=self.SPILL_DIRECTORY)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, offsets=offsets, points=points, labels=labels)
+        os.replace(temporaryPath, path)
+
+    # Read the objects of a frame from the SPILL_DIRECTORY, returns None if they are not there
+    # @param key: The key of the frame
+    # @return: A list of tuples (contour, label) (the contours are read only), None if the frame was not spilled
+    def readSpill(self, key):
+        if not self.SPILL_DIRECTORY:
+            return None
+        try:
+            with np.load(self.getSpillPath(key)) as spill:
+                offsets, points, labels = spill['offsets'], spill['points'], spill['labels']
+        except FileNotFoundError:
+            return None
+        return [(self.freeze(points[start:end].reshape(-1, 1, 2)), str(label))
+                for start, end, label in zip(offsets[:-1], offsets[1:], labels)]
+
+# Cached Object Identifier Class
+# Caches the objects an object identifier identifies in a frame, by a digest of the frame and of the
+# options the identifier depends on (its config sections), so identifying a frame that was already
+# identified (paging back to an image, replaying a video) costs a digest of the frame. The objects
+# are kept in an IdentificationCache. The frames must be identified independently of each other,
+# an identifier that learns from the frames (the foreground filter) can not be cached.
+# Has the same identifyObjects method as the object identifiers, so it can be used in their place.
+class CachedObjectIdentifier():
+
+    # Constructor for the CachedObjectIdentifier class
+    # @param config: The configuration object the identifier was made with
+    # @param objectIdentifier: The object identifier to identify the frames that are not cached with
+    # @param cache: The IdentificationCache to keep the objects in, None for a new one
+    def __init__(self, config, objectIdentifier, cache=None):
+        if getattr(objectIdentifier, 'foregroundFilter', None) is not None:
+            raise ValueError("An identifier with a foreground filter depends on the previous frames and can not be cached")
+        self.objectIdentifier = objectIdentifier
+        self.cache = cache if cache is not None else IdentificationCache(config)
+        # The identifiers of other classes or options do not share keys
+        self.configKey = f'{type(objectIdentifier).__name__}-{configDigest(config)}'.encode()
+
+    # Get the key of a frame, a digest of its pixels, shape and the options of the identifier
+    # @param image: The image
+    # @return: The key (hex string)
+    def getKey(self, image):
+        image = np.ascontiguousarray(image)
+        # SHA-1 is the fastest hashlib digest of large buffers, the key does not need to be secure
+        digest = hashlib.sha1(self.configKey)
+        digest.update(f'{image.shape}{image.dtype}'.encode())
+        digest.update(image.data)
+        return digest.hexdigest()
+
+    # Identify the objects in a frame, or get them from the cache, returns a list of tuples (contour, label)
+    # @param image: The image to identify objects in
+    # @return: A list of tuples (contour, label) (the contours are read only)
+    def identifyObjects(self, image):
+        key = self.getKey(image)
+        objects = self.cache.get(key)
+        if objects is None:
+            objects = self.cache.put(key, self.objectIdentifier.identifyObjects(image))
+        return objects
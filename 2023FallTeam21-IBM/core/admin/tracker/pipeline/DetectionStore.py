@@ -0,0 +1,263 @@
+import cv2
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+
+from identification.Labels import Colors
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier
+
+# The config sections the output of the identifier depends on
+IDENTIFIER_SECTIONS = ('ColoredObjectIdentifier', 'ContourMerger', 'ForegroundFilter')
+# The config sections the contours of the identifier depend on, before they are merged
+CONTOUR_SECTIONS = ('ColoredObjectIdentifier', 'ForegroundFilter')
+
+# Get a digest of the content of a video file
+# @param videoPath: The path to the video
+# @return: The digest of the file (hex string)
+def videoDigest(videoPath):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(videoPath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Get a digest of the options of the identifier in a config
+# @param config: The configuration object
+# @param sections: The sections to digest
+# @return: The digest of the sections of the config (hex string)
+def configDigest(config, sections=IDENTIFIER_SECTIONS):
+    sections = {section: sorted(config.items(section, raw=True)) for section in sections if config.has_section(section)}
+    return hashlib.blake2b(json.dumps(sections, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+# Detection Store Class
+# Stores the objects identified in every frame of a video on disk, so the trackers can be run
+# again on the same video (to tune them) without decoding the video and identifying its objects.
+# The detections of a video are stored in a directory named after the digest of the video file
+# and the digest of the identifier sections of the config, under DIRECTORY, as columns of .npy
+# files that are memory mapped when they are read:
+#   frameOffsets: (frames + 1) int64, the detections of frame i are the rows frameOffsets[i]:frameOffsets[i + 1]
+#   labels: (n) uint8 label ids (indexes of Colors.labels)
+#   rects: (n, 4) int32 bounding rectangles (x, y, w, h)
+#   areas: (n) float32 contour areas
+#   contourOffsets, points: (n + 1) int64 and (m, 2) int32, the contours simplified by
+#                           CONTOUR_EPSILON (pixels), with STORE_CONTOURS only
+# and a meta.json file with the resolution, frame rate and number of frames of the video.
+# The contours of every color can also be stored before they are merged (unmerged), so the
+# ContourMerger can be run again too: the ContourMerger and the trackers only use the bounding
+# rectangles of the contours. Those are keyed by the CONTOUR_SECTIONS of the config only.
+class DetectionStore():
+
+    # Constructor for the DetectionStore class
+    # @param config: The configuration object that stores the settings the project is running on
+    def __init__(self, config):
+        # Get the options from the config file
+        self.DIRECTORY = config.get('DetectionStore', 'DIRECTORY')
+        self.STORE_CONTOURS = config.getboolean('DetectionStore', 'STORE_CONTOURS')
+        self.CONTOUR_EPSILON = config.getfloat('DetectionStore', 'CONTOUR_EPSILON')
+
+        # The digests of the videos, by (path, size, modification time)
+        self.videoDigests = {}
+
+    # Get the directory the detections of a video are stored in, returns the path
+    # @param videoPath: The path to the video
+    # @param config: The configuration object the video is identified with
+    # @param unmerged: True for the contours before they are merged
+    # @return: The path of the directory (it may not exist)
+    def getPath(self, videoPath, config, unmerged=False):
+        status = os.stat(videoPath)
+        key = (os.path.abspath(videoPath), status.st_size, status.st_mtime_ns)
+        if key not in self.videoDigests:
+            self.videoDigests[key] = videoDigest(videoPath)
+        if unmerged:
+            return os.path.join(self.DIRECTORY, f'{self.videoDigests[key]}-{configDigest(config, CONTOUR_SECTIONS)}-unmerged')
+        return os.path.join(self.DIRECTORY, f'{self.videoDigests[key]}-{configDigest(config)}')
+
+    # Open the stored detections of a video, returns a DetectionRecording
+    # @param videoPath: The path to the video
+    # @param config: The configuration object the video is identified with
+    # @param unmerged: True for the contours before they are merged
+    # @return: The DetectionRecording, or None if the video is not stored (or stored without contours, with STORE_CONTOURS)
+    def load(self, videoPath, config, unmerged=False):
+        path = self.getPath(videoPath, config, unmerged)
+        if not os.path.isfile(os.path.join(path, 'meta.json')):
+            return None
+        recording = DetectionRecording(path)
+        if self.STORE_CONTOURS and not recording.hasContours():
+            return None
+        return recording
+
+    # Identify the objects of every frame of a video and store them, returns a DetectionRecording
+    # The files are written to a temporary directory that is renamed when it is complete.
+    # @param videoPath: The path to the video
+    # @param config: The configuration object to identify the video with
+    # @param objectIdentifier: The object identifier to identify the frames with, None to make one from the config
+    # @param unmerged: True to store the contours of every color before they are merged
+    # @return: The DetectionRecording of the stored detections
+    def record(self, videoPath, config, objectIdentifier=None, unmerged=False):
+        cap = cv2.VideoCapture(videoPath)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {videoPath}")
+        resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if objectIdentifier is None:
+            objectIdentifier = ColoredObjectIdentifier(config, resolution)
+        labelIndex = {label: index for index, label in enumerate(Colors.labels)}
+
+        frameOffsets = [0]
+        labels = []
+        rects = []
+        areas = []
+        contourOffsets = [0]
+        points = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if unmerged:
+                objects = [(contour, label) for contours, label in zip(objectIdentifier.findObjectContours(frame), Colors.labels)
+                           for contour in contours]
+            else:
+                objects = objectIdentifier.identifyObjects(frame)
+            for contour, label in objects:
+                labels.append(labelIndex[label])
+                rects.append(cv2.boundingRect(contour))
+                areas.append(cv2.contourArea(contour))
+                if self.STORE_CONTOURS:
+                    simplified = cv2.approxPolyDP(contour, self.CONTOUR_EPSILON, True).reshape(-1, 2)
+                    points.append(simplified)
+                    contourOffsets.append(contourOffsets[-1] + len(simplified))
+            frameOffsets.append(len(labels))
+        cap.release()
+
+        path = self.getPath(videoPath, config, unmerged)
+        columns = {
+            'frameOffsets': np.array(frameOffsets, dtype=np.int64),
+            'labels': np.array(labels, dtype=np.uint8),
+            'rects': np.array(rects, dtype=np.int32).reshape(-1, 4),
+            'areas': np.array(areas, dtype=np.float32),
+        }
+        if self.STORE_CONTOURS:
+            columns['contourOffsets'] = np.array(contourOffsets, dtype=np.int64)
+            columns['points'] = np.concatenate(points).astype(np.int32) if points else np.zeros((0, 2), dtype=np.int32)
+        meta = {'resolution': resolution, 'fps': fps, 'frameCount': len(frameOffsets) - 1,
+                'labels': Colors.labels, 'contours': self.STORE_CONTOURS, 'contourEpsilon': self.CONTOUR_EPSILON,
+                'unmerged': unmerged}
+        writeRecording(path, columns, meta)
+        return DetectionRecording(path)
+
+    # Open the stored detections of a video, identifying and storing them first if they are not stored
+    # @param videoPath: The path to the video
+    # @param config: The configuration object to identify the video with
+    # @param unmerged: True for the contours of every color before they are merged
+    # @return: The DetectionRecording
+    def loadOrRecord(self, videoPath, config, unmerged=False):
+        recording = self.load(videoPath, config, unmerged)
+        if recording is None:
+            recording = self.record(videoPath, config, unmerged=unmerged)
+        return recording
+
+# Write the columns and meta data of a recording to a directory, replacing it
+# @param path: The path of the directory
+# @param columns: A dictionary of arrays, written to <name>.npy files
+# @param meta: A dictionary, written to meta.json
+def writeRecording(path, columns, meta):
+    temporaryPath = f'{path}.tmp-{os.getpid()}'
+    os.makedirs(temporaryPath, exist_ok=True)
+    for name, column in columns.items():
+        np.save(os.path.join(temporaryPath, f'{name}.npy'), column)
+    with open(os.path.join(temporaryPath, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(temporaryPath, path)
+
+# Detection Recording Class
+# The detections of a video stored by a DetectionStore, memory mapped.
+class DetectionRecording():
+
+    # Constructor for the DetectionRecording class
+    # @param path: The directory of the recording
+    # Fields:
+    #   resolution: The resolution (width, height) of the video
+    #   fps: The frame rate of the video
+    #   frameCount: The number of frames of the video
+    #   labelNames: The label names, indexed by the label ids
+    #   unmerged: True if the contours of every color are stored before they are merged
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.resolution = tuple(meta['resolution'])
+        self.fps = meta['fps']
+        self.frameCount = meta['frameCount']
+        self.labelNames = meta['labels']
+        self.unmerged = meta.get('unmerged', False)
+        load = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        self.frameOffsets = load('frameOffsets')
+        self.labels = load('labels')
+        self.rects = load('rects')
+        self.areas = load('areas')
+        self.contourOffsets = load('contourOffsets') if meta['contours'] else None
+        self.points = load('points') if meta['contours'] else None
+
+    # Check if the simplified contours are stored
+    # @return: True if the contours are stored
+    def hasContours(self):
+        return self.contourOffsets is not None
+
+    # Get the detections of a frame, returns the label ids, bounding rectangles and areas
+    # @param frame: The frame number
+    # @return: The (k) label ids, (k, 4) bounding rectangles and (k) areas of the frame
+    def getDetections(self, frame):
+        start, end = self.frameOffsets[frame], self.frameOffsets[frame + 1]
+        return self.labels[start:end], self.rects[start:end], self.areas[start:end]
+
+    # Get the simplified contours of a frame, returns a list of contours
+    # @param frame: The frame number
+    # @return: A list of (p, 1, 2) int32 contours, in the order of the detections
+    def getContours(self, frame):
+        if not self.hasContours():
+            raise ValueError(f"The contours are not stored in {self.path}")
+        start, end = self.frameOffsets[frame], self.frameOffsets[frame + 1]
+        offsets = self.contourOffsets[start:end + 1]
+        return [np.array(self.points[offsets[i]:offsets[i + 1]]).reshape(-1, 1, 2) for i in range(end - start)]
+
+    # Get the detections of every frame as the trackers take them, returns a list (per frame) of lists of tuples (contour, label)
+    # The contours are the bounding rectangles (the trackers only use the bounding rectangles of the contours).
+    # @return: A list of lists of tuples (contour, label)
+    def getFrameObjects(self):
+        rects = np.asarray(self.rects)
+        x, y, w, h = rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+        corners = np.stack([np.stack([x, y], 1), np.stack([x + w - 1, y], 1),
+                            np.stack([x + w - 1, y + h - 1], 1), np.stack([x, y + h - 1], 1)], 1)
+        contours = list(corners.reshape(-1, 4, 1, 2).astype(np.int32))
+        labels = [self.labelNames[label] for label in self.labels.tolist()]
+        objects = list(zip(contours, labels))
+        offsets = self.frameOffsets.tolist()
+        return [objects[offsets[frame]:offsets[frame + 1]] for frame in range(self.frameCount)]
+
+    # Get the contours of every color of every frame as ColoredObjectIdentifier.identifyObjectsInContours takes them,
+    # returns a list (per frame) of lists (per color) of lists of contours
+    # The contours are the bounding rectangles (the ContourMerger only uses the bounding rectangles of the contours).
+    # @return: A list of lists of lists of contours, the colors in the same order as Colors.labels
+    def getFrameColorContours(self):
+        frameColorContours = []
+        for objects in self.getFrameObjects():
+            colorContours = {label: [] for label in Colors.labels}
+            for contour, label in objects:
+                colorContours[label].append(contour)
+            frameColorContours.append(list(colorContours.values()))
+        return frameColorContours
+
+    # Run a tracker on the stored detections of every frame, returns the tracker
+    # @param tracker: The tracker (any Tracker) to update
+    # @param callback: A function called with (frame number, tracker) after every update, None for none
+    # @return: The tracker
+    def replay(self, tracker, callback=None):
+        for frame, objects in enumerate(self.getFrameObjects()):
+            tracker.update(objects)
+            if callback is not None:
+                callback(frame, tracker)
+        return tracker
@@ -0,0 +1,189 @@
+import collections
+import json
+import numpy as np
+import os
+import time
+
+from config.config_gen import readConfigDict, configToDict
+from identification.Labels import Colors
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier
+from tracking.CorrectiveTracker import CorrectiveTracker
+from tracking.TrackedObject import TrackedObject
+from pipeline.DetectionStore import writeRecording
+from metrics.Metrics import getMetrics
+
+# Get the state of a tracker, the tracked objects as an array and the next ID
+# @param tracker: The CorrectiveTracker
+# @return: An (n, 6) int64 array of (id, label id, x, y, w, h) tracked objects, and the next ID
+def getTrackerState(tracker):
+    trackedObjects = tracker.getTrackedObjects()
+    state = np.array([(id, Colors.labels.index(trackedObjects[id].getLabel())) + tuple(trackedObjects[id].getBoundingRectangle())
+                      for id in trackedObjects], dtype=np.int64).reshape(-1, 6)
+    return state, tracker.idCount
+
+# Restore the state of a tracker (from getTrackerState)
+# The trails of the tracked objects are not restored, they are not used to update the tracker.
+# @param tracker: The CorrectiveTracker
+# @param state: An (n, 6) array of (id, label id, x, y, w, h) tracked objects
+# @param idCount: The next ID
+def setTrackerState(tracker, state, idCount):
+    tracker.trackedObjects = {int(id): TrackedObject(int(id), (int(x), int(y), int(w), int(h)), Colors.labels[label])
+                              for id, label, x, y, w, h in state.tolist()}
+    tracker.idCount = int(idCount)
+    # The tracked objects were replaced, so the spatial index is rebuilt on the next update
+    tracker.syncObjectIndex()
+
+# Flight Recorder Class
+# Identifies and tracks frames (with a ColoredObjectIdentifier and a CorrectiveTracker) and keeps a
+# ring of the records of the last RING_SIZE frames: the time of every stage, the number of contours,
+# objects and tracked objects, and the contour and tracked object pairs the tracker measured. With
+# the [Metrics] ENABLED, the records also hold the time of every stage the Metrics record. When a
+# frame takes longer than LATENCY_BUDGET (milliseconds), the ring is written to DIRECTORY with the
+# raw frame, its objects, the state of the tracker before and after the frame and the config (at
+# most MAX_DUMPS times), so replayFlightRecord can run the frame again through the same code path.
+# The frames must be identified independently of each other, an identifier with the foreground
+# filter can not be replayed from one frame.
+class FlightRecorder():
+
+    # Constructor for the FlightRecorder class
+    # @param config: The configuration object the identifier and tracker were made with
+    # @param objectIdentifier: The ColoredObjectIdentifier to identify the frames with
+    # @param tracker: The CorrectiveTracker to track the objects with
+    # Fields:
+    #   ring: The records of the last RING_SIZE frames, oldest first
+    #   frameCount: The number of frames processed
+    #   dumpPaths: The directories of the dumps written
+    def __init__(self, config, objectIdentifier, tracker):
+        # Get the options from the config file
+        self.LATENCY_BUDGET = config.getfloat('FlightRecorder', 'LATENCY_BUDGET')
+        self.RING_SIZE = config.getint('FlightRecorder', 'RING_SIZE')
+        self.DIRECTORY = config.get('FlightRecorder', 'DIRECTORY')
+        self.MAX_DUMPS = config.getint('FlightRecorder', 'MAX_DUMPS')
+        if objectIdentifier.foregroundFilter is not None:
+            raise ValueError("An identifier with a foreground filter depends on the previous frames and can not be replayed")
+
+        self.config = config
+        self.objectIdentifier = objectIdentifier
+        self.tracker = tracker
+        self.metrics = getMetrics(config)
+        self.ring = collections.deque(maxlen=self.RING_SIZE)
+        self.frameCount = 0
+        self.dumpPaths = []
+
+    # Identify the objects of a frame and update the tracker, dumping the ring if the frame is over the latency budget
+    # @param frame: The frame
+    # @param elapsedFrames: The number of frames since the last update (more than 1 if frames were dropped)
+    # @return: A list of tuples (contour, label)
+    def process(self, frame, elapsedFrames=1):
+        trackerState = getTrackerState(self.tracker)
+        metricSums = self.getMetricSums()
+        objects, record = runFrame(self.objectIdentifier, self.tracker, frame, elapsedFrames)
+        record['frame'] = self.frameCount
+        if metricSums is not None:
+            record['metricSeconds'] = {name: value - metricSums[name] for name, value in self.getMetricSums().items()}
+        self.ring.append(record)
+        if record['seconds'] * 1000 > self.LATENCY_BUDGET and len(self.dumpPaths) < self.MAX_DUMPS:
+            self.dump(frame, elapsedFrames, objects, trackerState)
+        self.frameCount += 1
+        return objects
+
+    # Get the sums of the duration histograms of the metrics, returns None if the metrics are not enabled
+    # @return: A dictionary of the sums (seconds) by histogram name, None if the metrics are not enabled
+    def getMetricSums(self):
+        if self.metrics is None:
+            return None
+        return {name: histogram.sum for name, histogram in self.metrics.histograms.items() if name.endswith('_seconds')}
+
+    # Write the ring, the frame, its objects and the state of the tracker to a new directory under DIRECTORY
+    # @param frame: The frame
+    # @param elapsedFrames: The number of frames since the last update
+    # @param objects: The objects identified in the frame, a list of tuples (contour, label)
+    # @param trackerState: The state of the tracker before the frame (from getTrackerState)
+    def dump(self, frame, elapsedFrames, objects, trackerState):
+        path = os.path.join(self.DIRECTORY, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-frame{self.frameCount:06d}')
+        stateBefore, idCountBefore = trackerState
+        stateAfter, idCountAfter = getTrackerState(self.tracker)
+        contourOffsets = np.zeros(len(objects) + 1, dtype=np.int64)
+        contourOffsets[1:] = np.cumsum([len(contour) for contour, _ in objects])
+        columns = {
+            'frame': frame,
+            'labels': np.array([Colors.labels.index(label) for _, label in objects], dtype=np.uint8),
+            'contourOffsets': contourOffsets,
+            'points': np.concatenate([contour.reshape(-1, 2) for contour, _ in objects]).astype(np.int32) if objects else np.zeros((0, 2), dtype=np.int32),
+            'trackerBefore': stateBefore,
+            'trackerAfter': stateAfter,
+        }
+        meta = {
+            'frame': self.frameCount,
+            'elapsedFrames': elapsedFrames,
+            'latencyBudget': self.LATENCY_BUDGET,
+            'idCountBefore': idCountBefore,
+            'idCountAfter': idCountAfter,
+            'labels': Colors.labels,
+            'config': configToDict(self.config),
+            'ring': list(self.ring),
+        }
+        os.makedirs(self.DIRECTORY, exist_ok=True)
+        writeRecording(path, columns, meta)
+        self.dumpPaths.append(path)
+
+# Identify the objects of a frame and update a tracker, timing every stage, returns the objects and the record of the frame
+# @param objectIdentifier: The ColoredObjectIdentifier
+# @param tracker: The CorrectiveTracker
+# @param frame: The frame
+# @param elapsedFrames: The number of frames since the last update
+# @return: A list of tuples (contour, label), and a dictionary with the time (seconds) of the frame and of
+#          every stage ('stages'), and the number of 'contours', 'objects', tracked objects ('tracks') and 'pairs'
+def runFrame(objectIdentifier, tracker, frame, elapsedFrames):
+    start = time.perf_counter()
+    colorContours = objectIdentifier.findObjectContours(frame)
+    contoursFound = time.perf_counter()
+    contourCount = sum(len(contours) for contours in colorContours)
+    objects = objectIdentifier.identifyObjectsInContours(colorContours)
+    merged = time.perf_counter()
+    tracker.update(objects, elapsedFrames)
+    end = time.perf_counter()
+    record = {
+        'seconds': end - start,
+        'stages': {'contours': contoursFound - start, 'merge': merged - contoursFound, 'track': end - merged},
+        'contours': contourCount,
+        'objects': len(objects),
+        'tracks': len(tracker.getTrackedObjects()),
+        'pairs': tracker.pairCount,
+    }
+    return objects, record
+
+# Read a dump of a FlightRecorder, returns its columns and meta data
+# @param path: The directory of the dump
+# @return: A dictionary of arrays (frame, labels, contourOffsets, points, trackerBefore, trackerAfter), and the meta data
+def loadFlightRecord(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    columns = {name: np.load(os.path.join(path, f'{name}.npy'))
+               for name in ['frame', 'labels', 'contourOffsets', 'points', 'trackerBefore', 'trackerAfter']}
+    return columns, meta
+
+# Get the objects of a dump, returns a list of tuples (contour, label)
+# @param columns: The columns of the dump (from loadFlightRecord)
+# @param meta: The meta data of the dump
+# @return: A list of tuples (contour, label)
+def getFlightRecordObjects(columns, meta):
+    offsets, points = columns['contourOffsets'], columns['points']
+    return [(points[start:end].reshape(-1, 1, 2), meta['labels'][label])
+            for start, end, label in zip(offsets[:-1].tolist(), offsets[1:].tolist(), columns['labels'].tolist())]
+
+# Run the frame of a dump again, with the config of the dump and the tracker restored to its state
+# before the frame, returns the objects, the state of the tracker and the record of the frame
+# @param path: The directory of the dump
+# @return: A list of tuples (contour, label), the state of the tracker after the frame (an (n, 6) array
+#          and the next ID, see getTrackerState), and the record of the frame (see runFrame)
+def replayFlightRecord(path):
+    columns, meta = loadFlightRecord(path)
+    config = readConfigDict(meta['config'])
+    frame = columns['frame']
+    resolution = (frame.shape[1], frame.shape[0])
+    objectIdentifier = ColoredObjectIdentifier(config, resolution)
+    tracker = CorrectiveTracker(config, resolution)
+    setTrackerState(tracker, columns['trackerBefore'], meta['idCountBefore'])
+    objects, record = runFrame(objectIdentifier, tracker, frame, meta['elapsedFrames'])
+    return objects, getTrackerState(tracker), record
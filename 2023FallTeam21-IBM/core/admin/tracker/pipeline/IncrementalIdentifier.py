@@ -0,0 +1,154 @@
+import cv2
+import numpy as np
+
+# Incremental Identifier Class
+# Keeps the color masks of the last frame, and only makes the masks again for the tiles of the
+# frame that changed. A tile changed when one of its pixels differs by more than DIFF_THRESHOLD
+# (in any channel) from the frame its masks were made from. The masks of a changed tile and of the
+# tiles around it (cleaning the noise of a mask reaches into the next tile) are made again from
+# the tiles with a border of ERODE_ITERATIONS + DILATE_ITERATIONS pixels, so they are the same as
+# the masks of the full frame. The objects are only identified again when a tile changed, so a
+# frame where nothing changed costs a frame difference. Every FULL_RECOMPUTE_INTERVAL frames, the
+# full frame is identified again, so the changes below DIFF_THRESHOLD do not add up (and when
+# more than half of the tiles have to be made again, the full frame is faster).
+# Has the same identifyObjects method as the object identifiers, so it can be used in their place.
+# The masks of the tiles are made without the foreground filter, so an identifier with the filter
+# can only be used with a FULL_RECOMPUTE_INTERVAL of 1 (every frame identified in full).
+class IncrementalIdentifier():
+
+    # Constructor for the IncrementalIdentifier class
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param objectIdentifier: The ColoredObjectIdentifier to make the masks and identify the objects with
+    # Fields:
+    #   frameCount: The number of frames identified
+    #   fullRecomputeCount: The number of frames identified in full
+    #   unchangedCount: The number of frames where no tile changed
+    #   recomputedTileCount: The number of tiles whose masks were made again (without full recomputes)
+    def __init__(self, config, objectIdentifier):
+        # Get the options from the config file
+        self.FULL_RECOMPUTE_INTERVAL = config.getint('IncrementalIdentifier', 'FULL_RECOMPUTE_INTERVAL')
+        self.TILE_SIZE = config.getint('IncrementalIdentifier', 'TILE_SIZE')
+        self.DIFF_THRESHOLD = config.getint('IncrementalIdentifier', 'DIFF_THRESHOLD')
+        if self.FULL_RECOMPUTE_INTERVAL < 1:
+            raise ValueError(f"FULL_RECOMPUTE_INTERVAL must be at least 1: {self.FULL_RECOMPUTE_INTERVAL}")
+
+        if self.FULL_RECOMPUTE_INTERVAL > 1 and objectIdentifier.foregroundFilter is not None:
+            raise ValueError("An identifier with a foreground filter depends on the previous frames and can not be identified in tiles")
+
+        self.objectIdentifier = objectIdentifier
+        # The pixels a change can reach in the masks
+        self.border = objectIdentifier.ERODE_ITERATIONS + objectIdentifier.DILATE_ITERATIONS
+        if self.TILE_SIZE < max(self.border, 1):
+            raise ValueError(f"TILE_SIZE must be at least {max(self.border, 1)}: {self.TILE_SIZE}")
+
+        # The frame the masks were made from and the difference to it, padded to whole tiles
+        self.frameShape = None
+        self.previousFrame = None
+        self.difference = None
+        self.masks = []
+        self.objects = []
+        self.frameCount = 0
+        self.fullRecomputeCount = 0
+        self.unchangedCount = 0
+        self.recomputedTileCount = 0
+
+    # Identify the objects in a frame, only making the masks of the changed tiles again, returns a list of tuples (contour, label)
+    # @param image: The image to identify objects in
+    # @return: A list of tuples (contour, label)
+    def identifyObjects(self, image):
+        self.frameCount += 1
+        if self.FULL_RECOMPUTE_INTERVAL == 1:
+            return self.objectIdentifier.identifyObjects(image)
+
+        if self.frameShape != image.shape or (self.frameCount - 1) % self.FULL_RECOMPUTE_INTERVAL == 0:
+            return self.recomputeFrame(image)
+
+        changedTiles = self.findChangedTiles(image)
+        if not changedTiles.any():
+            self.unchangedCount += 1
+            return list(self.objects)
+
+        # Make the masks of the changed tiles and the tiles around them again, one block of tiles at a time
+        tiles = cv2.dilate(changedTiles.astype(np.uint8), None)
+        if 2 * cv2.countNonZero(tiles) > tiles.size:
+            return self.recomputeFrame(image)
+        imageHeight, imageWidth = image.shape[:2]
+        size = self.TILE_SIZE
+        border = self.border
+        for tileRow, tileColumn, rowCount, columnCount in self.findTileBlocks(tiles):
+            top, left = tileRow * size, tileColumn * size
+            bottom, right = min(top + rowCount * size, imageHeight), min(left + columnCount * size, imageWidth)
+            # Make the masks with a border around the tiles, and keep the part inside the tiles
+            outerTop, outerLeft = max(top - border, 0), max(left - border, 0)
+            outerBottom, outerRight = min(bottom + border, imageHeight), min(right + border, imageWidth)
+            masks = self.objectIdentifier.makeImageMasks(image[outerTop:outerBottom, outerLeft:outerRight])
+            for mask, regionMask in zip(self.masks, masks):
+                mask[top:bottom, left:right] = regionMask[top - outerTop:bottom - outerTop, left - outerLeft:right - outerLeft]
+            self.previousFrame[top:bottom, left:right] = image[top:bottom, left:right]
+            self.recomputedTileCount += rowCount * columnCount
+        self.objects = self.objectIdentifier.identifyObjectsInMasks(self.masks)
+        return list(self.objects)
+
+    # Make the masks of the full frame and identify its objects, returns a list of tuples (contour, label)
+    # @param image: The image to identify objects in
+    # @return: A list of tuples (contour, label)
+    def recomputeFrame(self, image):
+        imageHeight, imageWidth = image.shape[:2]
+        size = self.TILE_SIZE
+        paddedShape = (-(-imageHeight // size) * size, -(-imageWidth // size) * size) + image.shape[2:]
+        if self.frameShape != image.shape:
+            self.frameShape = image.shape
+            self.previousFrame = np.zeros(paddedShape, dtype=np.uint8)
+            self.difference = np.zeros(paddedShape, dtype=np.uint8)
+        self.previousFrame[:imageHeight, :imageWidth] = image
+        # The masks are buffers of the object identifier, keep copies
+        self.masks = [mask.copy() for mask in self.objectIdentifier.makeImageMasks(image)]
+        self.objects = self.objectIdentifier.identifyObjectsInMasks(self.masks)
+        self.fullRecomputeCount += 1
+        return list(self.objects)
+
+    # Find the tiles that changed since their masks were made, returns a boolean array (tile rows, tile columns)
+    # @param image: The image to compare
+    # @return: A boolean array, True for the tiles that changed
+    def findChangedTiles(self, image):
+        imageHeight, imageWidth = image.shape[:2]
+        size = self.TILE_SIZE
+        # The padding outside the image stays 0
+        cv2.absdiff(image, self.previousFrame[:imageHeight, :imageWidth], dst=self.difference[:imageHeight, :imageWidth])
+        tileRows = self.difference.shape[0] // size
+        tileColumns = self.difference.shape[1] // size
+        rowMaxima = self.difference.reshape(tileRows, size, -1).max(axis=1)
+        return rowMaxima.reshape(tileRows, tileColumns, -1).max(axis=2) > self.DIFF_THRESHOLD
+
+    # Find blocks of tiles that cover the tiles, returns a list of (row, column, rows, columns) blocks
+    # Finds the runs of consecutive tiles in every row, and joins the same runs of consecutive rows.
+    # @param tiles: An array (tile rows, tile columns), nonzero for the tiles to find
+    # @return: A list of (first row, first column, number of rows, number of columns) blocks
+    def findTileBlocks(self, tiles):
+        blocks = []
+        # The blocks that reach the previous row, by (first column, number of columns)
+        openBlocks = dict[tuple, int]([])
+        for row in range(tiles.shape[0]):
+            columns = np.flatnonzero(tiles[row])
+            # Split the columns where they are not consecutive
+            splits = np.flatnonzero(np.diff(columns) > 1) + 1
+            runs = [(int(run[0]), len(run)) for run in np.split(columns, splits) if len(run) > 0]
+            nextOpenBlocks = dict[tuple, int]([])
+            for run in runs:
+                if run in openBlocks:
+                    index = openBlocks[run]
+                    blocks[index][2] += 1
+                else:
+                    index = len(blocks)
+                    blocks.append([row, run[0], 1, run[1]])
+                nextOpenBlocks[run] = index
+            openBlocks = nextOpenBlocks
+        return [tuple(block) for block in blocks]
+
+    # Identify objects inside regions of the image only, returns a list of tuples (contour, label)
+    # (identified by the object identifier, the masks kept here still match the frame they were made from)
+    # @param image: The image to identify objects in
+    # @param regions: A list of (x, y, w, h) regions to identify objects in
+    # @return: A list of tuples (contour, label)
+    def identifyObjectsInRegions(self, image, regions):
+        return self.objectIdentifier.identifyObjectsInRegions(image, regions)
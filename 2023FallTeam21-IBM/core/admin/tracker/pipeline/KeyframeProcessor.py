@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+
+# Keyframe Processor Class
+# Only identifies the objects on keyframes, and moves the tracked objects with sparse optical flow
+# on the frames in between. A keyframe is every DETECTION_STRIDE-th frame (counting the frames
+# dropped before processing), or the frame after the flow of a tracked object drifted (too few of
+# its feature points could be followed).
+# A tracker that predicts (PredictiveTracker) moves the tracked objects with its predictions instead
+# of the flow, and every DETECTION_STRIDE-th frame is a keyframe.
+class KeyframeProcessor():
+
+    # Constructor for the KeyframeProcessor class
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param objectIdentifier: The object identifier to identify the objects on keyframes with
+    # @param tracker: The tracker to update with the identified objects and move with the flow
+    # Fields:
+    #   previousGray: The grayscale image of the previous frame
+    #   features: The (n, 1, 2) feature points followed for every tracked object, by ID
+    #   framesSinceKeyframe: The number of frames since the last keyframe, including the dropped frames
+    #   drifted: Whether the flow drifted, so that the next frame is a keyframe
+    #   predicts: Whether the tracker predicts the tracked objects between keyframes, instead of the flow
+    #   keyframeCount: The number of keyframes processed
+    #   frameCount: The number of frames processed
+    def __init__(self, config, objectIdentifier, tracker):
+        # Get the options from the config file
+        self.DETECTION_STRIDE = config.getint('KeyframeProcessor', 'DETECTION_STRIDE')
+        self.MAX_FEATURES = config.getint('KeyframeProcessor', 'MAX_FEATURES')
+        self.MIN_FEATURE_RATIO = config.getfloat('KeyframeProcessor', 'MIN_FEATURE_RATIO')
+        if self.DETECTION_STRIDE < 1:
+            raise ValueError(f"DETECTION_STRIDE must be at least 1: {self.DETECTION_STRIDE}")
+
+        self.objectIdentifier = objectIdentifier
+        self.tracker = tracker
+        # Feature detection and pyramidal Lucas-Kanade options
+        self.featureParams = dict(qualityLevel=0.01, minDistance=3, blockSize=5)
+        self.flowParams = dict(winSize=(15, 15), maxLevel=2,
+                               criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+        self.previousGray = None
+        self.features = dict[int, np.ndarray]([])
+        self.framesSinceKeyframe = 0
+        self.drifted = False
+        self.predicts = hasattr(tracker, 'predict')
+        self.keyframeCount = 0
+        self.frameCount = 0
+
+    # Process a frame, identifying the objects on keyframes and following the flow otherwise
+    # @param frame: The frame to process
+    # @param elapsedFrames: The number of frames since the last processed frame (more than 1 if frames were dropped)
+    # @return: True if the frame was a keyframe
+    def process(self, frame, elapsedFrames=1):
+        self.frameCount += 1
+        # Every frame is a keyframe without a stride, no need to follow the flow
+        if self.DETECTION_STRIDE == 1:
+            self.tracker.update(self.objectIdentifier.identifyObjects(frame), elapsedFrames)
+            self.keyframeCount += 1
+            return True
+
+        # The flow only follows small motions, so a gap of the stride or more is always a keyframe
+        isKeyframe = (self.keyframeCount == 0 or self.drifted
+                      or self.framesSinceKeyframe + elapsedFrames >= self.DETECTION_STRIDE)
+        if self.predicts:
+            if isKeyframe:
+                self.tracker.update(self.objectIdentifier.identifyObjects(frame), elapsedFrames)
+                self.framesSinceKeyframe = 0
+                self.keyframeCount += 1
+            else:
+                self.tracker.predict(elapsedFrames)
+                self.framesSinceKeyframe += elapsedFrames
+            return isKeyframe
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if isKeyframe:
+            self.tracker.update(self.objectIdentifier.identifyObjects(frame), elapsedFrames)
+            self.findFeatures(gray)
+            self.framesSinceKeyframe = 0
+            self.keyframeCount += 1
+        else:
+            self.followFeatures(gray)
+            self.framesSinceKeyframe += elapsedFrames
+        self.previousGray = gray
+        return isKeyframe
+
+    # Find the feature points inside the bounding rectangle of every tracked object
+    # @param gray: The grayscale image of the frame
+    def findFeatures(self, gray):
+        self.features.clear()
+        self.drifted = False
+        imageHeight, imageWidth = gray.shape
+        trackedObjects = self.tracker.getTrackedObjects()
+        for id in trackedObjects:
+            x, y, w, h = trackedObjects[id].getBoundingRectangle()
+            # Clip the bounding rectangle to the image
+            left, top = max(x, 0), max(y, 0)
+            right, bottom = min(x + w, imageWidth), min(y + h, imageHeight)
+            if right - left < 2 or bottom - top < 2:
+                continue
+            points = cv2.goodFeaturesToTrack(gray[top:bottom, left:right], self.MAX_FEATURES, **self.featureParams)
+            if points is not None:
+                self.features[id] = points + np.array([left, top], dtype=np.float32)
+
+    # Move every tracked object by the median flow of its feature points
+    # The feature points of all the tracked objects are followed in one call. A tracked object
+    # without features keeps its position, and one that keeps less than MIN_FEATURE_RATIO of
+    # its features marks the flow as drifted.
+    # @param gray: The grayscale image of the frame
+    def followFeatures(self, gray):
+        trackedObjects = self.tracker.getTrackedObjects()
+        ids = [id for id in self.features if id in trackedObjects]
+        if len(ids) == 0:
+            return
+        counts = [len(self.features[id]) for id in ids]
+        points = np.concatenate([self.features[id] for id in ids])
+        nextPoints, status, _ = cv2.calcOpticalFlowPyrLK(self.previousGray, gray, points, None, **self.flowParams)
+        status = status.ravel() == 1
+
+        start = 0
+        for id, count in zip(ids, counts):
+            end = start + count
+            found = status[start:end]
+            if found.sum() < max(1, self.MIN_FEATURE_RATIO * count):
+                self.drifted = True
+            if found.any():
+                dx, dy = np.median(nextPoints[start:end][found] - points[start:end][found], axis=0).ravel()
+                x, y, w, h = trackedObjects[id].getBoundingRectangle()
+                trackedObjects[id].updatePosition((int(round(x + dx)), int(round(y + dy)), w, h))
+                self.features[id] = nextPoints[start:end][found]
+            else:
+                del self.features[id]
+            start = end
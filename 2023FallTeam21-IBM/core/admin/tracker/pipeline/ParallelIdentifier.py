@@ -0,0 +1,180 @@
+import concurrent.futures
+import os
+
+from config.config_gen import readConfigDict, configToDict
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier
+from pipeline.SharedFrameRing import SharedFrameRing
+from metrics.Metrics import getMetrics
+
+# The object identifier of a worker process
+workerIdentifier = None
+# The metrics of a worker process, None if they are not enabled
+workerMetrics = None
+# The frame ring a worker process is attached to
+workerRing = None
+
+# Initialize the object identifier of a worker process
+# @param configDict: The config, as a dictionary of sections
+# @param resolution: The resolution (width, height) of the frames
+def initializeWorker(configDict, resolution):
+    global workerIdentifier, workerMetrics
+    config = readConfigDict(configDict)
+    workerIdentifier = ColoredObjectIdentifier(config, resolution)
+    workerMetrics = getMetrics(config)
+    # A forked worker starts with a copy of the metrics of the main process, which are not its own
+    if workerMetrics is not None:
+        workerMetrics.reset()
+
+# Identify the objects in a frame in a worker process, returns a list of tuples (contour, label) and the metrics of the frame
+# @param frame: The frame to identify objects in
+# @return: A list of tuples (contour, label), and the metrics recorded (see Metrics.collect), None if they are not enabled
+def identifyFrame(frame):
+    objects = workerIdentifier.identifyObjects(frame)
+    return objects, workerMetrics.collect() if workerMetrics is not None else None
+
+# Identify the objects in a frame of a shared frame ring in a worker process, returns a list of tuples (contour, label)
+# The worker attaches to the ring the first time it sees it, and reads the frame in place.
+# @param description: The description of the ring (from SharedFrameRing.getDescription)
+# @param slot: The slot of the frame
+# @param sequence: The sequence number of the frame
+# @return: A list of tuples (contour, label), and the metrics recorded (see Metrics.collect), None if they are not enabled
+def identifySharedFrame(description, slot, sequence):
+    global workerRing
+    slotCount, frameShape, dtype, name = description
+    if workerRing is None or workerRing.memory.name != name:
+        if workerRing is not None:
+            workerRing.close()
+        workerRing = SharedFrameRing(slotCount, frameShape, dtype, name)
+    objects = workerIdentifier.identifyObjects(workerRing.read(slot, sequence))
+    return objects, workerMetrics.collect() if workerMetrics is not None else None
+
+# Parallel Identifier Class
+# Identifies the objects in consecutive frames in a pool of worker processes. Frames are sent to
+# the workers as soon as one is free (up to PENDING_FRAMES_PER_WORKER frames per worker), and the
+# results pass through a reorder buffer so they come out in frame order, the same as identifying
+# the frames one after another.
+# With SHARED_FRAMES, the frames are copied into a SharedFrameRing and only the slot of every frame
+# is sent to the workers, instead of pickling the frames. A slot is released as soon as its result
+# comes back, so the ring has one slot per pending frame.
+# The metrics the workers record come back with the results, and are merged into the metrics of this process.
+# Every worker identifies its own frames, so the frames must be identified independently of each
+# other: an identifier with the foreground filter would learn a background from every Nth frame.
+class ParallelIdentifier():
+
+    # Constructor for the ParallelIdentifier class
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param resolution: The resolution (width, height) of the frames
+    # @param workers: The number of worker processes, WORKERS from the config if not given
+    #                 (0 uses one worker per CPU)
+    # Fields:
+    #   workers: The number of worker processes
+    #   maxPending: The largest number of frames sent to the workers and not given back yet
+    #   maxReordered: The largest number of results that waited in the reorder buffer
+    #   ring: The shared frame ring, created at the first frame (with SHARED_FRAMES)
+    def __init__(self, config, resolution, workers=None):
+        # Get the options from the config file
+        self.WORKERS = config.getint('ParallelIdentifier', 'WORKERS')
+        self.PENDING_FRAMES_PER_WORKER = config.getint('ParallelIdentifier', 'PENDING_FRAMES_PER_WORKER')
+        self.SHARED_FRAMES = config.getboolean('ParallelIdentifier', 'SHARED_FRAMES')
+        if config.getboolean('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER'):
+            raise ValueError("An identifier with a foreground filter depends on the previous frames and can not be split across workers")
+        if workers is None:
+            workers = self.WORKERS
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.maxPending = max(1, self.workers * self.PENDING_FRAMES_PER_WORKER)
+        self.maxReordered = 0
+        self.configDict = configToDict(config)
+        self.resolution = resolution
+        self.metrics = getMetrics(config)
+        self.executor = None
+        self.ring = None
+
+    # Start the worker processes
+    def start(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, initializer=initializeWorker, initargs=(self.configDict, self.resolution))
+
+    # Stop the worker processes, and free the shared frame ring
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.closeRing()
+
+    # Free the shared frame ring
+    def closeRing(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    # Submit a frame to the workers, returns the future of its result
+    # With SHARED_FRAMES, the frame is written into a slot of the ring, and the slot is sent to the
+    # workers (frames of another shape than the first frame are sent pickled).
+    # @param frame: The frame to identify objects in
+    # @return: The future of the list of tuples (contour, label) and metrics of the frame, and the slot of the frame (None if not in the ring)
+    def submit(self, frame):
+        if self.SHARED_FRAMES:
+            if self.ring is None:
+                self.ring = SharedFrameRing(self.maxPending, frame.shape, frame.dtype)
+            if frame.shape == self.ring.frameShape and frame.dtype == self.ring.dtype:
+                slot = self.ring.acquire()
+                if slot is not None:
+                    sequence = self.ring.write(slot, frame)
+                    return self.executor.submit(identifySharedFrame, self.ring.getDescription(), slot, sequence), slot
+        return self.executor.submit(identifyFrame, frame), None
+
+    # Identify the objects in consecutive frames, yields (frame, list of tuples (contour, label)) in frame order
+    # @param frames: An iterable of frames
+    # @return: A generator of (frame, list of tuples (contour, label)) pairs
+    def identifyFrames(self, frames):
+        self.start()
+        frames = iter(frames)
+        # Frames sent to the workers, and results that came back before the frames before them
+        pending = dict[concurrent.futures.Future, tuple]([])
+        reorderBuffer = dict[int, tuple]([])
+        framesBySequence = dict[int, object]([])
+        nextSequence = 0
+        submitted = 0
+        finished = False
+        try:
+            while True:
+                # Keep the workers busy
+                while not finished and len(pending) + len(reorderBuffer) < self.maxPending:
+                    frame = next(frames, None)
+                    if frame is None:
+                        finished = True
+                        break
+                    future, slot = self.submit(frame)
+                    pending[future] = (submitted, slot)
+                    framesBySequence[submitted] = frame
+                    submitted += 1
+                if not pending and not reorderBuffer:
+                    return
+                # Wait for a result, and give back every result that is next in order
+                if nextSequence not in reorderBuffer:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        sequence, slot = pending.pop(future)
+                        # The worker is done with the frame, its slot can be reused
+                        if slot is not None:
+                            self.ring.release(slot)
+                        objects, metrics = future.result()
+                        if metrics is not None:
+                            self.metrics.merge(metrics)
+                        reorderBuffer[sequence] = objects
+                    self.maxReordered = max(self.maxReordered, len(reorderBuffer))
+                while nextSequence in reorderBuffer:
+                    yield framesBySequence.pop(nextSequence), reorderBuffer.pop(nextSequence)
+                    nextSequence += 1
+        finally:
+            # Wait for the frames still in the ring before freeing it
+            concurrent.futures.wait(pending)
+            self.closeRing()
@@ -0,0 +1,148 @@
+import concurrent.futures
+import itertools
+import os
+
+from config.config_gen import readConfigDict, configToDict
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier
+from tracking.CorrectiveTracker import CorrectiveTracker
+from pipeline.DetectionStore import DetectionStore, DetectionRecording, CONTOUR_SECTIONS
+
+# The contours of the recordings a worker process has read, by path
+workerRecordings = {}
+
+# Get the contours of every color of every frame of a recording, read once per process
+# @param path: The directory of the recording (stored unmerged)
+# @return: The resolution of the recording, and a list (per frame) of lists (per color) of lists of contours
+def readRecording(path):
+    if path not in workerRecordings:
+        recording = DetectionRecording(path)
+        workerRecordings[path] = (recording.resolution, recording.getFrameColorContours())
+    return workerRecordings[path]
+
+# Merge and track the contours of every frame, returns the tracked objects of every frame
+# @param config: The configuration object to merge and track with
+# @param resolution: The resolution (width, height) of the frames
+# @param frameColorContours: A list (per frame) of lists (per color) of lists of contours
+# @return: A list (per frame) of sorted lists of (id, label) of the tracked objects
+def trackFrames(config, resolution, frameColorContours):
+    objectIdentifier = ColoredObjectIdentifier(config, resolution)
+    tracker = CorrectiveTracker(config, resolution)
+    frameTracks = []
+    for colorContours in frameColorContours:
+        # The contour merger changes the lists it is given
+        objects = objectIdentifier.identifyObjectsInContours([list(contours) for contours in colorContours])
+        tracker.update(objects)
+        trackedObjects = tracker.getTrackedObjects()
+        frameTracks.append(sorted((id, trackedObjects[id].getLabel()) for id in trackedObjects))
+    return frameTracks
+
+# Score the tracked objects of a scenario with its criteria, returns if it passed and its score
+# The criteria are the ones the tests check:
+#   track: The tracked objects are the (id, label) pairs of 'objects' in every frame
+#   merge: The number of tracked objects never goes up, is one of 'counts' in every frame (if given),
+#          and the frames with two tracked objects are more than 'mergedRatio'[0] and less than
+#          'mergedRatio'[1] of the frames (the two objects are merged in the rest)
+#   separate: There are at least 'minimum' tracked objects in every frame
+# @param scenario: The scenario, a dictionary with the 'criteria' and their values
+# @param frameTracks: A list (per frame) of sorted lists of (id, label)
+# @return: True if every criterion is met, and a score between 0 and 1 (1 if it passed)
+def scoreScenario(scenario, frameTracks):
+    frameCount = max(len(frameTracks), 1)
+    criteria = scenario['criteria']
+    if criteria == 'track':
+        expected = sorted((id, label) for id, label in scenario['objects'])
+        score = sum(tracks == expected for tracks in frameTracks) / frameCount
+    elif criteria == 'merge':
+        counts = [len(tracks) for tracks in frameTracks]
+        countScore = sum(count in scenario['counts'] for count in counts) / frameCount if scenario.get('counts') else 1.0
+        decreasingScore = sum(count <= previous for previous, count in zip(counts, counts[1:])) / max(len(counts) - 1, 1)
+        low, high = scenario['mergedRatio']
+        ratio = counts.count(2) / frameCount
+        ratioScore = 1.0 if low < ratio < high else max(0.0, 1.0 - 4 * min(abs(ratio - low), abs(ratio - high)))
+        score = (countScore + decreasingScore + ratioScore) / 3
+    elif criteria == 'separate':
+        score = sum(len(tracks) >= scenario['minimum'] for tracks in frameTracks) / frameCount
+    else:
+        raise ValueError(f"Unknown criteria: {criteria}")
+    return score == 1.0, score
+
+# Evaluate a configuration on every scenario in a worker process, returns the results of the scenarios
+# @param configDict: The config, as a dictionary of sections
+# @param overrides: A dictionary of the options to set, by (section, option)
+# @param scenarios: The scenarios to evaluate
+# @param paths: The directories of the recordings of the scenarios
+# @return: A list (per scenario) of (passed, score)
+def evaluateConfiguration(configDict, overrides, scenarios, paths):
+    config = readConfigDict(configDict)
+    for (section, option), value in overrides.items():
+        config.set(section, option, str(value))
+    results = []
+    for scenario, path in zip(scenarios, paths):
+        resolution, frameColorContours = readRecording(path)
+        results.append(scoreScenario(scenario, trackFrames(config, resolution, frameColorContours)))
+    return results
+
+# Parameter Sweep Class
+# Evaluates every combination of a grid of ContourMerger and tracker options on scenarios (videos
+# with the criteria the tests check), and ranks the combinations. The contours of every color of
+# the videos are identified once and stored unmerged in the DetectionStore, so only the merging and
+# tracking run for every combination (both only use the bounding rectangles of the contours, so the
+# results are the same as identifying the videos). The combinations are evaluated in a pool of
+# WORKERS worker processes.
+class ParameterSweep():
+
+    # Constructor for the ParameterSweep class
+    # @param config: The configuration object the options are swept from (and the videos identified with)
+    # @param workers: The number of worker processes, WORKERS from the config if not given
+    #                 (0 uses one worker per CPU, 1 evaluates in this process)
+    def __init__(self, config, workers=None):
+        # Get the options from the config file
+        self.WORKERS = config.getint('ParameterSweep', 'WORKERS')
+        if workers is None:
+            workers = self.WORKERS
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.config = config
+        self.detectionStore = DetectionStore(config)
+
+    # Make every combination of a grid of options, returns a list of dictionaries of options
+    # @param grid: A list of (section, option, values) options
+    # @return: A list of dictionaries of the options to set, by (section, option)
+    def makeCombinations(self, grid):
+        for section, option, _ in grid:
+            if section in CONTOUR_SECTIONS:
+                raise ValueError(f"The contours are identified once, {section} options can not be swept: {option}")
+        keys = [(section, option) for section, option, _ in grid]
+        return [dict(zip(keys, values)) for values in itertools.product(*[values for _, _, values in grid])]
+
+    # Evaluate every combination of a grid of options on the scenarios, returns the ranked results
+    # The results are ranked by the number of scenarios passed, then by the mean score.
+    # @param scenarios: A list of scenarios, dictionaries with the 'name', 'video' and 'criteria'
+    #                   (and the values of the criteria, see scoreScenario)
+    # @param grid: A list of (section, option, values) options
+    # @return: A list of dictionaries with the 'options' (by (section, option)), the number of scenarios
+    #          'passed', the mean 'score' and the (passed, score) of every scenario by name ('scenarios')
+    def run(self, scenarios, grid):
+        combinations = self.makeCombinations(grid)
+        # Identify the contours of the videos that are not stored
+        paths = [self.detectionStore.loadOrRecord(scenario['video'], self.config, unmerged=True).path for scenario in scenarios]
+        configDict = configToDict(self.config)
+
+        if self.workers == 1:
+            evaluations = [evaluateConfiguration(configDict, options, scenarios, paths) for options in combinations]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+                chunkSize = max(1, len(combinations) // (4 * self.workers))
+                evaluations = list(executor.map(evaluateConfiguration, itertools.repeat(configDict), combinations,
+                                                itertools.repeat(scenarios), itertools.repeat(paths), chunksize=chunkSize))
+
+        results = []
+        for options, evaluation in zip(combinations, evaluations):
+            results.append({
+                'options': options,
+                'passed': sum(passed for passed, _ in evaluation),
+                'score': sum(score for _, score in evaluation) / max(len(evaluation), 1),
+                'scenarios': {scenario['name']: result for scenario, result in zip(scenarios, evaluation)},
+            })
+        # Stable sort, the combinations that rank the same stay in grid order
+        results.sort(key=lambda result: (-result['passed'], -result['score']))
+        return results
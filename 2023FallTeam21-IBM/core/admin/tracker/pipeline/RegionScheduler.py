@@ -0,0 +1,83 @@
+# Region Scheduler Class
+# Chooses where to identify objects in a frame: around the tracked objects (their bounding
+# rectangles grown by MOTION_MARGIN) and in strips along the ENTRY_EDGES of the frame where new
+# objects come in, with a scan of the full frame every FULL_SCAN_INTERVAL frames.
+# Has the same identifyObjects method as the object identifiers, so it can be used in their place.
+class RegionScheduler():
+
+    # Standard resolution average (pixels) (for width of 1280 and height of 720)
+    STANDARD_RESOLUTION_AVERAGE = 1000.0
+    # The edges of the frame objects can enter from
+    EDGES = ('left', 'right', 'top', 'bottom')
+
+    # Constructor for the RegionScheduler class
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param resolution: The resolution (width, height) of the frames
+    # @param objectIdentifier: The object identifier to identify objects with (must have identifyObjectsInRegions)
+    # @param tracker: The tracker whose tracked objects are searched around
+    # Fields:
+    #   frameCount: The number of frames identified
+    #   fullScanCount: The number of frames identified in full
+    def __init__(self, config, resolution, objectIdentifier, tracker):
+        # Get the options from the config file
+        self.FULL_SCAN_INTERVAL = config.getint('RegionScheduler', 'FULL_SCAN_INTERVAL')
+        self.MOTION_MARGIN = config.getfloat('RegionScheduler', 'MOTION_MARGIN')
+        self.EDGE_STRIP_WIDTH = config.getfloat('RegionScheduler', 'EDGE_STRIP_WIDTH')
+        self.ENTRY_EDGES = [edge.strip() for edge in config.get('RegionScheduler', 'ENTRY_EDGES').split(',') if edge.strip()]
+        if self.FULL_SCAN_INTERVAL < 1:
+            raise ValueError(f"FULL_SCAN_INTERVAL must be at least 1: {self.FULL_SCAN_INTERVAL}")
+        for edge in self.ENTRY_EDGES:
+            if edge not in self.EDGES:
+                raise ValueError(f"Unknown entry edge: {edge}")
+
+        # Convert the resolution into pixel thresholds
+        #       (MOTION_MARGIN, EDGE_STRIP_WIDTH)
+        resolutionWidth = resolution[0]
+        resolutionHeight = resolution[1]
+        resolutionAverage = (resolutionWidth + resolutionHeight) / 2
+        self.MOTION_MARGIN = self.MOTION_MARGIN * resolutionAverage / self.STANDARD_RESOLUTION_AVERAGE
+        self.EDGE_STRIP_WIDTH = self.EDGE_STRIP_WIDTH * resolutionAverage / self.STANDARD_RESOLUTION_AVERAGE
+
+        self.objectIdentifier = objectIdentifier
+        self.tracker = tracker
+        self.frameCount = 0
+        self.fullScanCount = 0
+
+    # Get the regions to identify objects in, returns a list of (x, y, w, h) regions
+    # @param imageWidth: The width of the frame
+    # @param imageHeight: The height of the frame
+    # @return: A list of (x, y, w, h) regions
+    def getRegions(self, imageWidth, imageHeight):
+        margin = self.MOTION_MARGIN
+        regions = []
+        # Search around every tracked object
+        trackedObjects = self.tracker.getTrackedObjects()
+        for id in trackedObjects:
+            x, y, w, h = trackedObjects[id].getBoundingRectangle()
+            regions.append((int(x - margin), int(y - margin), int(w + 2 * margin + 1), int(h + 2 * margin + 1)))
+        # Search the strips objects enter the frame through
+        strip = int(self.EDGE_STRIP_WIDTH + 0.5)
+        for edge in self.ENTRY_EDGES:
+            if edge == 'left':
+                regions.append((0, 0, strip, imageHeight))
+            elif edge == 'right':
+                regions.append((imageWidth - strip, 0, strip, imageHeight))
+            elif edge == 'top':
+                regions.append((0, 0, imageWidth, strip))
+            else:
+                regions.append((0, imageHeight - strip, imageWidth, strip))
+        return regions
+
+    # Identify the objects in a frame, returns a list of tuples (contour, label)
+    # Identifies the full frame every FULL_SCAN_INTERVAL frames (starting with the first),
+    # and only the regions around the tracked objects and the entry strips otherwise.
+    # @param image: The frame to identify objects in
+    # @return: A list of tuples (contour, label)
+    def identifyObjects(self, image):
+        fullScan = self.frameCount % self.FULL_SCAN_INTERVAL == 0
+        self.frameCount += 1
+        if fullScan:
+            self.fullScanCount += 1
+            return self.objectIdentifier.identifyObjects(image)
+        imageHeight, imageWidth = image.shape[:2]
+        return self.objectIdentifier.identifyObjectsInRegions(image, self.getRegions(imageWidth, imageHeight))
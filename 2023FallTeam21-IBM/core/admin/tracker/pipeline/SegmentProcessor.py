@@ -0,0 +1,250 @@
+import concurrent.futures
+import cv2
+import hashlib
+import os
+
+from config.config_gen import readConfigDict, configToDict
+from identification.Labels import Colors
+from identification.ColoredObjectIdentifier import ColoredObjectIdentifier
+from tracking.CorrectiveTracker import CorrectiveTracker
+from metrics.Metrics import getMetrics
+
+# Get a digest of a frame, to find the same frame in two segments
+# @param frame: The frame
+# @return: The digest of the frame (bytes)
+def frameDigest(frame):
+    return hashlib.blake2b(frame, digest_size=16).digest()
+
+# Split the frames of a video into overlapping segments
+# @param frameCount: The number of frames of the video
+# @param segmentFrames: The number of frames of a segment
+# @param overlapFrames: The number of frames a segment shares with the segment before it
+# @return: A list of (start, count) pairs, the count of the last segment is None (read to the end of the video)
+def splitSegments(frameCount, segmentFrames, overlapFrames):
+    step = segmentFrames - overlapFrames
+    segments = []
+    start = 0
+    while start + segmentFrames < frameCount:
+        segments.append((start, segmentFrames))
+        start += step
+    segments.append((start, None))
+    return segments
+
+# Get the intersection over union of two rectangles
+# @param rect1: The first rectangle (x, y, w, h)
+# @param rect2: The second rectangle (x, y, w, h)
+# @return: The intersection over union, between 0 and 1
+def rectangleOverlap(rect1, rect2):
+    x1, y1, w1, h1 = rect1
+    x2, y2, w2, h2 = rect2
+    w = min(x1 + w1, x2 + w2) - max(x1, x2)
+    h = min(y1 + h1, y2 + h2) - max(y1, y2)
+    if w <= 0 or h <= 0:
+        return 0.0
+    intersection = w * h
+    return intersection / (w1 * h1 + w2 * h2 - intersection)
+
+# Identify and track the objects of a segment of a video in a worker process
+# The worker seeks to the start of the segment, and keeps the digests of the first and last
+# overlapFrames frames it read, so the segment can be aligned with its neighbors (seeking is not
+# always exact).
+# @param configDict: The config, as a dictionary of sections
+# @param videoPath: The path to the video
+# @param start: The first frame of the segment
+# @param count: The number of frames of the segment, None to read to the end of the video
+# @param overlapFrames: The number of frames to keep the digests of, at both ends
+# @param collectMetrics: True to collect the metrics of the process into the result (in a worker process)
+# @return: A dictionary with the detections (local frame, label, x, y, w, h, area), the tracks
+#          (local frame, local id, label, x, y, w, h), the number of frames read, the head and tail digests,
+#          and the metrics recorded (see Metrics.collect, None if they are not collected or enabled)
+def processSegment(configDict, videoPath, start, count, overlapFrames, collectMetrics=False):
+    config = readConfigDict(configDict)
+    cap = cv2.VideoCapture(videoPath)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {videoPath}")
+    resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    objectIdentifier = ColoredObjectIdentifier(config, resolution)
+    tracker = CorrectiveTracker(config, resolution)
+    labelIndex = {label: index for index, label in enumerate(Colors.labels)}
+    # A forked worker starts with a copy of the metrics of the main process, which are not its own
+    metrics = getMetrics(config) if collectMetrics else None
+    if metrics is not None:
+        metrics.reset()
+
+    detections = []
+    tracks = []
+    digests = []
+    frameCount = 0
+    while count is None or frameCount < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        # Only the digests of both ends are needed
+        digests.append(frameDigest(frame))
+        if len(digests) > 2 * overlapFrames:
+            del digests[overlapFrames]
+
+        contourLabelTuples = objectIdentifier.identifyObjects(frame)
+        tracker.update(contourLabelTuples)
+        for contour, label in contourLabelTuples:
+            x, y, w, h = cv2.boundingRect(contour)
+            detections.append((frameCount, labelIndex[label], x, y, w, h, int(round(cv2.contourArea(contour)))))
+        trackedObjects = tracker.getTrackedObjects()
+        for id in trackedObjects:
+            x, y, w, h = trackedObjects[id].getBoundingRectangle()
+            tracks.append((frameCount, id, labelIndex[trackedObjects[id].getLabel()], x, y, w, h))
+        frameCount += 1
+    cap.release()
+
+    return {'detections': detections, 'tracks': tracks, 'frameCount': frameCount,
+            'headDigests': digests[:overlapFrames], 'tailDigests': digests[-overlapFrames:] if overlapFrames > 0 else [],
+            'metrics': metrics.collect() if metrics is not None else None}
+
+# Segment Processor Class
+# Identifies and tracks the objects of a long video offline, in overlapping time segments that are
+# processed in parallel worker processes, each with its own identifier and tracker. The segments are
+# then stitched in order: a segment is aligned with the one before it by the frames they share, its
+# track IDs are matched to the IDs of the segment before it by label and rectangle overlap in the
+# shared frames, and it only gives the frames after the end of the segment before it (its first
+# OVERLAP_FRAMES frames let its tracker settle). The result has one consistent set of track IDs,
+# numbered in order of their first frame like a single tracker would.
+# The identifier of a segment starts without the frames before it, so the foreground filter (which
+# learns the background from the previous frames) can not be used. The metrics the workers record
+# come back with the segments, and are merged into the metrics of this process.
+class SegmentProcessor():
+
+    # Constructor for the SegmentProcessor class
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param workers: The number of worker processes, WORKERS from the config if not given
+    #                 (0 uses one worker per CPU)
+    # Fields:
+    #   workers: The number of worker processes
+    #   unalignedSegments: The number of segments that could not be aligned by their frames (assumed at their seek position)
+    def __init__(self, config, workers=None):
+        # Get the options from the config file
+        self.WORKERS = config.getint('SegmentProcessor', 'WORKERS')
+        self.SEGMENT_FRAMES = config.getint('SegmentProcessor', 'SEGMENT_FRAMES')
+        self.OVERLAP_FRAMES = config.getint('SegmentProcessor', 'OVERLAP_FRAMES')
+        self.MIN_MATCH_OVERLAP = config.getfloat('SegmentProcessor', 'MIN_MATCH_OVERLAP')
+        if self.OVERLAP_FRAMES < 1 or self.SEGMENT_FRAMES <= self.OVERLAP_FRAMES:
+            raise ValueError(f"SEGMENT_FRAMES ({self.SEGMENT_FRAMES}) must be more than OVERLAP_FRAMES ({self.OVERLAP_FRAMES}), which must be at least 1")
+        if config.getboolean('ColoredObjectIdentifier', 'USE_FOREGROUND_FILTER'):
+            raise ValueError("An identifier with a foreground filter depends on the previous frames and can not be split into segments")
+        if workers is None:
+            workers = self.WORKERS
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.configDict = configToDict(config)
+        self.metrics = getMetrics(config)
+        self.unalignedSegments = 0
+
+    # Identify and track the objects of a video, returns the detections and tracks of every frame
+    # @param videoPath: The path to the video
+    # @return: The detections (frame, label, x, y, w, h, area), the tracks (frame, id, label, x, y, w, h)
+    #          and the number of frames
+    def processVideo(self, videoPath):
+        cap = cv2.VideoCapture(videoPath)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {videoPath}")
+        frameCount = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        segments = splitSegments(frameCount, self.SEGMENT_FRAMES, self.OVERLAP_FRAMES)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(self.workers, len(segments))) as executor:
+            futures = [executor.submit(processSegment, self.configDict, videoPath, start, count, self.OVERLAP_FRAMES, True)
+                       for start, count in segments]
+            return self.stitchSegments([start for start, _ in segments], (self.mergeMetrics(future.result()) for future in futures))
+
+    # Merge the metrics of a segment into the metrics of this process, returns the result of the segment
+    # @param segment: The result of the segment (from processSegment)
+    # @return: The result of the segment
+    def mergeMetrics(self, segment):
+        if segment['metrics'] is not None:
+            self.metrics.merge(segment['metrics'])
+        return segment
+
+    # Find the first frame of a segment in the frames at the end of the segment before it
+    # @param previousStart: The first frame of the segment before
+    # @param previous: The result of the segment before
+    # @param segment: The result of the segment
+    # @param nominalStart: The frame the segment was seeked to
+    # @return: The first frame of the segment
+    def alignSegment(self, previousStart, previous, segment, nominalStart):
+        tail = previous['tailDigests']
+        head = segment['headDigests']
+        tailStart = previousStart + previous['frameCount'] - len(tail)
+        # Every place where the head of the segment matches the tail of the segment before
+        # (the head may start a few frames before the tail, if the seek landed early)
+        matches = [tailStart + index for index in range(1 - len(head), len(tail))
+                   if tail[max(index, 0):index + len(head)] == head[max(-index, 0):len(tail) - index]]
+        if len(matches) == 0:
+            self.unalignedSegments += 1
+            return nominalStart
+        return min(matches, key=lambda start: abs(start - nominalStart))
+
+    # Match the track IDs of a segment to the track IDs of the segment before it
+    # Every pair of tracks with the same label gets a vote for every shared frame where their
+    # rectangles overlap by at least MIN_MATCH_OVERLAP, and the pairs are matched by most votes.
+    # @param previousTracks: The tracks of the segment before, by frame: {frame: [(id, label, rect)]}
+    # @param tracks: The tracks of the segment, by frame
+    # @return: A dictionary of matched IDs {id: previous id}
+    def matchTracks(self, previousTracks, tracks):
+        votes = dict[tuple, int]([])
+        for frame in tracks.keys() & previousTracks.keys():
+            for id, label, rect in tracks[frame]:
+                for previousId, previousLabel, previousRect in previousTracks[frame]:
+                    if label == previousLabel and rectangleOverlap(rect, previousRect) >= self.MIN_MATCH_OVERLAP:
+                        votes[(id, previousId)] = votes.get((id, previousId), 0) + 1
+        matched = dict[int, int]([])
+        matchedPrevious = set()
+        for (id, previousId), _ in sorted(votes.items(), key=lambda item: (-item[1], item[0])):
+            if id not in matched and previousId not in matchedPrevious:
+                matched[id] = previousId
+                matchedPrevious.add(previousId)
+        return matched
+
+    # Stitch the results of the segments into one set of detections and tracks
+    # @param nominalStarts: The frame every segment was seeked to
+    # @param results: The results of the segments, in order
+    # @return: The detections (frame, label, x, y, w, h, area), the tracks (frame, id, label, x, y, w, h)
+    #          and the number of frames
+    def stitchSegments(self, nominalStarts, results):
+        detections = []
+        tracks = []
+        nextId = 0
+        end = 0
+        previous = None
+        for nominalStart, segment in zip(nominalStarts, results):
+            # Find the frames of the segment, and its tracks in the frames it shares with the segment before
+            start = 0 if previous is None else self.alignSegment(previousStart, previous, segment, nominalStart)
+            segmentTracks = dict[int, list]([])
+            for frame, id, label, x, y, w, h in segment['tracks']:
+                if start + frame < end:
+                    segmentTracks.setdefault(start + frame, []).append((id, label, (x, y, w, h)))
+
+            # Give the matched tracks the IDs of the segment before, and the others new IDs
+            globalIds = dict[int, int]([])
+            if previous is not None:
+                matched = self.matchTracks(previousTracks, segmentTracks)
+                globalIds = {id: previousIds[previousId] for id, previousId in matched.items() if previousId in previousIds}
+
+            # Keep the frames after the end of the segment before
+            for frame, label, x, y, w, h, area in segment['detections']:
+                if start + frame >= end:
+                    detections.append((start + frame, label, x, y, w, h, area))
+            tailTracks = dict[int, list]([])
+            tailStart = start + segment['frameCount'] - self.OVERLAP_FRAMES
+            for frame, id, label, x, y, w, h in segment['tracks']:
+                if start + frame >= end:
+                    if id not in globalIds:
+                        globalIds[id] = nextId
+                        nextId += 1
+                    tracks.append((start + frame, globalIds[id], label, x, y, w, h))
+                if start + frame >= tailStart:
+                    tailTracks.setdefault(start + frame, []).append((id, label, (x, y, w, h)))
+
+            end = max(end, start + segment['frameCount'])
+            previous, previousStart, previousTracks, previousIds = segment, start, tailTracks, globalIds
+        return detections, tracks, end
@@ -0,0 +1,100 @@
+import collections
+import numpy as np
+from multiprocessing import shared_memory
+
+# Shared Frame Ring Class
+# A fixed ring of preallocated frame slots in shared memory, so frames can be passed to other
+# processes by slot index instead of by pickling them. Every slot has a sequence number in a
+# header, written with the frame, that readers check to make sure the slot was not reused.
+# The process that creates the ring owns the free slots: it acquires a slot, writes a frame into
+# it and sends (slot, sequence number) to a worker, then releases the slot once the worker is done.
+# Workers attach to the ring by its description and read the frames in place.
+class SharedFrameRing():
+
+    # Alignment (bytes) of the frame slots
+    SLOT_ALIGNMENT = 64
+
+    # Constructor for the SharedFrameRing class, creates a ring or attaches to an existing one
+    # @param slotCount: The number of frame slots
+    # @param frameShape: The shape of the frames (height, width, channels)
+    # @param dtype: The data type of the frames
+    # @param name: The name of the shared memory to attach to, None to create a new ring
+    # Fields:
+    #   slotCount: The number of frame slots
+    #   frameShape: The shape of the frames
+    #   sequences: The sequence number of the frame in every slot (-1 for none)
+    #   slots: The (slotCount, *frameShape) array of frames
+    #   freeSlots: The slots that can be acquired (only in the process that created the ring)
+    def __init__(self, slotCount, frameShape, dtype=np.uint8, name=None):
+        if slotCount < 1:
+            raise ValueError(f"The ring needs at least one slot: {slotCount}")
+        self.slotCount = slotCount
+        self.frameShape = tuple(frameShape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+
+        # The header holds the sequence numbers, the slots follow it
+        headerSize = self.SLOT_ALIGNMENT * -(-8 * slotCount // self.SLOT_ALIGNMENT)
+        frameSize = int(np.prod(self.frameShape)) * self.dtype.itemsize
+        slotSize = self.SLOT_ALIGNMENT * -(-frameSize // self.SLOT_ALIGNMENT)
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=headerSize + slotCount * slotSize)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.sequences = np.ndarray((slotCount,), dtype=np.int64, buffer=self.memory.buf)
+        self.slots = np.ndarray((slotCount,) + self.frameShape, dtype=self.dtype, buffer=self.memory.buf, offset=headerSize,
+                                strides=(slotSize,) + np.empty(self.frameShape, dtype=self.dtype).strides)
+
+        self.freeSlots = collections.deque()
+        self.nextSequence = 0
+        if self.owner:
+            self.sequences[:] = -1
+            self.freeSlots.extend(range(slotCount))
+
+    # Get the description of the ring, to attach to it from another process
+    # @return: A tuple (slotCount, frameShape, dtype, name) of the arguments to attach with
+    def getDescription(self):
+        return (self.slotCount, self.frameShape, self.dtype.str, self.memory.name)
+
+    # Acquire a free slot, returns the slot index or None if every slot is in use
+    # @return: The slot index, or None
+    def acquire(self):
+        return self.freeSlots.popleft() if self.freeSlots else None
+
+    # Release a slot, so it can be acquired again
+    # @param slot: The slot index
+    def release(self, slot):
+        self.sequences[slot] = -1
+        self.freeSlots.append(slot)
+
+    # Write a frame into a slot, returns the sequence number of the frame
+    # @param slot: The slot index (acquired)
+    # @param frame: The frame to write
+    # @return: The sequence number of the frame
+    def write(self, slot, frame):
+        if frame.shape != self.frameShape:
+            raise ValueError(f"The frame shape {frame.shape} does not match the ring {self.frameShape}")
+        np.copyto(self.slots[slot], frame)
+        sequence = self.nextSequence
+        self.nextSequence += 1
+        self.sequences[slot] = sequence
+        return sequence
+
+    # Read the frame in a slot in place, returns a view of the frame
+    # Raises a ValueError if the slot does not hold the frame with the sequence number.
+    # @param slot: The slot index
+    # @param sequence: The sequence number of the frame
+    # @return: A view of the frame (valid until the slot is released)
+    def read(self, slot, sequence):
+        if self.sequences[slot] != sequence:
+            raise ValueError(f"Slot {slot} holds frame {self.sequences[slot]}, not frame {sequence}")
+        return self.slots[slot]
+
+    # Close the ring in this process, and free the shared memory if this process created it
+    def close(self):
+        # Drop the views before closing the memory they point to
+        self.sequences = None
+        self.slots = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,230 @@
+import queue
+import threading
+import time
+
+# The item that marks the end of the frames in the queues (None is a valid processed frame)
+END_OF_FRAMES = object()
+
+# Stage Statistics Class
+# Keeps the time a pipeline stage spent waiting for its input or output, and the depth of its input queue
+class StageStats():
+
+    # Constructor for the StageStats class
+    # @param name: The name of the stage
+    # Fields:
+    #   name: The name of the stage
+    #   frameCount: The number of frames the stage handled
+    #   inputWait: The time (seconds) the stage waited for frames
+    #   outputWait: The time (seconds) the stage waited to pass frames on (the next queue was full)
+    #   depthSum: The sum of the depths of the input queue, every time a frame was taken from it
+    #   maxDepth: The largest depth of the input queue
+    #   droppedFrames: The number of frames the stage dropped
+    def __init__(self, name):
+        self.name = name
+        self.frameCount = 0
+        self.inputWait = 0.0
+        self.outputWait = 0.0
+        self.depthSum = 0
+        self.maxDepth = 0
+        self.droppedFrames = 0
+
+    # Record the depth of the input queue
+    # @param depth: The depth of the input queue
+    def recordDepth(self, depth):
+        self.depthSum += depth
+        self.maxDepth = max(self.maxDepth, depth)
+
+    # Format the statistics of the stage, returns a string
+    # @return: A string with the statistics of the stage
+    def format(self):
+        frameCount = max(self.frameCount, 1)
+        return (f"{self.name}: {self.frameCount} frames, "
+                f"input wait {1000 * self.inputWait / frameCount:.2f} ms/frame, "
+                f"output wait {1000 * self.outputWait / frameCount:.2f} ms/frame, "
+                f"queue depth {self.depthSum / frameCount:.2f} (max {self.maxDepth}), "
+                f"{self.droppedFrames} dropped")
+
+# Latest Frame Slot Class
+# A queue that only holds the newest item: putting an item replaces the one that was not taken
+# yet (which is counted as dropped), so putting never waits and the taker always gets the newest item.
+class LatestFrameSlot():
+
+    # Constructor for the LatestFrameSlot class
+    # @param stats: The statistics to count the dropped items in
+    def __init__(self, stats):
+        self.stats = stats
+        self.condition = threading.Condition()
+        self.item = None
+        self.full = False
+
+    # Put an item in the slot, replacing the item in it
+    # @param item: The item to put
+    # @param timeout: Unused, putting never waits
+    def put(self, item, timeout=None):
+        with self.condition:
+            if self.full:
+                self.stats.droppedFrames += 1
+            self.item = item
+            self.full = True
+            self.condition.notify()
+
+    # Take the item from the slot, waiting until there is one
+    # Raises queue.Empty if there is no item before the timeout.
+    # @param timeout: The time (seconds) to wait for an item
+    # @return: The item
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.full, timeout):
+                raise queue.Empty
+            self.full = False
+            item = self.item
+            self.item = None
+            return item
+
+    # Get the number of items in the slot, returns 0 or 1
+    # @return: The number of items in the slot
+    def qsize(self):
+        return int(self.full)
+
+# Threaded Pipeline Class
+# Runs the capture, processing and output of frames in three stages connected by bounded queues:
+# a capture thread reads the frames, a processing thread identifies, tracks and draws them, and
+# the caller's thread (which must own the display windows) takes the processed frames from frames().
+# Every stage handles the frames in order, and blocks when the next queue is full.
+# With latestFrame, the capture keeps reading the camera and the processing always takes the
+# newest frame, dropping the frames it could not keep up with (so the output does not lag behind).
+class ThreadedPipeline():
+
+    # Constructor for the ThreadedPipeline class
+    # @param capture: The capture to read frames from (read() returns (ret, frame), like cv2.VideoCapture)
+    # @param processFrame: The function that processes a frame, processFrame(frame, elapsedFrames)
+    #                      returns the frame to output (elapsedFrames is the number of frames since
+    #                      the last processed frame, more than 1 after dropped frames)
+    # @param queueSize: The number of frames every queue can hold
+    # @param latestFrame: Whether to only process the newest captured frame, dropping the others
+    # Fields:
+    #   captureQueue: The queue of captured (frame number, frame) pairs
+    #   outputQueue: The queue of processed frames
+    #   stats: The statistics of the capture, process and output stages
+    def __init__(self, capture, processFrame, queueSize, latestFrame=False):
+        if queueSize < 1:
+            raise ValueError(f"The queue size must be at least 1: {queueSize}")
+        self.capture = capture
+        self.processFrame = processFrame
+        self.stopEvent = threading.Event()
+        self.captureStats = StageStats('capture')
+        self.processStats = StageStats('process')
+        self.outputStats = StageStats('output')
+        if latestFrame:
+            self.captureQueue = LatestFrameSlot(self.captureStats)
+        else:
+            self.captureQueue = queue.Queue(maxsize=queueSize)
+        self.outputQueue = queue.Queue(maxsize=queueSize)
+        self.stats = [self.captureStats, self.processStats, self.outputStats]
+        self.error = None
+        self.threads = []
+
+    # Put an item in a queue, waiting while it is full unless the pipeline is stopped
+    # @param itemQueue: The queue to put the item in
+    # @param item: The item to put
+    # @param stats: The statistics of the stage that puts the item
+    # @return: False if the pipeline was stopped
+    def putItem(self, itemQueue, item, stats):
+        start = time.perf_counter()
+        while not self.stopEvent.is_set():
+            try:
+                itemQueue.put(item, timeout=0.1)
+                stats.outputWait += time.perf_counter() - start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # Take an item from a queue, waiting while it is empty unless the pipeline is stopped
+    # @param itemQueue: The queue to take the item from
+    # @param stats: The statistics of the stage that takes the item
+    # @return: The item, or END_OF_FRAMES at the end of the frames or if the pipeline was stopped
+    def getItem(self, itemQueue, stats):
+        start = time.perf_counter()
+        stats.recordDepth(itemQueue.qsize())
+        while not self.stopEvent.is_set():
+            try:
+                item = itemQueue.get(timeout=0.1)
+                stats.inputWait += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                continue
+        return END_OF_FRAMES
+
+    # Capture stage, reads frames until the capture ends or the pipeline is stopped
+    def captureFrames(self):
+        try:
+            while not self.stopEvent.is_set():
+                start = time.perf_counter()
+                ret, frame = self.capture.read()
+                self.captureStats.inputWait += time.perf_counter() - start
+                if not ret or frame is None:
+                    break
+                self.captureStats.frameCount += 1
+                if not self.putItem(self.captureQueue, (self.captureStats.frameCount, frame), self.captureStats):
+                    return
+        except Exception as error:
+            self.error = error
+        # Mark the end of the frames
+        self.putItem(self.captureQueue, END_OF_FRAMES, self.captureStats)
+
+    # Process stage, processes the captured frames in order
+    def processFrames(self):
+        try:
+            lastFrameNumber = 0
+            while True:
+                item = self.getItem(self.captureQueue, self.processStats)
+                if item is END_OF_FRAMES:
+                    break
+                frameNumber, frame = item
+                output = self.processFrame(frame, frameNumber - lastFrameNumber)
+                lastFrameNumber = frameNumber
+                self.processStats.frameCount += 1
+                if not self.putItem(self.outputQueue, output, self.processStats):
+                    return
+        except Exception as error:
+            self.error = error
+        # Mark the end of the frames
+        self.putItem(self.outputQueue, END_OF_FRAMES, self.processStats)
+
+    # Start the capture and process threads
+    def start(self):
+        self.threads = [threading.Thread(target=self.captureFrames, name='capture', daemon=True),
+                        threading.Thread(target=self.processFrames, name='process', daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    # Stop the pipeline and wait for the threads to finish
+    def stop(self):
+        self.stopEvent.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    # Yield the processed frames in order, starting the pipeline if it was not started
+    # Raises the error of a stage, if a stage failed.
+    # @return: A generator of processed frames
+    def frames(self):
+        if not self.threads:
+            self.start()
+        try:
+            while True:
+                output = self.getItem(self.outputQueue, self.outputStats)
+                if output is END_OF_FRAMES:
+                    break
+                self.outputStats.frameCount += 1
+                yield output
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    # Format the statistics of every stage, returns a string
+    # @return: A string with one line of statistics per stage
+    def formatStats(self):
+        return '\n'.join(stats.format() for stats in self.stats)
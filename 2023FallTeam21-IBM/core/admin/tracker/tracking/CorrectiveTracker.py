@@ -1,6 +1,9 @@
 import cv2
+import numpy as np
+import time
 from tracking.Tracker import Tracker
 from tracking.TrackedObject import TrackedObject
+from metrics.Metrics import getMetrics
 
 # Concrete class for corrective Object Tracking
 class CorrectiveTracker(Tracker):
@@ -13,6 +16,10 @@ class CorrectiveTracker(Tracker):
     def __init__(self, config, resolution):
         # Get the options from the config file
         self.DEFAULT_TRACKER_THRESHOLD = config.getfloat('CorrectiveTracker', 'DEFAULT_TRACKER_THRESHOLD')
+        self.ASSIGNMENT_MODE = config.get('CorrectiveTracker', 'ASSIGNMENT_MODE')
+        self.MAX_THRESHOLD_SCALE = config.getfloat('CorrectiveTracker', 'MAX_THRESHOLD_SCALE')
+        if self.ASSIGNMENT_MODE not in ('greedy', 'global'):
+            raise ValueError(f"Unknown ASSIGNMENT_MODE: {self.ASSIGNMENT_MODE}")
 
         # Convert the resolution into pixel thresholds
         #       (DEFAULT_TRACKER_THRESHOLD) 
@@ -20,40 +27,144 @@ class CorrectiveTracker(Tracker):
         resolutionHeight = resolution[1]
         resolutionAverage = (resolutionWidth + resolutionHeight) / 2
         self.DEFAULT_TRACKER_THRESHOLD = self.DEFAULT_TRACKER_THRESHOLD * resolutionAverage / self.STANDARD_RESOLUTION_AVERAGE
-        # Call the parent constructor
-        super().__init__()
+        # Call the parent constructor, indexing the tracked objects in cells of the tracker threshold
+        super().__init__(self.DEFAULT_TRACKER_THRESHOLD)
+        # Get the metrics the updates are recorded in, None if they are not enabled
+        self.metrics = getMetrics(config)
     
-    # Concrete method for updating the tracker, returns a list of tuples (contour, label)
+    # Concrete method for updating the tracker with the configured ASSIGNMENT_MODE
+    # The objects move further when frames were dropped, so the tracker threshold is scaled
+    # by the number of elapsed frames (up to MAX_THRESHOLD_SCALE).
+    # @param contoursToUpdate: The contours to update the tracker with
+    # @param elapsedFrames: The number of frames since the last update (more than 1 if frames were dropped)
+    def update(self, contoursToUpdate, elapsedFrames=1):
+        start = time.perf_counter() if self.metrics is not None else None
+        threshold = self.getThreshold(elapsedFrames)
+        if self.ASSIGNMENT_MODE == 'global':
+            self.updateGlobal(contoursToUpdate, threshold)
+        else:
+            self.updateGreedy(contoursToUpdate, threshold)
+        if start is not None:
+            self.recordUpdate(start)
+
+    # Get the tracker threshold for a number of elapsed frames, returns the threshold
+    # @param elapsedFrames: The number of frames since the last update
+    # @return: The tracker threshold (pixels)
+    def getThreshold(self, elapsedFrames):
+        return self.DEFAULT_TRACKER_THRESHOLD * min(max(elapsedFrames, 1), self.MAX_THRESHOLD_SCALE)
+
+    # Update the tracker with a global assignment of contours to tracked objects
+    # Measures the distance between every contour and the tracked objects near it, only allows
+    # pairs with the same label that are closer than the threshold, and assigns
+    # as many contours as possible to tracked objects one-to-one, with the lowest total distance.
+    # Contours that are not assigned become new tracked objects, and tracked objects that are
+    # not assigned are removed.
+    # @param contoursToUpdate: The contours to update the tracker with
+    # @param threshold: The tracker threshold (pixels), DEFAULT_TRACKER_THRESHOLD if not given
+    def updateGlobal(self, contoursToUpdate, threshold=None):
+        if threshold is None:
+            threshold = self.DEFAULT_TRACKER_THRESHOLD
+        self.syncObjectIndex()
+        # Get the bounding rectangles of the contours, and the tracked objects
+        rects = [cv2.boundingRect(updateContour) for updateContour, _ in contoursToUpdate]
+        ids = list(self.trackedObjects)
+        objects = [self.trackedObjects[id] for id in ids]
+        columnOfId = {id: column for column, id in enumerate(ids)}
+
+        # Only measure the pairs of contours and nearby tracked objects with the same label
+        pairRows, pairColumns = [], []
+        for row, (_, label) in enumerate(contoursToUpdate):
+            for id in self.findCandidateObjects(rects[row], label, threshold):
+                pairRows.append(row)
+                pairColumns.append(columnOfId[id])
+        self.pairCount = len(pairRows)
+        distances = np.full((len(rects), len(ids)), np.inf)
+        if len(pairRows) > 0:
+            objectRects = [trackedObject.getBoundingRectangle() for trackedObject in objects]
+            distances[pairRows, pairColumns] = self.calculateObjectDistances(
+                np.asarray(rects, dtype=np.float64)[pairRows], np.asarray(objectRects, dtype=np.float64)[pairColumns])
+        # Gate the pairs by the tracker threshold, and assign
+        allowed = distances < threshold
+        rows, columns = self.solveAssignment(distances, allowed)
+
+        # Update the assigned tracked objects, keeping their order, and retire the others
+        updatedTrackedObjects = dict[int, TrackedObject]([])
+        assignedRows = dict(zip(columns.tolist(), rows.tolist()))
+        for column, id in enumerate(ids):
+            if column in assignedRows:
+                objects[column].updatePosition(rects[assignedRows[column]])
+                updatedTrackedObjects[id] = objects[column]
+            else:
+                self.objectIndex.remove(id)
+        # New objects are detected: we assign new IDs to the contours that were not assigned
+        unassigned = np.ones(len(rects), dtype=bool)
+        unassigned[rows] = False
+        for row in np.flatnonzero(unassigned).tolist():
+            newObject = TrackedObject(self.idCount, rects[row], contoursToUpdate[row][1])
+            updatedTrackedObjects[self.idCount] = newObject
+            self.objectIndex.add(newObject)
+            self.idCount += 1
+
+        self.trackedObjects = updatedTrackedObjects
+        return
+
+    # Update the tracker by matching every contour to its closest tracked object in turn
     # For each contour to update, the method finds the closest tracked object and
     # updates the tracked object with the contour's bounding rectangle.
+    # The contours are measured against the tracked objects near them at once, and a contour is
+    # measured again against the tracked objects with its label that moved to an earlier contour.
     # NOTE: update will only assign a contour to a tracked object if the contour's label
     #       matches the tracked object's label.
     # @param contoursToUpdate: The contours to update the tracker with
-    # @return: A list of tuples (contour, label)
-    def update(self, contoursToUpdate):
+    # @param threshold: The tracker threshold (pixels), DEFAULT_TRACKER_THRESHOLD if not given
+    def updateGreedy(self, contoursToUpdate, threshold=None):
+        if threshold is None:
+            threshold = self.DEFAULT_TRACKER_THRESHOLD
+        self.syncObjectIndex()
         # Initialize the updated tracked objects dictionary
         updatedTrackedObjects = dict[int, TrackedObject]([])
         updatedTrackedObjects = self.trackedObjects.copy()
         # Initialize the updated IDs list
         updatedIds = []
+        # New objects are only indexed after every contour is matched
+        newObjects = []
+
+        # Measure the pairs of contours and nearby tracked objects with the same label at once
+        rects = [cv2.boundingRect(updateContour) for updateContour, _ in contoursToUpdate]
+        candidateLists = [self.findCandidateObjects(rects[row], label, threshold) for row, (_, label) in enumerate(contoursToUpdate)]
+        pairRows = [row for row, candidates in enumerate(candidateLists) for _ in candidates]
+        pairIds = [id for candidates in candidateLists for id in candidates]
+        self.pairCount = len(pairIds)
+        pairDistances = []
+        if len(pairIds) > 0:
+            pairDistances = self.calculateObjectDistances(
+                np.asarray(rects, dtype=np.float64)[pairRows],
+                np.asarray([self.trackedObjects[id].getBoundingRectangle() for id in pairIds], dtype=np.float64)).tolist()
+        # The tracked objects that moved to a contour, by label
+        movedIds = dict[str, list]([])
 
         # For each contour to update, find the closest tracked object
-        for updateContour, label in contoursToUpdate:
+        pairStart = 0
+        for row, (_, label) in enumerate(contoursToUpdate):
             # Initialize the minimum distance and ID
-            minDist = self.DEFAULT_TRACKER_THRESHOLD
+            minDist = threshold
             minDistId = -1
-            # Get the bounding rectangle of the contour
-            rect = cv2.boundingRect(updateContour)
-            # Find out if that object was detected already
-            for id in self.trackedObjects:
-                # Get the tracked object
-                existingObject = self.trackedObjects[id]
-                # Check if the label is the same
-                if existingObject.getLabel() != label:
-                    # If not, skip
-                    continue
-                # Calculate distance between edges of contours
-                dist = self.calculateObjectDistance(rect, existingObject)
+            rect = rects[row]
+            candidates = candidateLists[row]
+            distances = pairDistances[pairStart:pairStart + len(candidates)]
+            pairStart += len(candidates)
+            # The tracked objects with the label that moved are measured at their new position
+            # (the index only finds tracked objects closer than the threshold, so the farther ones can be measured too)
+            moved = movedIds.get(label)
+            if moved:
+                pairs = [(id, dist) for id, dist in zip(candidates, distances) if id not in moved]
+                pairs += zip(moved, self.calculateObjectDistances(
+                    np.asarray(rect, dtype=np.float64), np.asarray([self.trackedObjects[id].getBoundingRectangle() for id in moved], dtype=np.float64)).tolist())
+                self.pairCount += len(moved)
+                pairs.sort()
+                candidates, distances = [id for id, _ in pairs], [dist for _, dist in pairs]
+            # Find out if that object was detected already (in the order of the tracked objects)
+            for id, dist in zip(candidates, distances):
                 # If the distance is less than the minimum distance, update the minimum distance and ID
                 if dist < minDist:
                     minDist = dist
@@ -62,10 +173,14 @@ class CorrectiveTracker(Tracker):
             if minDistId != -1:
                 updatedTrackedObjects[minDistId].updatePosition(rect)
                 updatedIds.append(minDistId)
+                moved = movedIds.setdefault(label, [])
+                if minDistId not in moved:
+                    moved.append(minDistId)
             else:
                 # New object is detected: we assign a new ID to that object
                 newObject = TrackedObject(self.idCount, rect, label)
                 updatedTrackedObjects[self.idCount] = newObject
+                newObjects.append(newObject)
                 updatedIds.append(self.idCount)
                 self.idCount += 1
 
@@ -73,8 +188,10 @@ class CorrectiveTracker(Tracker):
         for id in self.trackedObjects:
             if id not in updatedIds:
                 updatedTrackedObjects.pop(id)
+                self.objectIndex.remove(id)
+        for newObject in newObjects:
+            self.objectIndex.add(newObject)
 
         # Update dictionary with IDs not used removed
         self.trackedObjects = updatedTrackedObjects.copy()
         return
-    
@@ -1,11 +1,176 @@
-import math
-import numpy as np
 import cv2
-import sys
+import numpy as np
+import time
 from tracking.Tracker import Tracker
 from tracking.TrackedObject import TrackedObject
+from metrics.Metrics import getMetrics
 
+# Concrete class for predictive Object Tracking
+# Every track is a constant velocity Kalman filter over the center of its bounding rectangle.
+# The states of all the tracks are held in arrays, so every track is predicted at once, and the
+# contours are assigned to the predicted positions. Tracks survive MAX_MISSED_FRAMES frames
+# without a contour (counting the frames predicted over and the dropped frames), and predict can
+# be called on frames that are not identified at all.
 class PredictiveTracker(Tracker):
-    def update(self, contoursToUpdate):
-        # Not Implemented
-        return
\ No newline at end of file
+
+    # Standard resolution average (pixels) (for width of 1280 and height of 720)
+    STANDARD_RESOLUTION_AVERAGE = 1000.0
+    # Variance of the velocity (pixels per frame) of a new track
+    INITIAL_VELOCITY_VARIANCE = 100.0
+
+    # Constructor, initializes the Predictive Tracker
+    # @param config: The configuration object that stores the settings the project is running on
+    # @param resolution: The resolution (width, height) of the frames
+    # Fields:
+    #   ids: The IDs of the tracks
+    #   labels: The labels of the tracks
+    #   states: The (center x, center y, velocity x, velocity y) states of the tracks
+    #   covariances: The 4x4 covariances of the states of the tracks
+    #   sizes: The (width, height) of the bounding rectangles of the tracks
+    #   missedFrames: The number of frames since every track was last assigned a contour
+    def __init__(self, config, resolution):
+        # Get the options from the config file
+        self.DEFAULT_TRACKER_THRESHOLD = config.getfloat('PredictiveTracker', 'DEFAULT_TRACKER_THRESHOLD')
+        self.MAX_MISSED_FRAMES = config.getint('PredictiveTracker', 'MAX_MISSED_FRAMES')
+        self.PROCESS_NOISE = config.getfloat('PredictiveTracker', 'PROCESS_NOISE')
+        self.MEASUREMENT_NOISE = config.getfloat('PredictiveTracker', 'MEASUREMENT_NOISE')
+
+        # Convert the resolution into pixel thresholds
+        #       (DEFAULT_TRACKER_THRESHOLD)
+        resolutionWidth = resolution[0]
+        resolutionHeight = resolution[1]
+        resolutionAverage = (resolutionWidth + resolutionHeight) / 2
+        self.DEFAULT_TRACKER_THRESHOLD = self.DEFAULT_TRACKER_THRESHOLD * resolutionAverage / self.STANDARD_RESOLUTION_AVERAGE
+        # Call the parent constructor
+        super().__init__()
+        # Get the metrics the updates are recorded in, None if they are not enabled
+        self.metrics = getMetrics(config)
+
+        # The states of the tracks, in the order of the tracked objects
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.labels = np.zeros(0, dtype=object)
+        self.states = np.zeros((0, 4))
+        self.covariances = np.zeros((0, 4, 4))
+        self.sizes = np.zeros((0, 2))
+        self.missedFrames = np.zeros(0, dtype=np.int64)
+
+        # The measurement only observes the center
+        self.measurementMatrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]])
+        self.measurementCovariance = self.MEASUREMENT_NOISE * np.eye(2)
+
+    # Get the transition and process noise matrices for a number of frames
+    # @param elapsedFrames: The number of frames to predict over
+    # @return: The 4x4 transition matrix and the 4x4 process noise covariance
+    def getTransition(self, elapsedFrames):
+        dt = float(elapsedFrames)
+        transition = np.eye(4)
+        transition[0, 2] = dt
+        transition[1, 3] = dt
+        # Random acceleration between frames
+        noiseGain = np.array([[dt * dt / 2, 0.0], [0.0, dt * dt / 2], [dt, 0.0], [0.0, dt]])
+        processCovariance = self.PROCESS_NOISE * noiseGain @ noiseGain.T
+        return transition, processCovariance
+
+    # Predict the states of all the tracks forward
+    # @param elapsedFrames: The number of frames to predict over
+    def predictStates(self, elapsedFrames):
+        transition, processCovariance = self.getTransition(elapsedFrames)
+        self.states = self.states @ transition.T
+        self.covariances = transition @ self.covariances @ transition.T + processCovariance
+
+    # Get the predicted bounding rectangles of all the tracks, returns an (n, 4) array
+    # @return: An (n, 4) array of (x, y, w, h) rectangles
+    def getPredictedRectangles(self):
+        return np.concatenate((self.states[:, :2] - self.sizes / 2, self.sizes), axis=1)
+
+    # Correct the states of some of the tracks with measured centers
+    # @param tracks: The indices of the tracks to correct
+    # @param centers: An (k, 2) array of the measured centers
+    def correctStates(self, tracks, centers):
+        covariances = self.covariances[tracks]
+        # Innovation and its covariance
+        residuals = centers - self.states[tracks, :2]
+        innovationCovariances = covariances[:, :2, :2] + self.measurementCovariance
+        gains = covariances[:, :, :2] @ np.linalg.inv(innovationCovariances)
+        self.states[tracks] += (gains @ residuals[:, :, None])[:, :, 0]
+        self.covariances[tracks] = (np.eye(4) - gains @ self.measurementMatrix) @ covariances
+
+    # Move the tracked objects to their tracks, measured or predicted
+    # @param measuredRects: The measured bounding rectangles of the tracks that were assigned a contour, by index
+    def updateTrackedObjects(self, measuredRects):
+        predictedRects = np.rint(self.getPredictedRectangles()).astype(int).tolist()
+        for index, id in enumerate(self.ids.tolist()):
+            rect = measuredRects.get(index, tuple(predictedRects[index]))
+            self.trackedObjects[id].updatePosition(rect)
+
+    # Predict all the tracks forward, for frames the objects are not identified in
+    # The frames predicted over count as missed, until the next update assigns the tracks a contour.
+    # @param elapsedFrames: The number of frames to predict over
+    def predict(self, elapsedFrames=1):
+        self.predictStates(elapsedFrames)
+        self.missedFrames += elapsedFrames
+        self.updateTrackedObjects({})
+
+    # Concrete method for updating the tracker
+    # Predicts all the tracks forward, then assigns the contours to the predicted positions one-to-one
+    # (only pairs with the same label that are closer than DEFAULT_TRACKER_THRESHOLD), with the lowest
+    # total distance. The assigned tracks are corrected with the contours, the contours that are not
+    # assigned become new tracks, and the tracks without a contour for more than MAX_MISSED_FRAMES frames
+    # (elapsedFrames counts towards them) are removed.
+    # @param contoursToUpdate: The contours to update the tracker with
+    # @param elapsedFrames: The number of frames since the last call to update or predict
+    def update(self, contoursToUpdate, elapsedFrames=1):
+        start = time.perf_counter() if self.metrics is not None else None
+        self.predictStates(elapsedFrames)
+
+        # Get the bounding rectangles and labels of the contours
+        rects = [cv2.boundingRect(updateContour) for updateContour, _ in contoursToUpdate]
+        labels = np.array([label for _, label in contoursToUpdate], dtype=object)
+
+        # Assign the contours to the predicted positions, gated by label and the tracker threshold
+        distances = self.calculateObjectDistanceMatrix(rects, self.getPredictedRectangles())
+        self.pairCount = distances.size
+        allowed = (labels[:, None] == self.labels[None, :]) & (distances < self.DEFAULT_TRACKER_THRESHOLD)
+        rows, tracks = self.solveAssignment(distances, allowed)
+
+        # Correct the assigned tracks with the centers of the contours
+        measured = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        if len(rows) > 0:
+            self.correctStates(tracks, measured[rows, :2] + measured[rows, 2:] / 2)
+            self.sizes[tracks] = measured[rows, 2:]
+        self.missedFrames += elapsedFrames
+        self.missedFrames[tracks] = 0
+        self.updateTrackedObjects({track: rects[row] for row, track in zip(rows.tolist(), tracks.tolist())})
+
+        # Remove the tracks that missed too many updates
+        kept = self.missedFrames <= self.MAX_MISSED_FRAMES
+        for id in self.ids[~kept].tolist():
+            self.trackedObjects.pop(id)
+        self.ids = self.ids[kept]
+        self.labels = self.labels[kept]
+        self.states = self.states[kept]
+        self.covariances = self.covariances[kept]
+        self.sizes = self.sizes[kept]
+        self.missedFrames = self.missedFrames[kept]
+
+        # New objects are detected: we start new tracks for the contours that were not assigned
+        unassigned = np.ones(len(rects), dtype=bool)
+        unassigned[rows] = False
+        newRows = np.flatnonzero(unassigned)
+        if len(newRows) > 0:
+            newCovariance = np.diag([self.MEASUREMENT_NOISE, self.MEASUREMENT_NOISE, self.INITIAL_VELOCITY_VARIANCE, self.INITIAL_VELOCITY_VARIANCE])
+            newStates = np.zeros((len(newRows), 4))
+            newStates[:, :2] = measured[newRows, :2] + measured[newRows, 2:] / 2
+            newIds = np.arange(self.idCount, self.idCount + len(newRows))
+            self.ids = np.concatenate((self.ids, newIds))
+            self.labels = np.concatenate((self.labels, labels[newRows]))
+            self.states = np.concatenate((self.states, newStates))
+            self.covariances = np.concatenate((self.covariances, np.repeat(newCovariance[None], len(newRows), axis=0)))
+            self.sizes = np.concatenate((self.sizes, measured[newRows, 2:]))
+            self.missedFrames = np.concatenate((self.missedFrames, np.zeros(len(newRows), dtype=np.int64)))
+            for id, row in zip(newIds.tolist(), newRows.tolist()):
+                self.trackedObjects[id] = TrackedObject(id, rects[row], contoursToUpdate[row][1])
+            self.idCount += len(newRows)
+        if start is not None:
+            self.recordUpdate(start)
+        return
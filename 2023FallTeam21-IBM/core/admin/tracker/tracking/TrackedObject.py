@@ -12,6 +12,7 @@ class TrackedObject():
     #   center: The center of the bounding rectangle of the tracked object
     #   label: The label of the tracked object
     #   trail: The trail of the tracked object
+    #   index: The spatial index the tracked object is in (TrackedObjectIndex), None if it is not indexed
     def __init__(self, id, boundingRectangle, label):
         self.id = id
         self.boundingRectangle = boundingRectangle
@@ -21,6 +22,7 @@ class TrackedObject():
         self.label = label
         self.trail = []
         self.trail.append(self.center)
+        self.index = None
 
     # Set the bounding rectangle color
     # @param boundingRectangleColor: The color of the bounding rectangle of the tracked object
@@ -28,13 +30,15 @@ class TrackedObject():
         self.boundingRectangleColor = boundingRectangleColor
 
     # Update the position of the tracked object
-    # Updates the bounding rectangle, center, and trail of the tracked object
+    # Updates the bounding rectangle, center, and trail of the tracked object, and moves it in its spatial index
     # @param boundingRectangle: The bounding rectangle of the tracked object
     def updatePosition(self, boundingRectangle):
         x, y, w, h = boundingRectangle
         self.boundingRectangle = boundingRectangle
         self.center = (int(x + w/2), int(y + h/2))
         self.trail.append(self.center)
+        if self.index is not None:
+            self.index.move(self)
 
     # Get the center of the tracked object
     # @return: The center of the tracked object
@@ -0,0 +1,94 @@
+import math
+
+# Spatial index of tracked objects
+# Buckets the IDs of tracked objects by label and by the cells of a uniform grid that
+# their bounding rectangles cover, so that the objects near a rectangle can be found
+# without looking at every tracked object. An indexed tracked object moves itself in the
+# index when its position is updated.
+class TrackedObjectIndex():
+    # Constructor for the TrackedObjectIndex class
+    # @param cellSize: The size (pixels) of the grid cells, usually the tracker threshold
+    # Fields:
+    #   cellSize: The size of the grid cells
+    #   cells: The IDs of the tracked objects in every (label, cell x, cell y) bucket
+    #   objectCells: The buckets every tracked object is in, by ID
+    #   trackedObjects: The indexed tracked objects, by ID
+    def __init__(self, cellSize):
+        self.cellSize = max(float(cellSize), 1.0)
+        self.cells = dict[tuple, set]([])
+        self.objectCells = dict[int, list]([])
+        self.trackedObjects = dict[int, object]([])
+
+    # Get the buckets a rectangle covers, returns a list of (label, cell x, cell y) buckets
+    # @param label: The label of the buckets
+    # @param rect: The rectangle (x, y, w, h)
+    # @param margin: The distance to grow the rectangle by on every side
+    # @return: A list of buckets
+    def getCells(self, label, rect, margin=0):
+        x, y, w, h = rect
+        left = math.floor((x - margin) / self.cellSize)
+        right = math.floor((x + w + margin) / self.cellSize)
+        top = math.floor((y - margin) / self.cellSize)
+        bottom = math.floor((y + h + margin) / self.cellSize)
+        return [(label, cellX, cellY) for cellX in range(left, right + 1) for cellY in range(top, bottom + 1)]
+
+    # Add a tracked object to the index
+    # @param trackedObject: The tracked object to add
+    def add(self, trackedObject):
+        id = trackedObject.getId()
+        cells = self.getCells(trackedObject.getLabel(), trackedObject.getBoundingRectangle())
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(id)
+        self.objectCells[id] = cells
+        self.trackedObjects[id] = trackedObject
+        trackedObject.index = self
+
+    # Remove a tracked object from the index
+    # @param id: The ID of the tracked object to remove
+    def remove(self, id):
+        for cell in self.objectCells.pop(id):
+            bucket = self.cells[cell]
+            bucket.discard(id)
+            if not bucket:
+                del self.cells[cell]
+        trackedObject = self.trackedObjects.pop(id)
+        if trackedObject.index is self:
+            trackedObject.index = None
+
+    # Move a tracked object to the buckets of its current bounding rectangle
+    # (called by TrackedObject.updatePosition)
+    # @param trackedObject: The tracked object that moved
+    def move(self, trackedObject):
+        id = trackedObject.getId()
+        cells = self.getCells(trackedObject.getLabel(), trackedObject.getBoundingRectangle())
+        if cells != self.objectCells[id]:
+            for cell in self.objectCells[id]:
+                bucket = self.cells[cell]
+                bucket.discard(id)
+                if not bucket:
+                    del self.cells[cell]
+            for cell in cells:
+                self.cells.setdefault(cell, set()).add(id)
+            self.objectCells[id] = cells
+
+    # Find the tracked objects with a label near a rectangle, returns a sorted list of IDs
+    # Returns every tracked object with the label whose bounding rectangle is closer than
+    # margin to the rectangle along both axes (and possibly some that are a little farther).
+    # @param label: The label of the tracked objects to find
+    # @param rect: The rectangle (x, y, w, h) to find tracked objects near
+    # @param margin: The distance along each axis to find tracked objects within
+    # @return: A sorted list of IDs
+    def query(self, label, rect, margin):
+        ids = set()
+        for cell in self.getCells(label, rect, margin):
+            ids |= self.cells.get(cell, set())
+        return sorted(ids)
+
+    # Remove every tracked object from the index
+    def clear(self):
+        for trackedObject in self.trackedObjects.values():
+            if trackedObject.index is self:
+                trackedObject.index = None
+        self.cells.clear()
+        self.objectCells.clear()
+        self.trackedObjects.clear()
@@ -1,15 +1,28 @@
 import math
+import numpy as np
+import time
 from tracking.TrackedObject import TrackedObject
+from tracking.TrackedObjectIndex import TrackedObjectIndex
 
 # Abstract class for tracking objects
 class Tracker():
 
-    def __init__(self):
+    # @param indexCellSize: The cell size (pixels) of the spatial index of the tracked objects,
+    #                       None to compare every contour against every tracked object
+    def __init__(self, indexCellSize=None):
         # Store the box points of the objects
         self.trackedObjects = dict[int, TrackedObject]([])
         # Keep the count of the IDs
         # each time a new object id detected, the count will increase by one
         self.idCount = 0
+        # Index the tracked objects by label and position
+        self.objectIndex = None
+        if indexCellSize is not None:
+            self.objectIndex = TrackedObjectIndex(indexCellSize)
+        # The metrics the updates are recorded in, None if they are not enabled
+        self.metrics = None
+        # The number of contour and tracked object pairs the last update measured
+        self.pairCount = 0
 
     def calculateObjectDistance(self, rect, obj: TrackedObject): 
         # Get the bounding rectangles
@@ -97,8 +110,183 @@ class Tracker():
         else:
             return 0
     
+    # Calculate the distances between pairs of rectangles and tracked object rectangles, returns an array of distances
+    # Vectorized version of calculateObjectDistance, the rectangle arrays are broadcast
+    # against each other (see calculateObjectDistanceMatrix for all pairs).
+    # @param rects: An (..., 4) array of (x, y, w, h) rectangles
+    # @param objectRects: An (..., 4) array of (x, y, w, h) bounding rectangles of tracked objects
+    # @return: An array of distances
+    def calculateObjectDistances(self, rects, objectRects):
+        x1, y1, w1, h1 = np.moveaxis(np.asarray(rects, dtype=np.float64), -1, 0)
+        x2, y2, w2, h2 = np.moveaxis(np.asarray(objectRects, dtype=np.float64), -1, 0)
+        # Use sqrt instead of np.hypot, which does not round like math.hypot
+        def hypot(dx, dy):
+            return np.sqrt(dx * dx + dy * dy)
+        # Determine the direction of the distance
+        up = y1 + h1/2 < y2 + h2/2
+        down = y1 + h1/2 > y2 + h2/2
+        left = x1 + w1/2 < x2 + w2/2
+        right = x1 + w1/2 > x2 + w2/2
+        # Calculate the distance between the corners of the bounding rectangles for every direction
+        upLeft = np.minimum.reduce([hypot(x1 - x2, y1 - y2), hypot(x1 - x2, y1 + h1 - y2),
+                                    hypot(x1 + w1 - x2, y1 - y2), hypot(x1 - x2, y1 + h1/2 - y2),
+                                    hypot(x1 + w1/2 - x2, y1 - y2)])
+        upRight = np.minimum.reduce([hypot(x1 + w1 - x2 - w2, y1 - y2), hypot(x1 - x2 - w2, y1 - y2),
+                                     hypot(x1 + w1 - x2 - w2, y1 + h1 - y2), hypot(x1 + w1/2 - x2 - w2, y1 - y2),
+                                     hypot(x1 + w1 - x2 - w2, y1 + h1/2 - y2)])
+        downLeft = np.minimum.reduce([hypot(x1 - x2, y1 + h1 - y2 - h2), hypot(x1 + w1 - x2, y1 + h1 - y2 - h2),
+                                      hypot(x1 - x2, y1 - y2 - h2), hypot(x1 + w1/2 - x2, y1 + h1 - y2 - h2),
+                                      hypot(x1 - x2, y1 + h1/2 - y2 - h2)])
+        downRight = np.minimum.reduce([hypot(x1 + w1 - x2 - w2, y1 + h1 - y2 - h2), hypot(x1 + w1 - x2 - w2, y1 - y2 - h2),
+                                       hypot(x1 - x2 - w2, y1 + h1 - y2 - h2), hypot(x1 + w1 - x2 - w2, y1 + h1/2 - y2 - h2),
+                                       hypot(x1 + w1/2 - x2 - w2, y1 + h1 - y2 - h2)])
+        return np.select([up & left, up & right, down & left, down & right, up, down, left, right],
+                         [upLeft, upRight, downLeft, downRight,
+                          hypot(x1 + w1/2 - x2 - w2/2, y1 - y2), hypot(x1 + w1/2 - x2 - w2/2, y1 + h1 - y2 - h2),
+                          hypot(x1 - x2, y1 + h1/2 - y2 - h2/2), hypot(x1 + w1 - x2 - w2, y1 + h1/2 - y2 - h2/2)], 0.0)
+
+    # Calculate the distance between every rectangle and every tracked object rectangle, returns a distance matrix
+    # @param rects: An (n, 4) array of (x, y, w, h) rectangles
+    # @param objectRects: An (m, 4) array of (x, y, w, h) bounding rectangles of tracked objects
+    # @return: An (n, m) array, the distance from every rectangle to every tracked object
+    def calculateObjectDistanceMatrix(self, rects, objectRects):
+        rects = np.asarray(rects).reshape(-1, 4)
+        objectRects = np.asarray(objectRects).reshape(-1, 4)
+        return self.calculateObjectDistances(rects[:, None, :], objectRects[None, :, :])
+
+    # Solve the assignment problem for a cost matrix, returns the assigned (row, column) pairs
+    # Finds the one-to-one assignment of rows to columns with the lowest total cost. Only allowed
+    # pairs are assigned: as many allowed pairs as possible are assigned, at the lowest total cost.
+    # The rows and columns are split into groups that share no allowed pair, which are solved
+    # on their own (a sparse matrix of allowed pairs splits into many small groups).
+    # @param costs: An (n, m) array of costs
+    # @param allowed: An (n, m) array of booleans, true where a row may be assigned to a column
+    # @return: Two arrays (rows, columns) of the assigned pairs, sorted by row
+    def solveAssignment(self, costs, allowed):
+        allowed = np.asarray(allowed, dtype=bool)
+        costs = np.asarray(costs, dtype=np.float64).reshape(allowed.shape)
+        rowCount = allowed.shape[0]
+        # Group the rows and columns (numbered after the rows) that are connected by allowed pairs
+        parents = list(range(rowCount + allowed.shape[1]))
+        def find(node):
+            while parents[node] != node:
+                parents[node] = parents[parents[node]]
+                node = parents[node]
+            return node
+        allowedRows, allowedColumns = np.nonzero(allowed)
+        for row, column in zip(allowedRows.tolist(), allowedColumns.tolist()):
+            parents[find(row)] = find(rowCount + column)
+        groups = {}
+        for row in np.unique(allowedRows).tolist():
+            groups.setdefault(find(row), ([], []))[0].append(row)
+        for column in np.unique(allowedColumns).tolist():
+            groups[find(rowCount + column)][1].append(column)
+        # Solve every group on its own
+        rows = []
+        columns = []
+        for groupRows, groupColumns in groups.values():
+            if len(groupRows) == 1 and len(groupColumns) == 1:
+                groupRowIndices, groupColumnIndices = [0], [0]
+            else:
+                groupRowIndices, groupColumnIndices = self.solveDenseAssignment(
+                    costs[np.ix_(groupRows, groupColumns)], allowed[np.ix_(groupRows, groupColumns)])
+            rows += [groupRows[index] for index in groupRowIndices]
+            columns += [groupColumns[index] for index in groupColumnIndices]
+        rows = np.array(rows, dtype=np.int64)
+        columns = np.array(columns, dtype=np.int64)
+        order = np.argsort(rows)
+        return rows[order], columns[order]
+
+    # Solve the assignment problem for a dense cost matrix, returns the assigned (row, column) pairs
+    # Uses the Hungarian algorithm (with potentials, vectorized over the columns).
+    # @param costs: An (n, m) array of costs
+    # @param allowed: An (n, m) array of booleans, true where a row may be assigned to a column
+    # @return: Two arrays (rows, columns) of the assigned pairs, sorted by row
+    def solveDenseAssignment(self, costs, allowed):
+        if not allowed.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # Disallowed pairs cost more than any assignment of allowed pairs
+        forbiddenCost = (np.abs(costs[allowed]).max() + 1.0) * (min(costs.shape) + 1)
+        costs = np.where(allowed, costs, forbiddenCost)
+        # The algorithm assigns every row, so solve for the transpose if there are more rows than columns
+        transposed = costs.shape[0] > costs.shape[1]
+        if transposed:
+            costs = costs.T
+        rowCount, columnCount = costs.shape
+        # Row and column potentials, and the row assigned to every column (1-based, column 0 is a sentinel)
+        rowPotentials = np.zeros(rowCount + 1)
+        columnPotentials = np.zeros(columnCount + 1)
+        columnRows = np.zeros(columnCount + 1, dtype=np.int64)
+        previousColumns = np.zeros(columnCount + 1, dtype=np.int64)
+        for row in range(1, rowCount + 1):
+            # Grow a tree of alternating paths from the new row until it reaches a free column
+            columnRows[0] = row
+            column = 0
+            minimumSlack = np.full(columnCount + 1, np.inf)
+            visited = np.zeros(columnCount + 1, dtype=bool)
+            while True:
+                visited[column] = True
+                treeRow = columnRows[column]
+                slack = costs[treeRow - 1] - rowPotentials[treeRow] - columnPotentials[1:]
+                improved = ~visited[1:] & (slack < minimumSlack[1:])
+                minimumSlack[1:][improved] = slack[improved]
+                previousColumns[1:][improved] = column
+                # Move to the unvisited column with the smallest slack, and update the potentials
+                unvisitedSlack = np.where(visited[1:], np.inf, minimumSlack[1:])
+                nextColumn = int(np.argmin(unvisitedSlack)) + 1
+                delta = unvisitedSlack[nextColumn - 1]
+                rowPotentials[columnRows[visited]] += delta
+                columnPotentials[visited] -= delta
+                minimumSlack[~visited] -= delta
+                column = nextColumn
+                if columnRows[column] == 0:
+                    break
+            # Flip the alternating path that ends in the free column
+            while column != 0:
+                previousColumn = previousColumns[column]
+                columnRows[column] = columnRows[previousColumn]
+                column = previousColumn
+        columns = np.flatnonzero(columnRows[1:])
+        rows = columnRows[1:][columns] - 1
+        if transposed:
+            rows, columns = columns, rows
+        # Drop the pairs that are not allowed
+        keep = allowed[rows, columns]
+        rows, columns = rows[keep], columns[keep]
+        order = np.argsort(rows)
+        return rows[order], columns[order]
+
+    # Make sure the spatial index holds exactly the tracked objects, rebuilds it if it does not
+    # (the tracked objects dictionary may have been replaced outside of update)
+    def syncObjectIndex(self):
+        indexedObjects = self.objectIndex.trackedObjects
+        if indexedObjects.keys() != self.trackedObjects.keys() or \
+                any(indexedObjects[id] is not trackedObject for id, trackedObject in self.trackedObjects.items()):
+            self.objectIndex.clear()
+            for trackedObject in self.trackedObjects.values():
+                self.objectIndex.add(trackedObject)
+
+    # Find the tracked objects with a label that may be closer than a distance to a rectangle
+    # Returns a superset of the tracked objects closer than the distance, in the order of the
+    # tracked objects dictionary (the IDs of the tracked objects only ever increase).
+    # @param rect: The rectangle (x, y, w, h) to find tracked objects near
+    # @param label: The label of the tracked objects to find
+    # @param distance: The distance to find tracked objects within
+    # @return: A sorted list of IDs
+    def findCandidateObjects(self, rect, label, distance):
+        return self.objectIndex.query(label, rect, distance)
+
+    # Record an update of the tracker in the metrics
+    # @param start: The time (time.perf_counter) the update started
+    def recordUpdate(self, start):
+        self.metrics.observe('tracker_update_seconds', time.perf_counter() - start)
+        self.metrics.observe('tracker_pairs', self.pairCount)
+        self.metrics.observe('tracker_tracks', len(self.trackedObjects))
+
     # Abstract method for updating the tracker
-    def update(self, contoursToUpdate):
+    # @param contoursToUpdate: The contours to update the tracker with
+    # @param elapsedFrames: The number of frames since the last update (more than 1 if frames were dropped)
+    def update(self, contoursToUpdate, elapsedFrames=1):
         pass
 
     # Returns the tracked objects